@@ -1,22 +1,20 @@
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from app.db.session import SessionLocal
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.session import AsyncSessionLocal
 from app.core.security import decode_token
 from app.models.admin_user import AdminUser
 
 security = HTTPBearer()
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
-def require_admin(
+async def require_admin(
     creds: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ) -> AdminUser:
     token = creds.credentials
     try:
@@ -27,7 +25,9 @@ def require_admin(
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
 
-    admin = db.query(AdminUser).filter(AdminUser.username == username, AdminUser.is_active == True).first()
+    admin = await db.scalar(
+        select(AdminUser).where(AdminUser.username == username, AdminUser.is_active == True)
+    )
     if not admin:
         raise HTTPException(status_code=401, detail="Admin not found or disabled")
     return admin
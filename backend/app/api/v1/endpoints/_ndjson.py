@@ -0,0 +1,34 @@
+from typing import AsyncIterator, Callable
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+
+from app.core.config import EXPORT_BATCH_SIZE
+from app.db.session import AsyncSessionLocal
+
+NDJSON = "application/x-ndjson"
+
+
+def wants_ndjson(request: Request) -> bool:
+    """Client asked for newline-delimited JSON (Accept: application/x-ndjson)."""
+    return NDJSON in request.headers.get("accept", "")
+
+
+async def _lines(qry, schema, convert: Callable | None) -> AsyncIterator[bytes]:
+    adapter = TypeAdapter(schema)
+    # Own session: the body is sent after the handler (and its get_db session) returns
+    async with AsyncSessionLocal() as db:
+        result = await db.stream_scalars(qry.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for row in result:
+            item = convert(row) if convert else adapter.validate_python(row, from_attributes=True)
+            yield adapter.dump_json(item) + b"\n"
+
+
+def ndjson_response(qry, schema, convert: Callable | None = None) -> StreamingResponse:
+    """
+    One JSON object per line, read through a server-side cursor: the first
+    row goes out as soon as it is fetched and memory stays at one batch.
+    `convert` maps an ORM row to a `schema` instance when from_attributes is not enough.
+    """
+    return StreamingResponse(_lines(qry, schema, convert), media_type=NDJSON)
@@ -1,11 +1,40 @@
-from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.v1.endpoints._deps import get_db, require_admin
-from app.schemas.appointment import AppointmentCreate, AppointmentOut, StatusUpdate, VALID_STATUSES
+from app.api.v1.endpoints._ndjson import ndjson_response, wants_ndjson
+from app.schemas.appointment import (
+    AppointmentCreate,
+    AppointmentOut,
+    AppointmentPage,
+    AppointmentStats,
+    BulkResult,
+    BulkSelection,
+    BulkStatusUpdate,
+    StatusUpdate,
+    VALID_STATUSES,
+)
 from app.models.appointment import Appointment
+from app.services.appointment_service import (
+    apply_appointment_filters,
+    apply_appointment_cursor,
+    build_appointment_values,
+    bulk_soft_delete,
+    bulk_update_status,
+)
+from app.services.appointment_dedup import (
+    claim_fingerprint,
+    claim_submission,
+    release_submission,
+    submission_fingerprint,
+)
+from app.services.appointment_ingest import IngestQueueFull, appointment_batcher, batch_mode_enabled
+from app.services.appointment_search import search_appointments
+from app.services.appointment_stats import appointment_stats, bump_appointment_stats, rebuild_appointment_stats
+from app.services.content_version import APPOINTMENTS, bump_data_version
+from app.utils.pagination import encode_cursor
 from app.core.ratelimit import rate_limit
 
 router = APIRouter()
@@ -15,54 +44,44 @@ router = APIRouter()
 # PUBLIC: Create Appointment
 # ============================================================
 @router.post("/appointments", response_model=AppointmentOut)
-def create_appointment(
+async def create_appointment(
     payload: AppointmentCreate,
-    db: Session = Depends(get_db),
-    _rl=Depends(rate_limit(max_requests=100, window_seconds=600)),
+    db: AsyncSession = Depends(get_db),
+    _rl=Depends(rate_limit("appointments", max_requests=100, window_seconds=600)),
 ):
-    ctype = payload.counseling_type.strip()
-    phone = payload.phone.strip()
-
-    # Duplicate protection (same phone + type within 10 mins)
-    ten_min_ago = datetime.now().astimezone() - timedelta(minutes=10)
-
-    dup = (
-        db.query(Appointment)
-        .filter(
-            Appointment.phone == phone,
-            Appointment.counseling_type == ctype,
-            Appointment.created_at >= ten_min_ago,
-        )
-        .first()
-    )
+    values = build_appointment_values(payload, datetime.now().astimezone())
 
-    if dup:
+    if not batch_mode_enabled():
+        return await _insert_appointment(db, values)
+
+    # Write-behind: cheap in-process duplicate check now, DB check + INSERT in the batch
+    fingerprint = submission_fingerprint(values["normalized_phone"], values["counseling_type"])
+    claim_fingerprint(fingerprint)
+    try:
+        new_id = await appointment_batcher.submit(values)
+    except IngestQueueFull:
+        release_submission(fingerprint)
         raise HTTPException(
-            status_code=409,
-            detail="Duplicate request detected. Please wait a few minutes before submitting again."
+            status_code=503,
+            detail="We are receiving a lot of requests right now. Please try again shortly.",
+            headers={"Retry-After": "5"},
         )
+    return AppointmentOut(id=new_id, **values)
 
-    appt = Appointment(
-        counseling_type=ctype,
-        name=payload.name.strip(),
-        phone=phone,
-        address=(payload.address.strip() if payload.address else None),
-        message=(payload.message.strip() if payload.message else None),
-        status="NEW",
-
-        # ✅ LOCATION (Required)
-        location=payload.location.strip(),
-
-        # Extra Fields
-        date_of_birth=payload.date_of_birth,
-        guardian_name=(payload.guardian_name.strip() if payload.guardian_name else None),
-        guardian_contact=(payload.guardian_contact.strip() if payload.guardian_contact else None),
-        appointment_type=payload.appointment_type,
-    )
 
-    db.add(appt)
-    db.commit()
-    db.refresh(appt)
+async def _insert_appointment(db: AsyncSession, values: dict) -> Appointment:
+    # Duplicate protection (same normalized phone + type within 10 mins)
+    fingerprint = await claim_submission(db, values["normalized_phone"], values["counseling_type"], values["created_at"])
+
+    appt = Appointment(**values)
+    try:
+        db.add(appt)
+        await bump_appointment_stats(db, [appt], +1)
+        await db.commit()
+    except Exception:
+        release_submission(fingerprint)
+        raise
+    await db.refresh(appt)
     return appt
 
 
@@ -70,7 +89,8 @@ def create_appointment(
 # ADMIN: List Appointments (With Location Filter)
 # ============================================================
 @router.get("/admin/appointments", response_model=list[AppointmentOut])
-def list_appointments(
+async def list_appointments(
+    request: Request,
     q: str | None = Query(default=None, description="Search name/phone"),
     status: str | None = Query(default=None),
     counseling_type: str | None = Query(default=None),
@@ -79,69 +99,115 @@ def list_appointments(
     date_to: str | None = Query(default=None, description="YYYY-MM-DD"),
     limit: int = Query(default=200, ge=1, le=10000),
     offset: int = Query(default=0, ge=0),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    _admin=Depends(require_admin),
+):
+    qry = select(Appointment).where(Appointment.deleted_at.is_(None))
+    qry = apply_appointment_filters(
+        qry,
+        q=q,
+        status=status,
+        counseling_type=counseling_type,
+        location=location,
+        date_from=date_from,
+        date_to=date_to,
+    )
+    qry = qry.order_by(Appointment.id.desc()).offset(offset).limit(limit)
+
+    # Accept: application/x-ndjson streams rows as they are read
+    if wants_ndjson(request):
+        return ndjson_response(qry, AppointmentOut)
+
+    return (await db.scalars(qry)).all()
+
+
+# ============================================================
+# ADMIN: Cursor Pages (keyset on created_at, id)
+# ============================================================
+@router.get("/admin/appointments/page", response_model=AppointmentPage)
+async def list_appointments_page(
+    q: str | None = Query(default=None, description="Search name/phone"),
+    status: str | None = Query(default=None),
+    counseling_type: str | None = Query(default=None),
+    location: str | None = Query(default=None),
+    date_from: str | None = Query(default=None, description="YYYY-MM-DD"),
+    date_to: str | None = Query(default=None, description="YYYY-MM-DD"),
+    appointment_type: str | None = Query(default=None),
+    cursor: str | None = Query(default=None, description="next_cursor from the previous page"),
+    limit: int = Query(default=50, ge=1, le=500),
+    db: AsyncSession = Depends(get_db),
     _admin=Depends(require_admin),
 ):
-    qry = db.query(Appointment).filter(Appointment.deleted_at.is_(None))
-
-    # Search
-    if q:
-        qs = f"%{q.strip()}%"
-        qry = qry.filter(or_(
-            Appointment.name.ilike(qs),
-            Appointment.phone.ilike(qs)
-        ))
-
-    # Status filter
-    if status:
-        qry = qry.filter(Appointment.status == status.strip().upper())
-
-    # Counseling filter
-    if counseling_type:
-        qry = qry.filter(Appointment.counseling_type == counseling_type.strip())
-
-    # ✅ Location filter
-    if location:
-        qry = qry.filter(Appointment.location == location.strip())
-
-    # Date filtering
-    if date_from:
-        try:
-            dtf = datetime.fromisoformat(date_from.strip()).date()
-            qry = qry.filter(
-                Appointment.created_at >= datetime.combine(
-                    dtf, datetime.min.time()
-                ).astimezone()
-            )
-        except Exception:
-            raise HTTPException(status_code=400, detail="Invalid date_from. Use YYYY-MM-DD.")
-
-    if date_to:
-        try:
-            dtt = datetime.fromisoformat(date_to.strip()).date()
-            end_dt = datetime.combine(
-                dtt, datetime.max.time()
-            ).astimezone()
-            qry = qry.filter(Appointment.created_at <= end_dt)
-        except Exception:
-            raise HTTPException(status_code=400, detail="Invalid date_to. Use YYYY-MM-DD.")
-
-    return (
-        qry.order_by(Appointment.id.desc())
-        .offset(offset)
-        .limit(limit)
-        .all()
+    qry = select(Appointment).where(Appointment.deleted_at.is_(None))
+    qry = apply_appointment_filters(
+        qry,
+        q=q,
+        status=status,
+        counseling_type=counseling_type,
+        location=location,
+        date_from=date_from,
+        date_to=date_to,
+        appointment_type=appointment_type,
     )
+    qry = apply_appointment_cursor(qry, cursor)
+
+    # Fetch one extra row to know whether another page exists
+    rows = (await db.scalars(qry.limit(limit + 1))).all()
+    items = rows[:limit]
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+
+    return AppointmentPage(items=items, next_cursor=next_cursor)
+
+
+# ============================================================
+# ADMIN: Ranked Search (name / phone, indexed)
+# ============================================================
+@router.get("/admin/appointments/search", response_model=list[AppointmentOut])
+async def search_appointments_ranked(
+    q: str = Query(min_length=1, max_length=100, description="Name or phone digits"),
+    phone_suffix: bool = Query(default=False, description="Only phones ending with q's digits"),
+    limit: int = Query(default=20, ge=1, le=200),
+    db: AsyncSession = Depends(get_db),
+    _admin=Depends(require_admin),
+):
+    return await search_appointments(db, q, limit=limit, phone_suffix=phone_suffix)
+
+
+# ============================================================
+# ADMIN: Analytics (served from the daily rollup table)
+# ============================================================
+@router.get("/admin/appointments/stats", response_model=AppointmentStats)
+async def get_appointment_stats(
+    days: int = Query(default=14, ge=1, le=366),
+    weeks: int = Query(default=8, ge=1, le=104),
+    months: int = Query(default=6, ge=1, le=36),
+    db: AsyncSession = Depends(get_db),
+    _admin=Depends(require_admin),
+):
+    return await appointment_stats(db, days=days, weeks=weeks, months=months)
+
+
+@router.post("/admin/appointments/stats/rebuild")
+async def rebuild_stats(
+    db: AsyncSession = Depends(get_db),
+    _admin=Depends(require_admin),
+):
+    counted = await rebuild_appointment_stats(db)
+    return {"detail": "Stats rebuilt", "appointments": counted}
 
 
 # ============================================================
 # ADMIN: Update Status
 # ============================================================
 @router.patch("/admin/appointments/{appointment_id}/status", response_model=AppointmentOut)
-def update_status(
+async def update_status(
     appointment_id: int,
     payload: StatusUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     _admin=Depends(require_admin),
 ):
     new_status = payload.status.strip().upper()
@@ -152,17 +218,25 @@ def update_status(
             detail=f"Invalid status. Allowed: {sorted(VALID_STATUSES)}"
         )
 
-    appt = db.query(Appointment).filter(
-        Appointment.id == appointment_id,
-        Appointment.deleted_at.is_(None)
-    ).first()
+    # Row lock keeps concurrent writers from double counting the rollup
+    appt = await db.scalar(
+        select(Appointment).where(
+            Appointment.id == appointment_id,
+            Appointment.deleted_at.is_(None)
+        ).with_for_update()
+    )
 
     if not appt:
         raise HTTPException(status_code=404, detail="Appointment not found")
 
+    if appt.status != new_status:
+        await bump_appointment_stats(db, [appt], -1)
+        await bump_appointment_stats(db, [appt], +1, status=new_status)
+        await bump_data_version(db, APPOINTMENTS)
+
     appt.status = new_status
-    db.commit()
-    db.refresh(appt)
+    await db.commit()
+    await db.refresh(appt)
     return appt
 
 
@@ -170,20 +244,54 @@ def update_status(
 # ADMIN: Soft Delete
 # ============================================================
 @router.delete("/admin/appointments/{appointment_id}")
-def delete_appointment(
+async def delete_appointment(
     appointment_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     _admin=Depends(require_admin),
 ):
-    appt = db.query(Appointment).filter(
-        Appointment.id == appointment_id,
-        Appointment.deleted_at.is_(None)
-    ).first()
+    # Row lock keeps concurrent writers from double counting the rollup
+    appt = await db.scalar(
+        select(Appointment).where(
+            Appointment.id == appointment_id,
+            Appointment.deleted_at.is_(None)
+        ).with_for_update()
+    )
 
     if not appt:
         raise HTTPException(status_code=404, detail="Appointment not found")
 
     appt.deleted_at = datetime.now().astimezone()
-    db.commit()
+    await bump_appointment_stats(db, [appt], -1)
+    await bump_data_version(db, APPOINTMENTS)
+    await db.commit()
+
+    return {"detail": "Moved to trash"}
 
-    return {"detail": "Moved to trash"}
\ No newline at end of file
+
+# ============================================================
+# ADMIN: Bulk Status / Bulk Soft Delete (one UPDATE, one commit)
+# ============================================================
+@router.post("/admin/appointments/bulk/status", response_model=BulkResult)
+async def bulk_status(
+    payload: BulkStatusUpdate,
+    db: AsyncSession = Depends(get_db),
+    _admin=Depends(require_admin),
+):
+    new_status = payload.status.strip().upper()
+
+    if new_status not in VALID_STATUSES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid status. Allowed: {sorted(VALID_STATUSES)}"
+        )
+
+    return await bulk_update_status(db, payload, new_status)
+
+
+@router.post("/admin/appointments/bulk/delete", response_model=BulkResult)
+async def bulk_delete(
+    payload: BulkSelection,
+    db: AsyncSession = Depends(get_db),
+    _admin=Depends(require_admin),
+):
+    return await bulk_soft_delete(db, payload)
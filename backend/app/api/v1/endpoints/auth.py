@@ -1,19 +1,27 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from app.api.v1.endpoints._deps import get_db
 from app.schemas.auth import LoginRequest, TokenResponse
 from app.models.admin_user import AdminUser
 from app.core.security import verify_password, create_access_token
+from app.core.ratelimit import rate_limit
 
 router = APIRouter()
 
 @router.post("/auth/login", response_model=TokenResponse)
-def login(payload: LoginRequest, db: Session = Depends(get_db)):
-    user = db.query(AdminUser).filter(AdminUser.username == payload.username).first()
+async def login(
+    payload: LoginRequest,
+    db: AsyncSession = Depends(get_db),
+    _rl=Depends(rate_limit("login", max_requests=20, window_seconds=300)),
+):
+    user = await db.scalar(select(AdminUser).where(AdminUser.username == payload.username))
     if not user or not user.is_active:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    if not verify_password(payload.password, user.password_hash):
+    # bcrypt is deliberately slow; keep it off the event loop
+    if not await run_in_threadpool(verify_password, payload.password, user.password_hash):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
     token = create_access_token(subject=user.username)
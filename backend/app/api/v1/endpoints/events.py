@@ -1,249 +1,181 @@
-import os
-import uuid
 from datetime import datetime
 from typing import Optional
-from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.api.v1.endpoints._deps import get_db, require_admin
-from app.core.config import UPLOAD_DIR, MAX_UPLOAD_MB
+from app.api.v1.endpoints._ndjson import ndjson_response, wants_ndjson
 from app.models.event_poster import EventPoster
 from app.schemas.events import EventResponse
+from app.services.content_version import (
+    EVENTS,
+    bump_content_version,
+    serve_feed,
+)
+from app.services.media_store import delete_post_with_image, image_fields, media_url, store_upload
 
 router = APIRouter()
 
-def _uploads_abs_dir() -> str:
-    """Get absolute path to static_uploads directory."""
-    # Navigate from backend/app/api/v1/endpoints/events.py to backend/app/
-    base = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
-    # Return backend/app/static_uploads (not static_uploads/gallery)
-    return os.path.join(base, "static_uploads")
 
-@router.get("/events", response_model=list[EventResponse])
-def list_active_events(db: Session = Depends(get_db)):
-    """List active events for public view (most recent first)."""
-    # Auto-activate due events
-    _activate_due_events(db)
+def _event_out(it: EventPoster) -> EventResponse:
+    return EventResponse(
+        id=it.id,
+        title=it.title,
+        image_url=media_url(it.image_path, "events"),
+        is_active=it.is_active,
+        starts_at=it.starts_at,
+        ends_at=it.ends_at,
+        created_at=it.created_at,
+        **image_fields(it),
+    )
 
-    now = datetime.now()
-    from sqlalchemy import or_, and_
-    
-    items = db.query(EventPoster).filter(
-        and_(
-            EventPoster.deleted_at.is_(None),  # Must not be deleted
-            or_(
-                EventPoster.is_active == True,
-                and_(EventPoster.starts_at != None, EventPoster.starts_at <= now)
-            )
-        )
-    ).order_by(EventPoster.created_at.desc()).all()
+
+@router.get("/events", response_model=list[EventResponse])
+async def list_active_events(request: Request, db: AsyncSession = Depends(get_db)):
+    """List active events for public view (most recent first). Served from the feed cache."""
+    return await serve_feed(request, db, EVENTS, EventResponse, _build_active_events)
+
+
+async def _build_active_events(db: AsyncSession) -> list[EventResponse]:
+    # Scheduled posters are switched on/off at starts_at / ends_at by the
+    # event scheduler (app/core/scheduler.py), so this is a plain read
+    items = (await db.scalars(select(EventPoster).where(
+        EventPoster.deleted_at.is_(None),  # Must not be deleted
+        EventPoster.is_active == True,
+    ).order_by(EventPoster.created_at.desc()))).all()
     
     out = []
     for it in items:
-        fname = os.path.basename(it.image_path)
-        out.append(EventResponse(
-            id=it.id,
-            title=it.title,
-            image_url=f"/uploads/events/{fname}",
-            is_active=it.is_active,
-            starts_at=it.starts_at,
-            ends_at=it.ends_at,
-            created_at=it.created_at
-        ))
+        out.append(_event_out(it))
     return out
 
 @router.get("/admin/events", response_model=list[EventResponse])
-def list_all_events(
-    db: Session = Depends(get_db),
+async def list_all_events(
+    db: AsyncSession = Depends(get_db),
     _admin=Depends(require_admin)
 ):
     """List all events for admin (excluding deleted)."""
-    # Auto-activate due events
-    _activate_due_events(db)
-
-    items = db.query(EventPoster).filter(EventPoster.deleted_at.is_(None)).order_by(EventPoster.created_at.desc()).all()
+    items = (await db.scalars(select(EventPoster).where(EventPoster.deleted_at.is_(None)).order_by(EventPoster.created_at.desc()))).all()
     out = []
     for it in items:
-        fname = os.path.basename(it.image_path)
-        out.append(EventResponse(
-            id=it.id,
-            title=it.title,
-            image_url=f"/uploads/events/{fname}",
-            is_active=it.is_active,
-            starts_at=it.starts_at,
-            ends_at=it.ends_at,
-            created_at=it.created_at
-        ))
+        out.append(_event_out(it))
     return out
 
-def _activate_due_events(db: Session):
-    """Helper: Activate events that have passed their start time."""
-    now = datetime.now()
-    from sqlalchemy import and_
-    
-    # Find due events
-    due_events = db.query(EventPoster).filter(
-        and_(
-            EventPoster.is_active == False,
-            EventPoster.deleted_at.is_(None),
-            EventPoster.starts_at != None,
-            EventPoster.starts_at <= now
-        )
-    ).all()
-    
-    if due_events:
-        for ev in due_events:
-            print(f"Auto-activating event {ev.id} (Scheduled: {ev.starts_at})")
-            ev.is_active = True
-        db.commit()
-
 @router.post("/admin/events", response_model=EventResponse)
-def upload_event_poster(
+async def upload_event_poster(
     title: Optional[str] = Form(None),
     is_active: bool = Form(True),
     starts_at: Optional[datetime] = Form(None),
     ends_at: Optional[datetime] = Form(None),
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     _admin=Depends(require_admin),
 ):
     if not file.content_type or not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="Only image uploads allowed")
 
-    data = file.file.read()
-    size_mb = len(data) / (1024 * 1024)
-    if size_mb > MAX_UPLOAD_MB:
-        raise HTTPException(status_code=400, detail=f"File too large (> {MAX_UPLOAD_MB} MB)")
-
-    ext = os.path.splitext(file.filename or "")[1].lower() or ".jpg"
-    fname = f"{uuid.uuid4().hex}{ext}"
-
-    # Ensure events dir exists
-    out_dir = os.path.join(_uploads_abs_dir(), "events")
-    os.makedirs(out_dir, exist_ok=True)
-    path = os.path.join(out_dir, fname)
-
-    with open(path, "wb") as f:
-        f.write(data)
+    # Stored once per distinct content (streamed, size limited, deduplicated by hash)
+    media = await store_upload(db, file)
 
     rec = EventPoster(
         title=title,
-        image_path=path,
+        image_path=media.path,
+        **image_fields(media),
+        media_id=media.id,
         is_active=is_active,
         starts_at=starts_at,
         ends_at=ends_at
     )
     db.add(rec)
-    db.commit()
-    db.refresh(rec)
+    await bump_content_version(db, EVENTS)
+    await db.commit()
+    await db.refresh(rec)
 
-    return EventResponse(
-        id=rec.id,
-        title=rec.title,
-        image_url=f"/uploads/events/{fname}",
-        is_active=rec.is_active,
-        starts_at=rec.starts_at,
-        ends_at=rec.ends_at,
-        created_at=rec.created_at
-    )
+    return _event_out(rec)
 
 @router.delete("/admin/events/{event_id}")
-def delete_event(
+async def delete_event(
     event_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     _admin=Depends(require_admin),
 ):
-    post = db.query(EventPoster).filter(EventPoster.id == event_id, EventPoster.deleted_at.is_(None)).first()
+    post = await db.scalar(select(EventPoster).where(EventPoster.id == event_id, EventPoster.deleted_at.is_(None)))
     if not post:
-        if db.query(EventPoster).filter(EventPoster.id == event_id).first():
+        if await db.get(EventPoster, event_id):
              raise HTTPException(status_code=404, detail="Event already in trash")
         raise HTTPException(status_code=404, detail="Event poster not found")
 
     post.deleted_at = datetime.now().astimezone()
-    db.commit()
+    await bump_content_version(db, EVENTS)
+    await db.commit()
     return {"status": "success", "deleted_id": event_id}
 
 @router.patch("/admin/events/{event_id}/status", response_model=EventResponse)
-def update_event_status(
+async def update_event_status(
     event_id: int,
     is_active: bool,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     _admin=Depends(require_admin),
 ):
     """Toggle event active status."""
-    post = db.query(EventPoster).filter(EventPoster.id == event_id, EventPoster.deleted_at.is_(None)).first()
+    post = await db.scalar(select(EventPoster).where(EventPoster.id == event_id, EventPoster.deleted_at.is_(None)))
     if not post:
         raise HTTPException(status_code=404, detail="Event poster not found")
     
     post.is_active = is_active
-    db.commit()
-    db.refresh(post)
+    await bump_content_version(db, EVENTS)
+    await db.commit()
+    await db.refresh(post)
     
-    fname = os.path.basename(post.image_path)
-    return EventResponse(
-        id=post.id,
-        title=post.title,
-        image_url=f"/uploads/events/{fname}",
-        is_active=post.is_active,
-        starts_at=post.starts_at,
-        ends_at=post.ends_at,
-        created_at=post.created_at
-    )
+    return _event_out(post)
 @router.get("/admin/events/trash", response_model=list[EventResponse])
-def list_trashed_events(
-    db: Session = Depends(get_db),
+async def list_trashed_events(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
     _admin=Depends(require_admin),
 ):
-    items = db.query(EventPoster).filter(
+    qry = select(EventPoster).where(
         EventPoster.deleted_at.is_not(None)
-    ).order_by(EventPoster.deleted_at.desc()).all()
+    ).order_by(EventPoster.deleted_at.desc())
+    # Accept: application/x-ndjson streams one poster per line
+    if wants_ndjson(request):
+        return ndjson_response(qry, EventResponse, _event_out)
+    items = (await db.scalars(qry)).all()
 
     out = []
     for it in items:
-        fname = os.path.basename(it.image_path)
-        out.append(EventResponse(
-            id=it.id,
-            title=it.title,
-            image_url=f"/uploads/events/{fname}",
-            is_active=it.is_active,
-            starts_at=it.starts_at,
-            ends_at=it.ends_at,
-            created_at=it.created_at
-        ))
+        out.append(_event_out(it))
     return out
 
 
 @router.post("/admin/events/{event_id}/restore")
-def restore_event_from_trash(
+async def restore_event_from_trash(
     event_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     _admin=Depends(require_admin),
 ):
-    post = db.query(EventPoster).filter(EventPoster.id == event_id).first()
+    post = await db.get(EventPoster, event_id)
     if not post:
         raise HTTPException(status_code=404, detail="Event not found")
 
     post.deleted_at = None
-    db.commit()
+    await bump_content_version(db, EVENTS)
+    await db.commit()
     return {"status": "success", "restored_id": event_id}
 
 
 @router.delete("/admin/events/{event_id}/purge")
-def purge_event_permanently(
+async def purge_event_permanently(
     event_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     _admin=Depends(require_admin),
 ):
-    post = db.query(EventPoster).filter(EventPoster.id == event_id).first()
+    post = await db.get(EventPoster, event_id)
     if not post:
         raise HTTPException(status_code=404, detail="Event not found")
 
-    # Optional: delete file too (safe)
-    try:
-        if post.image_path and os.path.exists(post.image_path):
-            os.remove(post.image_path)
-    except Exception:
-        pass
-
-    db.delete(post)
-    db.commit()
+    # Delete row; the file + variants go with the last post using them
+    await delete_post_with_image(db, post, "events")
+    await bump_content_version(db, EVENTS)
+    await db.commit()
     return {"status": "success", "purged_id": event_id}
\ No newline at end of file
@@ -1,138 +1,118 @@
-from io import BytesIO, StringIO
+import os
+import tempfile
 from datetime import datetime
-import csv
 
-from fastapi import APIRouter, Depends, Query
-from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.background import BackgroundTask
 
 from app.api.v1.endpoints._deps import get_db, require_admin
-from app.models.appointment import Appointment
+from app.models.export_job import ExportJob
+from app.schemas.export import ExportJobOut, ExportRequest
+from app.services.appointment_export import (
+    EXPORT_FORMATS,
+    csv_chunks,
+    export_columns,
+    export_query,
+    write_export,
+)
+from app.services.export_jobs import export_jobs
 
 router = APIRouter()
 
-def _safe(s):
-    return "" if s is None else str(s)
-
 @router.get("/admin/appointments/export")
-def export_appointments(
+async def export_appointments(
     format: str = Query(default="xlsx", pattern="^(xlsx|pdf|csv)$"),
-    db: Session = Depends(get_db),
+    q: str | None = Query(default=None, description="Search name/phone"),
+    status: str | None = Query(default=None),
+    counseling_type: str | None = Query(default=None),
+    location: str | None = Query(default=None),
+    date_from: str | None = Query(default=None, description="YYYY-MM-DD"),
+    date_to: str | None = Query(default=None, description="YYYY-MM-DD"),
+    appointment_type: str | None = Query(default=None),
+    deleted: str = Query(default="exclude", pattern="^(exclude|include|only)$"),
+    by_location: bool = Query(default=False, description="xlsx: one sheet per location"),
     _admin=Depends(require_admin),
 ):
-    items = db.query(Appointment).order_by(Appointment.id.desc()).all()
+    qry = export_query(
+        deleted=deleted,
+        q=q,
+        status=status,
+        counseling_type=counseling_type,
+        location=location,
+        date_from=date_from,
+        date_to=date_to,
+        appointment_type=appointment_type,
+    )
 
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
     base_name = f"appointments_{ts}"
 
     if format == "csv":
-        sio = StringIO()
-        writer = csv.writer(sio)
-        writer.writerow(["id", "counseling_type", "name", "phone", "address", "message", "status", "created_at"])
-        for a in items:
-            writer.writerow([
-                a.id,
-                _safe(getattr(a, "counseling_type", "")),
-                _safe(a.name),
-                _safe(a.phone),
-                _safe(a.address),
-                _safe(a.message),
-                _safe(a.status),
-                _safe(getattr(a, "created_at", "")),
-            ])
-        bio = BytesIO(sio.getvalue().encode("utf-8"))
-        bio.seek(0)
-        return StreamingResponse(
-            bio,
-            media_type="text/csv",
-            headers={"Content-Disposition": f'attachment; filename="{base_name}.csv"'}
-        )
-
-    if format == "xlsx":
-        from openpyxl import Workbook
-        from openpyxl.utils import get_column_letter
-
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Appointments"
-
-        headers = ["ID", "Counseling Type", "Name", "Phone", "Address", "Message", "Status", "Created At"]
-        ws.append(headers)
-
-        for a in items:
-            ws.append([
-                a.id,
-                _safe(getattr(a, "counseling_type", "")),
-                _safe(a.name),
-                _safe(a.phone),
-                _safe(a.address),
-                _safe(a.message),
-                _safe(a.status),
-                _safe(getattr(a, "created_at", "")),
-            ])
-
-        # Basic autosize (rough)
-        for col in range(1, len(headers) + 1):
-            letter = get_column_letter(col)
-            ws.column_dimensions[letter].width = 18
-
-        out = BytesIO()
-        wb.save(out)
-        out.seek(0)
+        # Streamed straight from a server-side cursor, never held whole
         return StreamingResponse(
-            out,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f'attachment; filename="{base_name}.xlsx"'}
+            csv_chunks(qry, export_columns(deleted)),
+            media_type=EXPORT_FORMATS["csv"][1],
+            headers={"Content-Disposition": f'attachment; filename="{base_name}.csv"'},
         )
 
-    # pdf
-    from reportlab.lib.pagesizes import A4, landscape
-    from reportlab.pdfgen import canvas
-
-    out = BytesIO()
-    c = canvas.Canvas(out, pagesize=landscape(A4))
-    width, height = landscape(A4)
-
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(30, height - 30, "Kanglei Career Solution - Appointments Export")
-    c.setFont("Helvetica", 10)
-    c.drawString(30, height - 50, f"Generated: {datetime.now().isoformat(sep=' ', timespec='seconds')}")
+    # xlsx / pdf: spooled to a temp file (both formats write their index last), then streamed
+    suffix, media_type = EXPORT_FORMATS[format]
+    fd, path = tempfile.mkstemp(prefix="appointments-", suffix=suffix)
+    os.close(fd)
+    try:
+        await write_export(format, qry, export_columns(deleted), path, by_location=by_location)
+    except BaseException:
+        os.remove(path)
+        raise
+    return FileResponse(
+        path,
+        media_type=media_type,
+        filename=f"{base_name}{suffix}",
+        background=BackgroundTask(os.remove, path),
+    )
 
-    # Table-ish rendering (simple, readable)
-    y = height - 80
-    c.setFont("Helvetica-Bold", 9)
-    cols = ["ID", "Type", "Name", "Phone", "Status", "Created At"]
-    x_positions = [30, 80, 210, 360, 470, 560]
-    for i, col in enumerate(cols):
-        c.drawString(x_positions[i], y, col)
 
-    c.setFont("Helvetica", 9)
-    y -= 16
+# ============================================================
+# Background Export Jobs
+# ============================================================
+@router.post("/admin/exports", response_model=ExportJobOut, status_code=202)
+async def create_export_job(
+    payload: ExportRequest,
+    db: AsyncSession = Depends(get_db),
+    _admin=Depends(require_admin),
+):
+    """Queue an export; poll GET /admin/exports/{id}, then download. Identical requests share a job."""
+    return await export_jobs.submit(db, payload)
 
-    for a in items[:500]:  # safety cap for PDF
-        if y < 40:
-            c.showPage()
-            y = height - 40
-            c.setFont("Helvetica-Bold", 9)
-            for i, col in enumerate(cols):
-                c.drawString(x_positions[i], y, col)
-            c.setFont("Helvetica", 9)
-            y -= 16
 
-        c.drawString(x_positions[0], y, str(a.id))
-        c.drawString(x_positions[1], y, _safe(getattr(a, "counseling_type", ""))[:18])
-        c.drawString(x_positions[2], y, _safe(a.name)[:22])
-        c.drawString(x_positions[3], y, _safe(a.phone)[:16])
-        c.drawString(x_positions[4], y, _safe(a.status)[:10])
-        c.drawString(x_positions[5], y, _safe(getattr(a, "created_at", ""))[:19])
-        y -= 14
+@router.get("/admin/exports/{job_id}", response_model=ExportJobOut)
+async def get_export_job(
+    job_id: str,
+    db: AsyncSession = Depends(get_db),
+    _admin=Depends(require_admin),
+):
+    job = await db.get(ExportJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Export not found")
+    return job
 
-    c.showPage()
-    c.save()
-    out.seek(0)
 
-    return StreamingResponse(
-        out,
-        media_type="application/pdf",
-        headers={"Content-Disposition": f'attachment; filename="{base_name}.pdf"'}
-    )
+@router.get("/admin/exports/{job_id}/download")
+async def download_export_job(
+    job_id: str,
+    db: AsyncSession = Depends(get_db),
+    _admin=Depends(require_admin),
+):
+    job = await db.get(ExportJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Export not found")
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail=f"Export is {job.status}")
+    if not job.path or not os.path.exists(job.path):
+        raise HTTPException(status_code=410, detail="Export file expired. Please export again.")
+
+    suffix, media_type = EXPORT_FORMATS[job.format]
+    stamp = (job.finished_at or job.created_at).strftime("%Y%m%d_%H%M%S")
+    return FileResponse(job.path, media_type=media_type, filename=f"appointments_{stamp}{suffix}")
@@ -1,88 +1,84 @@
-from fastapi import APIRouter, Depends, UploadFile, File
-from sqlalchemy.orm import Session
-from app.db.session import SessionLocal
-from app.schemas.placement import PlacementOut
+from fastapi import APIRouter, Depends, UploadFile, File, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.schemas.placement import PlacementOut, PlacementTrashOut
 from app.services.placement_service import (
     create_placement,
     get_active_placements,
     get_all_admin_placements,
     deactivate_placement,
     delete_placement,
+    deleted_placements_query,
     get_deleted_placements,
     restore_placement,
     hard_delete_placement,
 )
-from app.api.v1.endpoints._deps import require_admin
+from app.services.content_version import PLACEMENTS, serve_feed
+from app.api.v1.endpoints._deps import get_db, require_admin
+from app.api.v1.endpoints._ndjson import ndjson_response, wants_ndjson
 
 router = APIRouter(prefix="/placements", tags=["Placements"])
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @router.get("/", response_model=list[PlacementOut])
-def list_active_placements(db: Session = Depends(get_db)):
-    return get_active_placements(db)
+async def list_active_placements(request: Request, db: AsyncSession = Depends(get_db)):
+    return await serve_feed(request, db, PLACEMENTS, PlacementOut, get_active_placements)
 
 
-@router.get("/admin")
-def list_admin_placements(
-    db: Session = Depends(get_db),
+@router.get("/admin", response_model=list[PlacementOut])
+async def list_admin_placements(
+    db: AsyncSession = Depends(get_db),
     admin=Depends(require_admin),
 ):
-    return get_all_admin_placements(db)
+    return await get_all_admin_placements(db)
 
 
 @router.post("/", response_model=PlacementOut)
-def upload_placement(
+async def upload_placement(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     admin=Depends(require_admin),
 ):
-    return create_placement(db, file)
+    return await create_placement(db, file)
 
 
 @router.patch("/{placement_id}", response_model=PlacementOut)
-def toggle_active(
+async def toggle_active(
     placement_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     admin=Depends(require_admin),
 ):
-    return deactivate_placement(db, placement_id)
+    return await deactivate_placement(db, placement_id)
 
 
 @router.delete("/{placement_id}", response_model=PlacementOut)
-def soft_delete(
+async def soft_delete(
     placement_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     admin=Depends(require_admin),
 ):
-    return delete_placement(db, placement_id)
+    return await delete_placement(db, placement_id)
 
 
-@router.get("/trash")
-def list_deleted(db: Session = Depends(get_db), admin=Depends(require_admin)):
-    return get_deleted_placements(db)
+@router.get("/trash", response_model=list[PlacementTrashOut])
+async def list_deleted(request: Request, db: AsyncSession = Depends(get_db), admin=Depends(require_admin)):
+    if wants_ndjson(request):
+        return ndjson_response(deleted_placements_query(), PlacementTrashOut)
+    return await get_deleted_placements(db)
 
 
 @router.patch("/restore/{placement_id}", response_model=PlacementOut)
-def restore(
+async def restore(
     placement_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     admin=Depends(require_admin),
 ):
-    return restore_placement(db, placement_id)
+    return await restore_placement(db, placement_id)
 
 
 @router.delete("/trash/{placement_id}")
-def permanent_delete(
+async def permanent_delete(
     placement_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     admin=Depends(require_admin),
 ):
-    return hard_delete_placement(db, placement_id)
+    return await hard_delete_placement(db, placement_id)
@@ -0,0 +1,54 @@
+from fastapi import APIRouter, Depends
+from starlette.concurrency import run_in_threadpool
+
+from app.api.v1.endpoints._deps import require_admin
+from app.core.leader import WORKER_ID, leader_status
+from app.db.schema import schema_registry
+from app.db.session import engine, async_engine, sync_pool_metrics, async_pool_metrics
+
+router = APIRouter()
+
+
+# ==============================
+# Connection Pools
+# ==============================
+@router.get("/admin/system/db-pool")
+async def db_pool_stats(_admin=Depends(require_admin)):
+    """Live pool saturation for this worker: checkouts, overflow, wait histogram, connection ages."""
+    return {
+        "async": async_pool_metrics.snapshot(async_engine.pool),
+        "sync": sync_pool_metrics.snapshot(engine.pool),
+    }
+
+
+@router.post("/admin/system/db-pool/reset")
+async def reset_db_pool_stats(_admin=Depends(require_admin)):
+    """Zero the counters and the wait histogram (live pool state is not touched)."""
+    async_pool_metrics.reset()
+    sync_pool_metrics.reset()
+    return {"detail": "Pool metrics reset"}
+
+
+# ==============================
+# Background Job Leaders
+# ==============================
+@router.get("/admin/system/leaders")
+async def background_leaders(_admin=Depends(require_admin)):
+    """Which worker runs each background job, its last heartbeat and last job tick."""
+    return {"this_worker": WORKER_ID, "leaders": await leader_status()}
+
+
+# ==============================
+# Schema Registry
+# ==============================
+@router.get("/admin/system/schema")
+async def schema_capabilities(_admin=Depends(require_admin)):
+    """Tables and columns this worker believes exist (introspected at startup)."""
+    return schema_registry.snapshot()
+
+
+@router.post("/admin/system/schema/refresh")
+async def refresh_schema_capabilities(_admin=Depends(require_admin)):
+    """Re-introspect after running a migration outside the app (this worker only)."""
+    await run_in_threadpool(schema_registry.refresh)
+    return {"detail": "Schema registry refreshed", "tables": len(schema_registry.snapshot())}
@@ -1,105 +1,130 @@
-import os
 from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy import select, delete, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.api.v1.endpoints._deps import get_db, require_admin
+from app.api.v1.endpoints._ndjson import ndjson_response, wants_ndjson
 from app.models.appointment import Appointment
 from app.models.gallery_post import GalleryPost
 from app.models.event_poster import EventPoster
 from app.schemas.appointment import AppointmentOut
 from app.schemas.gallery import GalleryOut
 from app.schemas.events import EventResponse
+from app.services.appointment_stats import ROLLUP_COLUMNS, bump_appointment_stats
+from app.services.content_version import APPOINTMENTS, EVENTS, GALLERY, bump_content_version, bump_data_version
+from app.services.media_store import delete_post_with_image, image_fields, media_url
 
 router = APIRouter()
 
 # --- Helper: Lazy Cleanup (30 days) ---
-def cleanup_expired_items(db: Session):
+async def cleanup_expired_items(db: AsyncSession):
     cutoff = datetime.now() - timedelta(days=30)
     
     # 1. Appointments
-    db.query(Appointment).filter(Appointment.deleted_at < cutoff).delete(synchronize_session=False)
+    purged = (await db.execute(delete(Appointment).where(Appointment.deleted_at < cutoff))).rowcount
+    if purged:
+        await bump_data_version(db, APPOINTMENTS)
     
     # 2. Gallery (Delete files)
-    old_gallery = db.query(GalleryPost).filter(GalleryPost.deleted_at < cutoff).all()
+    old_gallery = (await db.scalars(select(GalleryPost).where(GalleryPost.deleted_at < cutoff))).all()
     for it in old_gallery:
-        if it.image_path and os.path.exists(it.image_path):
-            try:
-                os.remove(it.image_path)
-            except: pass
-        db.delete(it)
+        await delete_post_with_image(db, it, "gallery")
         
     # 3. Events (Delete files)
-    old_events = db.query(EventPoster).filter(EventPoster.deleted_at < cutoff).all()
+    old_events = (await db.scalars(select(EventPoster).where(EventPoster.deleted_at < cutoff))).all()
     for it in old_events:
-        if it.image_path and os.path.exists(it.image_path):
-            try:
-                os.remove(it.image_path)
-            except: pass
-        db.delete(it)
+        await delete_post_with_image(db, it, "events")
         
-    db.commit()
+    await db.commit()
 
 # --- Listing Deleted Items ---
+# Accept: application/x-ndjson streams each listing one row per line
+
+def _gallery_out(it: GalleryPost) -> GalleryOut:
+    return GalleryOut(
+        id=it.id,
+        image_url=media_url(it.image_path, "gallery"),
+        caption=it.caption,
+        is_active=it.is_active,
+        **image_fields(it)
+    )
+
+def _event_out(it: EventPoster) -> EventResponse:
+    return EventResponse(
+        id=it.id,
+        title=it.title,
+        image_url=media_url(it.image_path, "events"),
+        is_active=it.is_active,
+        starts_at=it.starts_at,
+        ends_at=it.ends_at,
+        created_at=it.created_at,
+        **image_fields(it)
+    )
 
 @router.get("/admin/trash/appointments", response_model=list[AppointmentOut])
-def list_trashed_appointments(db: Session = Depends(get_db), _admin=Depends(require_admin)):
+async def list_trashed_appointments(request: Request, db: AsyncSession = Depends(get_db), _admin=Depends(require_admin)):
     # Trigger cleanup
-    cleanup_expired_items(db)
-    return db.query(Appointment).filter(Appointment.deleted_at.is_not(None)).order_by(Appointment.deleted_at.desc()).all()
+    await cleanup_expired_items(db)
+    qry = select(Appointment).where(Appointment.deleted_at.is_not(None)).order_by(Appointment.deleted_at.desc())
+    if wants_ndjson(request):
+        return ndjson_response(qry, AppointmentOut)
+    return (await db.scalars(qry)).all()
 
 @router.get("/admin/trash/gallery", response_model=list[GalleryOut])
-def list_trashed_gallery(db: Session = Depends(get_db), _admin=Depends(require_admin)):
+async def list_trashed_gallery(request: Request, db: AsyncSession = Depends(get_db), _admin=Depends(require_admin)):
     # Trigger cleanup (optimization: maybe only call on one tab or all?)
     # Calling on all ensures specific items are cleaned if only that tab is visited.
-    cleanup_expired_items(db)
-    items = db.query(GalleryPost).filter(GalleryPost.deleted_at.is_not(None)).order_by(GalleryPost.deleted_at.desc()).all()
-    # Serialize manually or reuse schema logic
-    out = []
-    for it in items:
-        # Note: image_path is absolute. Convert to url.
-        fname = os.path.basename(it.image_path)
-        out.append(GalleryOut(
-            id=it.id,
-             image_url=f"/uploads/gallery/{fname}",
-             caption=it.caption,
-             is_active=it.is_active
-         ))
-    return out
+    await cleanup_expired_items(db)
+    qry = select(GalleryPost).where(GalleryPost.deleted_at.is_not(None)).order_by(GalleryPost.deleted_at.desc())
+    if wants_ndjson(request):
+        return ndjson_response(qry, GalleryOut, _gallery_out)
+    # Note: image_path is absolute. Convert to url.
+    return [_gallery_out(it) for it in (await db.scalars(qry)).all()]
 
 @router.get("/admin/trash/events", response_model=list[EventResponse])
-def list_trashed_events(db: Session = Depends(get_db), _admin=Depends(require_admin)):
-    cleanup_expired_items(db)
-    items = db.query(EventPoster).filter(EventPoster.deleted_at.is_not(None)).order_by(EventPoster.deleted_at.desc()).all()
-    out = []
-    for it in items:
-        fname = os.path.basename(it.image_path)
-        out.append(EventResponse(
-            id=it.id,
-            title=it.title,
-            image_url=f"/uploads/events/{fname}",
-            is_active=it.is_active,
-            starts_at=it.starts_at,
-            ends_at=it.ends_at,
-            created_at=it.created_at
-        ))
-    return out
+async def list_trashed_events(request: Request, db: AsyncSession = Depends(get_db), _admin=Depends(require_admin)):
+    await cleanup_expired_items(db)
+    qry = select(EventPoster).where(EventPoster.deleted_at.is_not(None)).order_by(EventPoster.deleted_at.desc())
+    if wants_ndjson(request):
+        return ndjson_response(qry, EventResponse, _event_out)
+    return [_event_out(it) for it in (await db.scalars(qry)).all()]
 
 # --- Restore ---
 
 @router.post("/admin/trash/{item_type}/{item_id}/restore")
-def restore_item(item_type: str, item_id: int, db: Session = Depends(get_db), _admin=Depends(require_admin)):
+async def restore_item(item_type: str, item_id: int, db: AsyncSession = Depends(get_db), _admin=Depends(require_admin)):
     item_type = item_type.lower()
     
+    # Public feed whose ETag changes when the item comes back
+    feed = None
     if item_type == "appointment":
         model = Appointment
     elif item_type == "gallery":
-        model = GalleryPost
+        model, feed = GalleryPost, GALLERY
     elif item_type == "event":
-        model = EventPoster
+        model, feed = EventPoster, EVENTS
     else:
         raise HTTPException(status_code=400, detail="Invalid item type")
-        
-    item = db.query(model).filter(model.id == item_id).first()
+
+    if model is Appointment:
+        # Conditional UPDATE: only the request that actually restores the row
+        # adds it back to the rollup, however many race
+        restored = (await db.execute(
+            update(Appointment)
+            .where(Appointment.id == item_id, Appointment.deleted_at.is_not(None))
+            .values(deleted_at=None)
+            .returning(*ROLLUP_COLUMNS)
+        )).all()
+        if not restored:
+            if await db.get(Appointment, item_id) is None:
+                raise HTTPException(status_code=404, detail="Item not found")
+            return {"detail": "Item is not in trash"}
+        await bump_appointment_stats(db, restored, +1)
+        await bump_data_version(db, APPOINTMENTS)
+        await db.commit()
+        return {"detail": "Restored successfully"}
+
+    item = await db.get(model, item_id)
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
         
@@ -107,84 +132,80 @@ def restore_item(item_type: str, item_id: int, db: Session = Depends(get_db), _a
         return {"detail": "Item is not in trash"}
         
     item.deleted_at = None
-    db.commit()
+    if feed:
+        await bump_content_version(db, feed)
+    await db.commit()
     return {"detail": "Restored successfully"}
 
 # --- Permanent Delete ---
 
 @router.delete("/admin/trash/{item_type}/{item_id}")
-def permanent_delete_item(item_type: str, item_id: int, db: Session = Depends(get_db), _admin=Depends(require_admin)):
+async def permanent_delete_item(item_type: str, item_id: int, db: AsyncSession = Depends(get_db), _admin=Depends(require_admin)):
     item_type = item_type.lower()
     
     if item_type == "appointment":
-        item = db.query(Appointment).filter(Appointment.id == item_id).first()
-        if not item:
+        # DELETE ... RETURNING: only the request that removed the row adjusts
+        # the rollup, from the state the row was actually in
+        gone = (await db.execute(
+            delete(Appointment)
+            .where(Appointment.id == item_id)
+            .returning(*ROLLUP_COLUMNS, Appointment.deleted_at)
+        )).all()
+        if not gone:
             raise HTTPException(status_code=404, detail="Item not found")
-        db.delete(item)
+        # Trashed rows already left the rollup; live ones leave it now
+        await bump_appointment_stats(db, [r for r in gone if r.deleted_at is None], -1)
+        await bump_data_version(db, APPOINTMENTS)
         
     elif item_type == "gallery":
-        item = db.query(GalleryPost).filter(GalleryPost.id == item_id).first()
+        item = await db.get(GalleryPost, item_id)
         if not item:
              raise HTTPException(status_code=404, detail="Item not found")
         
-        # Delete file
-        if item.image_path and os.path.exists(item.image_path):
-            try:
-                os.remove(item.image_path)
-            except OSError:
-                pass
-        db.delete(item)
+        # Delete file + variants
+        await delete_post_with_image(db, item, "gallery")
+        await bump_content_version(db, GALLERY)
         
     elif item_type == "event":
-        item = db.query(EventPoster).filter(EventPoster.id == item_id).first()
+        item = await db.get(EventPoster, item_id)
         if not item:
              raise HTTPException(status_code=404, detail="Item not found")
         
-        # Delete file
-        if item.image_path and os.path.exists(item.image_path):
-            try:
-                os.remove(item.image_path)
-            except OSError:
-                pass
-        db.delete(item)
+        # Delete file + variants
+        await delete_post_with_image(db, item, "events")
+        await bump_content_version(db, EVENTS)
         
     else:
         raise HTTPException(status_code=400, detail="Invalid item type")
         
-    db.commit()
+    await db.commit()
     return {"detail": "Permanently deleted"}
     
 # --- Batch Empty ---
 @router.delete("/admin/trash/empty")
-def empty_trash(db: Session = Depends(get_db), _admin=Depends(require_admin)):
+async def empty_trash(db: AsyncSession = Depends(get_db), _admin=Depends(require_admin)):
     # Delete all items where deleted_at IS NOT NULL
     # But for gallery and events we must delete files too.
     
     # 1. Gallery
-    gallery_items = db.query(GalleryPost).filter(GalleryPost.deleted_at.is_not(None)).all()
+    gallery_items = (await db.scalars(select(GalleryPost).where(GalleryPost.deleted_at.is_not(None)))).all()
     count_g = 0
     for it in gallery_items:
-        if it.image_path and os.path.exists(it.image_path):
-            try:
-                os.remove(it.image_path)
-            except: pass
-        db.delete(it)
+        await delete_post_with_image(db, it, "gallery")
         count_g += 1
         
     # 2. Events
-    event_items = db.query(EventPoster).filter(EventPoster.deleted_at.is_not(None)).all()
+    event_items = (await db.scalars(select(EventPoster).where(EventPoster.deleted_at.is_not(None)))).all()
     count_e = 0
     for it in event_items:
-        if it.image_path and os.path.exists(it.image_path):
-            try:
-                os.remove(it.image_path)
-            except: pass
-        db.delete(it)
+        await delete_post_with_image(db, it, "events")
         count_e += 1
         
     # 3. Appointments
-    res = db.query(Appointment).filter(Appointment.deleted_at.is_not(None)).delete(synchronize_session=False)
+    res = (await db.execute(delete(Appointment).where(Appointment.deleted_at.is_not(None)))).rowcount
+    if res:
+        await bump_data_version(db, APPOINTMENTS)
     
-    db.commit()
+    await db.commit()
     
     return {"detail": f"Trash empty. Deleted: {res} appointments, {count_g} gallery images, {count_e} events."}
@@ -17,3 +17,5 @@ api_router.include_router(events_router, tags=["events"])
 from app.api.v1.endpoints.trash import router as trash_router
 api_router.include_router(trash_router, tags=["trash"])
 api_router.include_router(placements_router)
+from app.api.v1.endpoints.system import router as system_router
+api_router.include_router(system_router, tags=["system"])
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -39,6 +40,17 @@ if not DATABASE_URL:
     DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
 
+# --- Connection pool (per engine, per worker) ---
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Seconds before a connection is replaced on checkout; -1 keeps connections forever
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# always: ping on every checkout | idle: ping only after DB_POOL_PRE_PING_IDLE_S idle | never
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "always").strip().lower()
+if DB_POOL_PRE_PING not in ("always", "idle", "never"):
+    raise RuntimeError("DB_POOL_PRE_PING must be one of: always, idle, never")
+DB_POOL_PRE_PING_IDLE_S = float(os.getenv("DB_POOL_PRE_PING_IDLE_S", "30"))
 
 SECRET_KEY = os.getenv("SECRET_KEY") or os.getenv("JWT_SECRET")
 if not SECRET_KEY:
@@ -47,8 +59,65 @@ if not SECRET_KEY:
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "1440"))
 
-UPLOAD_DIR = os.getenv("UPLOAD_DIR", "static_uploads/gallery")
+# --- Media storage: "local" (MEDIA_ROOT, served at /uploads) or "s3" (any S3 API endpoint) ---
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local").lower()
+if STORAGE_BACKEND not in ("local", "s3"):
+    raise RuntimeError("STORAGE_BACKEND must be one of: local, s3")
+MEDIA_ROOT = os.getenv("MEDIA_ROOT") or str(Path(__file__).resolve().parents[1] / "static_uploads")
+S3_BUCKET = os.getenv("S3_BUCKET")
+if STORAGE_BACKEND == "s3" and not S3_BUCKET:
+    raise RuntimeError("Missing required env var: S3_BUCKET (STORAGE_BACKEND=s3)")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None
+S3_REGION = os.getenv("S3_REGION") or None
+S3_ACCESS_KEY_ID = os.getenv("S3_ACCESS_KEY_ID") or None
+S3_SECRET_ACCESS_KEY = os.getenv("S3_SECRET_ACCESS_KEY") or None
+S3_PUBLIC_URL = os.getenv("S3_PUBLIC_URL") or None
+
+# --- Local media serving (/uploads): open-file / stat cache and browser max-age ---
+MEDIA_CACHE_MAXSIZE = int(os.getenv("MEDIA_CACHE_MAXSIZE", "1024"))
+MEDIA_CACHE_TTL_S = float(os.getenv("MEDIA_CACHE_TTL_S", "30"))
+MEDIA_MAX_AGE_S = int(os.getenv("MEDIA_MAX_AGE_S", "31536000"))
 MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "10"))
 
+# --- Public appointment ingestion (write-behind batching, off by default) ---
+APPOINTMENT_BATCH_MODE = os.getenv("APPOINTMENT_BATCH_MODE", "false").lower() == "true"
+APPOINTMENT_BATCH_SIZE = int(os.getenv("APPOINTMENT_BATCH_SIZE", "100"))
+APPOINTMENT_BATCH_MAX_WAIT_MS = int(os.getenv("APPOINTMENT_BATCH_MAX_WAIT_MS", "50"))
+APPOINTMENT_QUEUE_MAXSIZE = int(os.getenv("APPOINTMENT_QUEUE_MAXSIZE", "2000"))
+APPOINTMENT_QUEUE_TIMEOUT_MS = int(os.getenv("APPOINTMENT_QUEUE_TIMEOUT_MS", "2000"))
+
+# --- Public feed cache (events / gallery / placements responses) ---
+FEED_CACHE_TTL_S = float(os.getenv("FEED_CACHE_TTL_S", "300"))
+FEED_CACHE_MAXSIZE = int(os.getenv("FEED_CACHE_MAXSIZE", "64"))
+
+# --- Responsive image variants rendered at upload ---
+IMAGE_VARIANT_WIDTHS = [int(w) for w in os.getenv("IMAGE_VARIANT_WIDTHS", "320,640,960,1280,1920").split(",") if w.strip()]
+IMAGE_VARIANT_FORMATS = [f.strip().lower() for f in os.getenv("IMAGE_VARIANT_FORMATS", "avif,webp").split(",") if f.strip()]
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+
+# --- Appointment exports: rows fetched per server-side cursor batch ---
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+# PDF pages are rendered PDF_CHUNK_ROWS rows at a time in EXPORT_WORKERS processes
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "2"))
+PDF_CHUNK_ROWS = int(os.getenv("PDF_CHUNK_ROWS", "1000"))
+# Background export jobs: concurrent jobs, queue bound, where files go and how long they are kept
+EXPORT_JOB_WORKERS = int(os.getenv("EXPORT_JOB_WORKERS", "2"))
+EXPORT_JOB_QUEUE = int(os.getenv("EXPORT_JOB_QUEUE", "20"))
+EXPORT_DIR = os.getenv("EXPORT_DIR") or os.path.join(tempfile.gettempdir(), "kanglei-exports")
+EXPORT_TTL_S = int(os.getenv("EXPORT_TTL_S", "86400"))
+# Queued / running jobs whose worker has not heartbeated for this long are marked failed
+EXPORT_JOB_STALE_S = int(os.getenv("EXPORT_JOB_STALE_S", "120"))
+
+# --- Rate limiting: "memory" (per worker, LRU of RATE_LIMIT_MAXSIZE clients) or "database" (shared) ---
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+RATE_LIMIT_MAXSIZE = int(os.getenv("RATE_LIMIT_MAXSIZE", "10000"))
+# Per-route overrides as name=requests/seconds, e.g. "appointments=100/600,login=20/300"
+RATE_LIMITS = os.getenv("RATE_LIMITS", "")
+# Proxies (IPs / CIDRs) whose X-Forwarded-For is believed when resolving the client IP
+TRUSTED_PROXIES = [p.strip() for p in os.getenv("TRUSTED_PROXIES", "127.0.0.1,::1").split(",") if p.strip()]
+
+# --- Background jobs: leader heartbeat / election retry interval (seconds) ---
+LEADER_HEARTBEAT_S = float(os.getenv("LEADER_HEARTBEAT_S", "5"))
+
 BOOTSTRAP_ADMIN_USERNAME = os.getenv("BOOTSTRAP_ADMIN_USERNAME", "admin")
 BOOTSTRAP_ADMIN_PASSWORD = os.getenv("BOOTSTRAP_ADMIN_PASSWORD", "Admin@12345")
@@ -0,0 +1,241 @@
+import asyncio
+import hashlib
+import logging
+import os
+import socket
+import tempfile
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+
+from app.core.config import DATABASE_URL, LEADER_HEARTBEAT_S
+from app.db.session import AsyncSessionLocal, async_engine, connect_asyncpg
+from app.models.job_leader import JobLeader
+
+logger = logging.getLogger(__name__)
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _lock_key(role: str) -> int:
+    # Signed 64-bit key for pg_try_advisory_lock
+    return int.from_bytes(hashlib.sha1(f"leader:{role}".encode("utf-8")).digest()[:8], "big", signed=True)
+
+
+# ==============================
+# Lock Backends
+# ==============================
+class _AdvisoryLock:
+    """
+    Session level Postgres advisory lock on a dedicated connection: held while
+    that connection lives, released by the server the moment the worker dies.
+    """
+
+    def __init__(self, role: str):
+        self.key = _lock_key(role)
+        self._conn = None
+
+    async def acquire(self) -> bool:
+        conn = await connect_asyncpg()
+        try:
+            if await conn.fetchval("SELECT pg_try_advisory_lock($1)", self.key):
+                self._conn = conn
+                return True
+        except Exception:
+            await conn.close()
+            raise
+        await conn.close()
+        return False
+
+    async def held(self) -> bool:
+        if self._conn is None or self._conn.is_closed():
+            return False
+        try:
+            await asyncio.wait_for(self._conn.fetchval("SELECT 1"), timeout=LEADER_HEARTBEAT_S)
+            return True
+        except Exception:
+            return False
+
+    async def release(self):
+        conn, self._conn = self._conn, None
+        if conn is not None and not conn.is_closed():
+            # Closing the session drops the lock even if the unlock itself fails
+            try:
+                await conn.execute("SELECT pg_advisory_unlock($1)", self.key)
+            except Exception:
+                pass
+            await conn.close()
+
+
+class _FileLock:
+    """
+    flock() on a file next to the SQLite database; the OS releases it when the
+    process exits. Without fcntl (Windows) every process leads, which matches
+    the single process setups SQLite is used for.
+    """
+
+    def __init__(self, role: str):
+        db_path = make_url(DATABASE_URL).database
+        if db_path and db_path != ":memory:":
+            base = os.path.abspath(db_path)
+        else:
+            base = os.path.join(tempfile.gettempdir(), "kanglei")
+        self.path = f"{base}.{role}.lock"
+        self._fd = None
+
+    async def acquire(self) -> bool:
+        try:
+            import fcntl
+        except ImportError:
+            return True
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    async def held(self) -> bool:
+        return True
+
+    async def release(self):
+        fd, self._fd = self._fd, None
+        if fd is not None:
+            # Closing the descriptor drops the flock
+            os.close(fd)
+
+
+# ==============================
+# Election
+# ==============================
+class LeaderElection:
+    """
+    Runs a background job in exactly one worker.
+
+    Every worker tries the role's lock every LEADER_HEARTBEAT_S seconds; the
+    holder runs `on_elected`, re-checks its lock and publishes a heartbeat
+    (plus the job's last tick) to job_leaders at the same interval. When the
+    leader dies its lock is released and the next attempt elsewhere takes over.
+    A leader that loses its lock connection demotes itself on the next check;
+    jobs run under it must therefore tolerate a brief overlap (the event
+    scheduler's conditional UPDATEs do).
+    """
+
+    def __init__(self, role: str, on_elected, on_demoted, last_tick=None):
+        self.role = role
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.last_tick = last_tick
+        self.is_leader = False
+        self.elected_at: datetime | None = None
+        # Last tick the previous leader published; lets the successor resume from it
+        self.previous_tick: datetime | None = None
+        self._lock = None
+        self._task: asyncio.Task | None = None
+
+    def _new_lock(self):
+        if async_engine.dialect.name == "postgresql":
+            return _AdvisoryLock(self.role)
+        return _FileLock(self.role)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._demote()
+
+    async def _run(self):
+        while True:
+            try:
+                if not self.is_leader:
+                    await self._campaign()
+                elif await self._lock.held():
+                    await self._publish()
+                else:
+                    logger.warning(f"Lost leadership of {self.role}")
+                    await self._demote()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Leader election for {self.role} failed: {e}")
+            await asyncio.sleep(LEADER_HEARTBEAT_S)
+
+    async def _campaign(self):
+        lock = self._new_lock()
+        if not await lock.acquire():
+            return
+        self._lock = lock
+        self.is_leader = True
+        self.elected_at = datetime.now().astimezone()
+        async with AsyncSessionLocal() as db:
+            self.previous_tick = await db.scalar(
+                select(JobLeader.last_tick_at).where(JobLeader.role == self.role)
+            )
+        logger.info(f"{WORKER_ID} is now leader for {self.role}")
+        await _maybe_await(self.on_elected())
+        await self._publish()
+
+    async def _demote(self):
+        if not self.is_leader:
+            return
+        self.is_leader = False
+        try:
+            await _maybe_await(self.on_demoted())
+            # Hand the final tick to the successor (best effort: the DB may be what failed)
+            await self._publish()
+        except Exception as e:
+            logger.error(f"Leader hand-over for {self.role} failed: {e}")
+        finally:
+            lock, self._lock = self._lock, None
+            await lock.release()
+
+    async def _publish(self):
+        tick = (self.last_tick() if self.last_tick else None) or self.previous_tick
+        async with AsyncSessionLocal() as db:
+            await db.merge(JobLeader(
+                role=self.role,
+                worker=WORKER_ID,
+                elected_at=self.elected_at,
+                heartbeat_at=datetime.now().astimezone(),
+                last_tick_at=tick.astimezone() if tick else None,
+            ))
+            await db.commit()
+
+
+async def _maybe_await(result):
+    if asyncio.iscoroutine(result):
+        await result
+
+
+async def leader_status() -> list[dict]:
+    """Every role's published leader, with liveness judged from its heartbeat age."""
+    now = datetime.now().astimezone()
+    async with AsyncSessionLocal() as db:
+        rows = (await db.scalars(select(JobLeader).order_by(JobLeader.role))).all()
+
+    out = []
+    for r in rows:
+        heartbeat = r.heartbeat_at if r.heartbeat_at.tzinfo else r.heartbeat_at.astimezone()
+        out.append({
+            "role": r.role,
+            "worker": r.worker,
+            "elected_at": r.elected_at,
+            "heartbeat_at": r.heartbeat_at,
+            "last_tick_at": r.last_tick_at,
+            # Missed three heartbeats: presumed dead until a successor publishes
+            "alive": (now - heartbeat).total_seconds() < 3 * LEADER_HEARTBEAT_S,
+            "is_this_worker": r.worker == WORKER_ID,
+        })
+    return out
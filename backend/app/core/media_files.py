@@ -0,0 +1,358 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import formatdate
+from mimetypes import guess_type
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+
+from app.core.cache import TTLCache
+from app.core.config import MEDIA_CACHE_MAXSIZE, MEDIA_CACHE_TTL_S, MEDIA_MAX_AGE_S
+from app.utils.http_cache import is_not_modified
+
+# Upload names never change meaning (content hashes / random ids): cache for good
+CACHE_CONTROL = f"public, max-age={MEDIA_MAX_AGE_S}, immutable"
+
+# Alternate image formats by preference; rendered next to the original by the variant pipeline
+ALTERNATE_FORMATS = (("avif", "image/avif"), ("webp", "image/webp"))
+
+# Precompressed siblings (e.g. logo.svg.br) for Accept-Encoding
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+# ==============================
+# Open File Cache
+# ==============================
+class _OpenFile:
+    """
+    An open descriptor plus its stat. Requests lease it while they read;
+    an evicted entry closes once its last reader is done.
+    """
+
+    def __init__(self, path: str, fd: int, stat_result: os.stat_result):
+        self.path = path
+        self.fd = fd
+        self.stat = stat_result
+        self._users = 0
+        self._retired = False
+        self._lock = threading.Lock()
+
+    def lease(self) -> bool:
+        with self._lock:
+            if self._retired:
+                return False
+            self._users += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._users -= 1
+            close = self._retired and self._users == 0
+        if close:
+            os.close(self.fd)
+
+    def retire(self):
+        with self._lock:
+            if self._retired:
+                return
+            self._retired = True
+            close = self._users == 0
+        if close:
+            os.close(self.fd)
+
+
+class OpenFileCache:
+    """LRU of open files with a TTL, so a replaced or deleted file is noticed within `ttl` seconds."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lease(self, path: str) -> _OpenFile | None:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(path)
+            if item is not None:
+                expires_at, entry = item
+                if expires_at > now and entry.lease():
+                    self._data.move_to_end(path)
+                    self.hits += 1
+                    return entry
+                del self._data[path]
+                entry.retire()
+            self.misses += 1
+        return None
+
+    def open(self, path: str) -> _OpenFile:
+        """Open + fstat `path` (blocking) and cache it. Returned already leased."""
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            st = os.fstat(fd)
+        except OSError:
+            os.close(fd)
+            raise
+        entry = _OpenFile(path, fd, st)
+        entry.lease()
+
+        with self._lock:
+            old = self._data.pop(path, None)
+            self._data[path] = (time.monotonic() + self.ttl, entry)
+            evicted = [old[1]] if old else []
+            while len(self._data) > self.maxsize:
+                evicted.append(self._data.popitem(last=False)[1][1])
+        for e in evicted:
+            e.retire()
+        return entry
+
+    def clear(self):
+        with self._lock:
+            entries = [entry for _, entry in self._data.values()]
+            self._data.clear()
+        for e in entries:
+            e.retire()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+
+# ==============================
+# Response
+# ==============================
+class _OpenFileResponse(Response):
+    """
+    Streams a leased descriptor with os.pread in the threadpool: no open,
+    seek or stat per request. Built on the public Response API only; serves
+    the whole file, a single byte range (any other Range form gets the whole
+    file) and HEAD.
+    """
+
+    chunk_size = 64 * 1024
+
+    def __init__(self, entry: _OpenFile, media_type: str, headers: dict):
+        st = entry.stat
+        tag = hashlib.md5(f"{st.st_mtime}-{st.st_size}".encode(), usedforsecurity=False).hexdigest()
+        super().__init__(
+            media_type=media_type,
+            headers={
+                **headers,
+                "content-length": str(st.st_size),
+                "last-modified": formatdate(st.st_mtime, usegmt=True),
+                "etag": f'"{tag}"',
+                "accept-ranges": "bytes",
+            },
+        )
+        self.fd = entry.fd
+        self.size = st.st_size
+
+    def _range(self, scope) -> tuple[int, int] | None | bool:
+        """(start, end) of a satisfiable single range, None for the whole file, False if unsatisfiable."""
+        headers = Headers(scope=scope)
+        spec = headers.get("range")
+        if not spec:
+            return None
+        if_range = headers.get("if-range")
+        if if_range and if_range not in (self.headers["etag"], self.headers["last-modified"]):
+            return None
+
+        unit, _, ranges = spec.partition("=")
+        if unit.strip().lower() != "bytes" or "," in ranges:
+            return None
+        first, sep, last = ranges.strip().partition("-")
+        try:
+            if not sep:
+                return None
+            if first:
+                start = int(first)
+                end = min(int(last) + 1, self.size) if last else self.size
+            else:
+                start, end = max(0, self.size - int(last)), self.size
+        except ValueError:
+            return None
+        if start >= end:
+            return False
+        return start, end
+
+    async def __call__(self, scope, receive, send):
+        start, end = 0, self.size
+        rng = self._range(scope) if self.status_code == 200 else None
+        if rng is False:
+            self.status_code = 416
+            self.headers["content-range"] = f"bytes */{self.size}"
+            self.headers["content-length"] = "0"
+            start = end
+        elif rng:
+            start, end = rng
+            self.status_code = 206
+            self.headers["content-range"] = f"bytes {start}-{end - 1}/{self.size}"
+            self.headers["content-length"] = str(end - start)
+
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"] == "HEAD" or start >= end:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        while True:
+            chunk = await run_in_threadpool(os.pread, self.fd, min(self.chunk_size, end - start), start)
+            start += len(chunk)
+            more_body = bool(chunk) and start < end
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+            if not more_body:
+                return
+
+
+# ==============================
+# Negotiation
+# ==============================
+def _accepted(header: str | None, token: str) -> bool:
+    """`token` listed in an Accept / Accept-Encoding header with a non-zero q."""
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() != token:
+            continue
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                return float(q[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+def _image_width(path: str) -> int | None:
+    """Displayed width (after EXIF rotation, as the variants are rendered) from the header only."""
+    from PIL import Image
+
+    try:
+        with Image.open(path) as im:
+            rotated = im.getexif().get(0x0112) in (5, 6, 7, 8)
+            return im.height if rotated else im.width
+    except Exception:
+        return None
+
+
+def _alternatives(path: str) -> dict:
+    """Same-size alternate formats and precompressed siblings of `path` present on disk."""
+    out = {}
+    stem, ext = os.path.splitext(path)
+    if ext.lower() not in {f".{fmt}" for fmt, _ in ALTERNATE_FORMATS}:
+        width = _image_width(path) if (guess_type(path)[0] or "").startswith("image/") else None
+        for fmt, _ in ALTERNATE_FORMATS:
+            candidate = f"{stem}_{width}.{fmt}"
+            if width and os.path.isfile(candidate):
+                out[fmt] = candidate
+    for encoding, suffix in ENCODINGS:
+        if os.path.isfile(path + suffix):
+            out[encoding] = path + suffix
+    return out
+
+
+# ==============================
+# ASGI App
+# ==============================
+class MediaFiles:
+    """
+    Serves LocalStorage keys (mounted at /uploads), replacing StaticFiles:
+    - Cache-Control immutable, ETag / Last-Modified and 304s
+    - single byte ranges and HEAD, read from the cached descriptor
+    - Accept negotiation: an AVIF / WebP rendering of the same size, or a
+      precompressed .br / .gz sibling, when the client takes it
+    - open descriptors and negotiation results cached per file, so hot
+      images cost no open() / stat() per request
+    """
+
+    def __init__(self, storage, maxsize: int = MEDIA_CACHE_MAXSIZE, ttl: float = MEDIA_CACHE_TTL_S):
+        self.storage = storage
+        self.files = OpenFileCache(maxsize=maxsize, ttl=ttl)
+        self._alternatives = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def _resolve(self, scope) -> str | None:
+        path = scope["path"]
+        root = scope.get("root_path", "")
+        if root and path.startswith(root):
+            path = path[len(root):]
+        parts = [p for p in path.split("/") if p]
+        # Dot segments hide the staging area and any dotfiles
+        if not parts or any(p.startswith(".") for p in parts):
+            return None
+        try:
+            return self.storage.local_path("/".join(parts))
+        except ValueError:
+            return None
+
+    async def _lease(self, path: str) -> _OpenFile | None:
+        entry = self.files.lease(path)
+        if entry is not None:
+            return entry
+        try:
+            return await run_in_threadpool(self.files.open, path)
+        except (FileNotFoundError, NotADirectoryError, IsADirectoryError):
+            return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        if scope["method"] not in ("GET", "HEAD"):
+            return await PlainTextResponse("Method Not Allowed", status_code=405)(scope, receive, send)
+
+        path = self._resolve(scope)
+        if path is None:
+            return await PlainTextResponse("Not Found", status_code=404)(scope, receive, send)
+
+        alternatives = self._alternatives.get(path)
+        if alternatives is None:
+            alternatives = await run_in_threadpool(_alternatives, path)
+            self._alternatives.set(path, alternatives)
+
+        headers = Headers(scope=scope)
+        serve_path, media_type, encoding = path, guess_type(path)[0], None
+        for fmt, mime in ALTERNATE_FORMATS:
+            if fmt in alternatives and _accepted(headers.get("accept"), mime):
+                serve_path, media_type = alternatives[fmt], mime
+                break
+        else:
+            for enc, _ in ENCODINGS:
+                if enc in alternatives and _accepted(headers.get("accept-encoding"), enc):
+                    serve_path, encoding = alternatives[enc], enc
+                    break
+
+        entry = await self._lease(serve_path)
+        if entry is None:
+            self._alternatives.pop(path)
+            return await PlainTextResponse("Not Found", status_code=404)(scope, receive, send)
+
+        try:
+            response_headers = {"Cache-Control": CACHE_CONTROL}
+            vary = [h for h, present in (
+                ("Accept", any(fmt in alternatives for fmt, _ in ALTERNATE_FORMATS)),
+                ("Accept-Encoding", any(enc in alternatives for enc, _ in ENCODINGS)),
+            ) if present]
+            if vary:
+                response_headers["Vary"] = ", ".join(vary)
+            if encoding:
+                response_headers["Content-Encoding"] = encoding
+
+            response = _OpenFileResponse(
+                entry,
+                media_type=media_type or "application/octet-stream",
+                headers=response_headers,
+            )
+            last_modified = datetime.fromtimestamp(entry.stat.st_mtime, timezone.utc)
+            if is_not_modified(Request(scope), response.headers["etag"], last_modified):
+                not_modified = {k: v for k, v in response.headers.items()
+                                if k in ("etag", "cache-control", "vary", "last-modified")}
+                response = Response(status_code=304, headers=not_modified)
+            await response(scope, receive, send)
+        finally:
+            entry.release()
+
@@ -1,35 +1,260 @@
+import ipaddress
+import logging
+import math
+import threading
 import time
-from collections import defaultdict, deque
-from fastapi import Request, HTTPException
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from fastapi import HTTPException, Request, Response
+from sqlalchemy import case, delete, select
+
+from app.core.config import RATE_LIMIT_BACKEND, RATE_LIMIT_MAXSIZE, RATE_LIMITS, TRUSTED_PROXIES
+from app.db.session import AsyncSessionLocal
+from app.models.rate_limit import RateLimitState
+
+logger = logging.getLogger(__name__)
+
+# Expired rows are deleted from the rate_limits table at most this often (per worker)
+SWEEP_INTERVAL_S = 60.0
+
+
+# ==============================
+# Client IP
+# ==============================
+def _networks(entries) -> list:
+    networks = []
+    for entry in entries:
+        try:
+            networks.append(ipaddress.ip_network(entry, strict=False))
+        except ValueError:
+            logger.warning(f"Ignoring invalid TRUSTED_PROXIES entry: {entry!r}")
+    return networks
+
+
+_TRUSTED = _networks(TRUSTED_PROXIES)
+
+
+def _is_trusted(host: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(ip in net for net in _TRUSTED)
 
-# In-memory sliding window: {ip: deque[timestamps]}
-_BUCKETS = defaultdict(deque)
 
 def get_client_ip(request: Request) -> str:
-    # If later behind nginx, you can trust X-Forwarded-For (only if nginx sets it)
+    """
+    The peer address, unless the peer is a trusted proxy: then X-Forwarded-For
+    is read from the right, skipping trusted hops, and the first address not
+    in TRUSTED_PROXIES is the client. Entries left of it are whatever the
+    client chose to send and are never believed.
+    """
+    peer = request.client.host if request.client else "unknown"
     xff = request.headers.get("x-forwarded-for")
-    if xff:
-        return xff.split(",")[0].strip()
-    return request.client.host if request.client else "unknown"
+    if not xff or not _is_trusted(peer):
+        return peer
+
+    hops = [h.strip() for h in xff.split(",") if h.strip()]
+    for hop in reversed(hops):
+        if not _is_trusted(hop):
+            return hop
+    return hops[0] if hops else peer
+
+
+# ==============================
+# Policies
+# ==============================
+@dataclass(frozen=True)
+class RateLimitPolicy:
+    """
+    `limit` requests per `window_s` seconds, enforced with GCRA: a client may
+    burst the whole quota at once, after which it earns one request back
+    every `window_s / limit` seconds.
+    """
+    name: str
+    limit: int
+    window_s: float
+
+    @property
+    def interval(self) -> float:
+        return self.window_s / self.limit
+
+    @property
+    def tolerance(self) -> float:
+        return self.interval * (self.limit - 1)
+
+
+def _overrides(spec: str) -> dict:
+    """Parse RATE_LIMITS ("appointments=100/600,login=20/300") into {name: (limit, window_s)}."""
+    out = {}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        try:
+            name, value = part.split("=", 1)
+            limit, window = value.split("/", 1)
+            out[name.strip()] = (int(limit), float(window))
+        except ValueError:
+            logger.warning(f"Ignoring invalid RATE_LIMITS entry: {part.strip()!r}")
+    return out
+
+
+_OVERRIDES = _overrides(RATE_LIMITS)
+
+
+def get_policy(name: str, max_requests: int, window_seconds: float) -> RateLimitPolicy:
+    """The route's default limit, unless RATE_LIMITS overrides it by name."""
+    limit, window = _OVERRIDES.get(name, (max_requests, window_seconds))
+    return RateLimitPolicy(name=name, limit=max(1, limit), window_s=window)
+
+
+@dataclass
+class RateLimitResult:
+    policy: RateLimitPolicy
+    allowed: bool
+    # The client's theoretical arrival time after this request
+    tat: float
+    now: float
 
-def rate_limit(max_requests: int = 5, window_seconds: int = 600):
-    def _dep(request: Request):
-        ip = get_client_ip(request)
+    @property
+    def remaining(self) -> int:
+        if not self.allowed:
+            return 0
+        # Requests still allowed right now; the small epsilon absorbs float error
+        left = (self.now + self.policy.tolerance + self.policy.interval - self.tat) / self.policy.interval
+        return max(0, math.floor(left + 1e-9))
+
+    @property
+    def reset(self) -> int:
+        """Seconds until the full quota is available again."""
+        return max(0, math.ceil(self.tat - self.now))
+
+    @property
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.tat - self.now - self.policy.tolerance))
+
+    def headers(self) -> dict:
+        headers = {
+            "RateLimit-Limit": str(self.policy.limit),
+            "RateLimit-Remaining": str(self.remaining),
+            "RateLimit-Reset": str(self.reset),
+            "RateLimit-Policy": f"{self.policy.limit};w={int(self.policy.window_s)}",
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(self.retry_after)
+        return headers
+
+
+# ==============================
+# Backends
+# ==============================
+class MemoryBackend:
+    """
+    One float per client in an LRU bounded by `maxsize`: a flood of new
+    addresses evicts the least recently seen ones (mostly idle, whose quota is
+    already full) instead of growing without limit. Per worker: with N
+    workers a client can get up to N times the limit.
+    """
+
+    def __init__(self, maxsize: int = RATE_LIMIT_MAXSIZE):
+        self.maxsize = maxsize
+        self._tats: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def hit(self, key: str, policy: RateLimitPolicy, now: float) -> tuple[bool, float]:
+        with self._lock:
+            tat = max(self._tats.pop(key, now), now)
+            allowed = tat - now <= policy.tolerance
+            if allowed:
+                tat += policy.interval
+            self._tats[key] = tat
+            while len(self._tats) > self.maxsize:
+                self._tats.popitem(last=False)
+        return allowed, tat
+
+    def __len__(self) -> int:
+        return len(self._tats)
+
+
+def _upsert_for(db):
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+class DatabaseBackend:
+    """
+    GCRA state in the rate_limits table, so every worker (and host) shares
+    one limit. Each request is a single atomic upsert: the new arrival time
+    is computed in SQL and only written when the request is allowed.
+    Rows that have gone idle are swept every SWEEP_INTERVAL_S.
+    """
+
+    def __init__(self):
+        self._last_sweep = 0.0
+
+    async def hit(self, key: str, policy: RateLimitPolicy, now: float) -> tuple[bool, float]:
+        table = RateLimitState.__table__
+        async with AsyncSessionLocal() as db:
+            start = case((table.c.tat > now, table.c.tat), else_=now)
+            stmt = _upsert_for(db)(table).values(key=key, tat=now + policy.interval)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.key],
+                set_={"tat": start + policy.interval},
+                where=start - now <= policy.tolerance,
+            ).returning(table.c.tat)
+            tat = (await db.execute(stmt)).scalar()
+            allowed = tat is not None
+            if not allowed:
+                tat = await db.scalar(select(table.c.tat).where(table.c.key == key))
+
+            if now - self._last_sweep >= SWEEP_INTERVAL_S:
+                self._last_sweep = now
+                await db.execute(delete(table).where(table.c.tat < now))
+            await db.commit()
+        return allowed, tat
+
+
+# ==============================
+# Limiter
+# ==============================
+class RateLimiter:
+    def __init__(self, backend):
+        self.backend = backend
+
+    async def hit(self, policy: RateLimitPolicy, client: str) -> RateLimitResult:
         now = time.time()
-        q = _BUCKETS[ip]
+        try:
+            allowed, tat = await self.backend.hit(f"{policy.name}:{client}", policy, now)
+        except Exception as e:
+            # A limiter outage must not take the routes down with it
+            logger.warning(f"Rate limiter unavailable, allowing request: {e}")
+            return RateLimitResult(policy, True, now + policy.interval, now)
+        return RateLimitResult(policy, allowed, tat, now)
+
+
+limiter = RateLimiter(DatabaseBackend() if RATE_LIMIT_BACKEND == "database" else MemoryBackend())
 
-        # drop old timestamps
-        cutoff = now - window_seconds
-        while q and q[0] < cutoff:
-            q.popleft()
 
-        if len(q) >= max_requests:
+def rate_limit(name: str, max_requests: int = 5, window_seconds: int = 600):
+    """
+    Dependency limiting a route per client IP under the policy `name`
+    (overridable through RATE_LIMITS). Sets the RateLimit-* headers on the
+    response; over the limit it raises 429 with Retry-After.
+    """
+    policy = get_policy(name, max_requests, window_seconds)
+
+    async def _dep(request: Request, response: Response):
+        result = await limiter.hit(policy, get_client_ip(request))
+        if not result.allowed:
             raise HTTPException(
                 status_code=429,
-                detail=f"Too many requests. Try again later."
+                detail="Too many requests. Try again later.",
+                headers=result.headers(),
             )
-
-        q.append(now)
-        return True
+        response.headers.update(result.headers())
 
     return _dep
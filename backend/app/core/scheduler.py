@@ -1,63 +1,190 @@
 import asyncio
+import heapq
 import logging
 from datetime import datetime
-from sqlalchemy.orm import Session
-from app.db.session import SessionLocal
+from sqlalchemy import select, update, or_
+from app.core.leader import LeaderElection
+from app.db.session import AsyncSessionLocal
 from app.models.event_poster import EventPoster
+from app.services.content_version import EVENTS, bump_content_version
+from app.services.feed_cache import subscribe_invalidation
 
 logger = logging.getLogger(__name__)
 
-async def activate_scheduled_events():
-    """Activate events that are inactive and whose start time has passed (and not trashed)."""
-    db: Session = SessionLocal()
-    try:
-        # Use naive datetime.now() to match likely naive storage in DB (if stored as UTC by default)
-        # This aligns strict comparison if DB assumed input was UTC.
-        now = datetime.now()
+START, END = "start", "end"
+
+# Upper bound on one sleep: a periodic resync also absorbs wall clock jumps
+MAX_SLEEP_S = 3600
+
+
+def _local_naive(ts: datetime) -> datetime:
+    # Matches the naive datetime.now() the rest of the events code compares against
+    return ts.astimezone().replace(tzinfo=None) if ts.tzinfo else ts
+
+
+class EventScheduler:
+    """
+    Timer driven event poster transitions.
+
+    Keeps a min-heap of upcoming (time, kind, event id) transitions loaded
+    from the DB and sleeps exactly until the next one: starts_at activates a
+    poster, ends_at deactivates it. Any committed change to the events feed
+    (in this or another worker) wakes it to reload the heap.
+
+    Activation is level-triggered, as the original polling loop was: every
+    run turns on each inactive poster whose start has passed and whose window
+    is still open, including one uploaded inactive with a past start or
+    rescheduled into the past. Deactivation fires once, for the window
+    (last run, now], so a poster an admin re-enables after its end stays on.
+    The heap only decides when to run.
+    """
+
+    def __init__(self):
+        self._heap: list = []
+        self._wake: asyncio.Event | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._task: asyncio.Task | None = None
+        self._watermark: datetime | None = None
+        self.last_tick: datetime | None = None
 
-        # Check if deleted_at exists to avoid crash if migration not applied
-        has_deleted_at = False
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def next_due(self) -> datetime | None:
+        return self._heap[0][0] if self._heap else None
+
+    def start(self, since: datetime | None = None):
+        """`since`: the last run of a previous scheduler; ends before it already fired."""
+        if self.running:
+            return
+        if since is not None:
+            self._watermark = _local_naive(since)
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if not self.running:
+            return
+        self._task.cancel()
         try:
-            from sqlalchemy import text
-            db.execute(text("SELECT deleted_at FROM event_posters LIMIT 1"))
-            has_deleted_at = True
-        except Exception:
-            db.rollback()
+            await self._task
+        except asyncio.CancelledError:
             pass
+        self._task = None
+
+    def reschedule(self):
+        """Ask the loop to reload upcoming transitions (safe from any thread)."""
+        if self._loop is not None and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    # ==============================
+    # Loop
+    # ==============================
+    async def _run(self):
+        logger.info("Starting event scheduler...")
+        while True:
+            self._wake.clear()
+            try:
+                await self._apply_due()
+                await self._load()
+            except Exception as e:
+                logger.error(f"Event scheduler error: {e}")
+
+            delay = MAX_SLEEP_S
+            if self._heap:
+                delay = min(delay, max(0.0, (self._heap[0][0] - datetime.now()).total_seconds()))
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _load(self):
+        """Rebuild the heap from every live poster with a future transition."""
+        now = datetime.now()
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                select(EventPoster.id, EventPoster.starts_at, EventPoster.ends_at)
+                .where(
+                    EventPoster.deleted_at.is_(None),
+                    or_(EventPoster.starts_at > now, EventPoster.ends_at > now),
+                )
+            )).all()
+
+        heap = []
+        for event_id, starts_at, ends_at in rows:
+            if starts_at is not None and _local_naive(starts_at) > now:
+                heap.append((_local_naive(starts_at), START, event_id))
+            if ends_at is not None and _local_naive(ends_at) > now:
+                heap.append((_local_naive(ends_at), END, event_id))
+        heapq.heapify(heap)
+        self._heap = heap
+
+    async def _apply_due(self):
+        """Set based UPDATEs: every poster due to be on, and the ends in (watermark, now]."""
+        now = datetime.now()
+        since = self._watermark
+
+        async with AsyncSessionLocal() as db:
+            end_window = [EventPoster.ends_at <= now]
+            if since is not None:
+                end_window.append(EventPoster.ends_at > since)
+
+            activated = (await db.execute(
+                update(EventPoster)
+                .where(
+                    EventPoster.deleted_at.is_(None),
+                    EventPoster.is_active == False,
+                    EventPoster.starts_at <= now,
+                    # A poster whose window already closed stays off
+                    or_(EventPoster.ends_at.is_(None), EventPoster.ends_at > now),
+                )
+                .values(is_active=True)
+                .execution_options(synchronize_session=False)
+            )).rowcount
+
+            deactivated = (await db.execute(
+                update(EventPoster)
+                .where(
+                    EventPoster.deleted_at.is_(None),
+                    EventPoster.is_active == True,
+                    *end_window,
+                )
+                .values(is_active=False)
+                .execution_options(synchronize_session=False)
+            )).rowcount
+
+            if activated or deactivated:
+                logger.info(f"Event scheduler: activated {activated}, deactivated {deactivated}")
+                await bump_content_version(db, EVENTS)
+            await db.commit()
+
+        self._watermark = now
+        self.last_tick = now
+        while self._heap and self._heap[0][0] <= now:
+            heapq.heappop(self._heap)
+
+
+event_scheduler = EventScheduler()
+
+# Added, toggled, trashed or restored posters change the events feed; reload then
+subscribe_invalidation(EVENTS, event_scheduler.reschedule)
+
+
+# One scheduler across all workers: whichever worker holds the lock runs it
+scheduler_leader = LeaderElection(
+    "event-scheduler",
+    on_elected=lambda: event_scheduler.start(since=scheduler_leader.previous_tick),
+    on_demoted=event_scheduler.stop,
+    last_tick=lambda: event_scheduler.last_tick,
+)
 
-        query = db.query(EventPoster)
-        
-        if has_deleted_at:
-            query = query.filter(EventPoster.deleted_at.is_(None))
-
-        events = query.filter(
-            EventPoster.is_active == False,
-            EventPoster.starts_at.is_not(None),
-            EventPoster.starts_at <= now
-        ).all()
-
-        if events:
-            logger.info(f"Activating {len(events)} scheduled event(s)")
-            for evt in events:
-                evt.is_active = True
-                logger.info(f"Activated event {evt.id}: {evt.title}")
-            db.commit()
-
-    except Exception as e:
-        logger.error(f"Error in scheduler: {e}")
-    finally:
-        db.close()
-
-async def scheduler_loop():
-    logger.info("Starting background scheduler...")
-    while True:
-        try:
-            await activate_scheduled_events()
-        except Exception as e:
-            logger.error(f"Scheduler loop error: {e}")
-        
-        # Run every 10 seconds for faster updates
-        await asyncio.sleep(10)
 
 def start_scheduler():
-    asyncio.create_task(scheduler_loop())
\ No newline at end of file
+    scheduler_leader.start()
+
+
+async def stop_scheduler():
+    await scheduler_leader.stop()
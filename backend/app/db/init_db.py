@@ -1,13 +1,17 @@
-from sqlalchemy import text
+from sqlalchemy import text, inspect
 from sqlalchemy.orm import Session
 
 from app import models
 
 from app.db.session import engine
 from app.db.base import Base
+from app.db.schema import schema_registry
 
 from app.core.config import BOOTSTRAP_ADMIN_USERNAME, BOOTSTRAP_ADMIN_PASSWORD
 from app.core.security import hash_password
+from app.services.appointment_search import ensure_search_indexes
+from app.services.content_version import ensure_content_versions
+from app.services.export_jobs import fail_stale_jobs
 
 # IMPORTANT: adjust this import path to match your project structure
 # (search where AdminUser model is defined)
@@ -28,14 +32,54 @@ def init_db():
     # Create tables
     Base.metadata.create_all(bind=engine)
 
+    # create_all skips tables that already exist, so columns and indexes
+    # added to existing models later on are created here
+    _ensure_columns()
+    # Jobs orphaned by a crashed worker would block the unique active-key index
+    with engine.begin() as conn:
+        conn.execute(fail_stale_jobs())
+    _ensure_indexes()
+
+    # Capabilities (tables / columns) the endpoints check, read once per migration run
+    schema_registry.refresh()
+
+    # Dialect specific search indexes (pg_trgm / FTS5)
+    ensure_search_indexes()
+
+    # Version rows behind the public feeds' ETags
+    with Session(engine) as db:
+        ensure_content_versions(db)
+
+
+def _ensure_columns():
+    """Add nullable model columns missing from existing tables (no Alembic yet)."""
+    insp = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not insp.has_table(table.name):
+                continue
+            existing = {c["name"] for c in insp.get_columns(table.name)}
+            for col in table.columns:
+                if col.name in existing or not col.nullable:
+                    continue
+                col_type = col.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {col.name} {col_type}'))
+
+
+def _ensure_indexes():
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
 
 def ensure_bootstrap_admin(db: Session):
     """
     Ensure a default admin exists at startup.
     Uses BOOTSTRAP_ADMIN_USERNAME / BOOTSTRAP_ADMIN_PASSWORD from env/config.
     """
-    # Optional: set search_path so queries hit your schema first
-    db.execute(text(f'SET search_path TO "{SCHEMA_NAME}", public'))
+    # Optional: set search_path so queries hit your schema first (Postgres only)
+    if "sqlite" not in str(engine.url):
+        db.execute(text(f'SET search_path TO "{SCHEMA_NAME}", public'))
 
     existing = db.query(AdminUser).filter(AdminUser.username == BOOTSTRAP_ADMIN_USERNAME).first()
     if existing:
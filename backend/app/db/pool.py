@@ -0,0 +1,214 @@
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+from app.core.config import (
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING,
+    DB_POOL_PRE_PING_IDLE_S,
+)
+
+# Upper bounds (ms) of the checkout wait histogram; anything slower lands in "+Inf"
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class PoolMetrics:
+    """
+    Live counters for one engine's pool.
+
+    Checkout wait is measured around Pool.connect(): queueing for a free
+    connection, opening a new one (overflow) and any pre-ping included,
+    i.e. exactly what a request waits for before its first query.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._records: dict = {}
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.invalidations = 0
+            self.ping_failures = 0
+            self.wait_count = 0
+            self.wait_sum = 0.0
+            self.wait_max = 0.0
+            self.wait_buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+
+    def observe_wait(self, seconds: float):
+        ms = seconds * 1000
+        i = next((i for i, b in enumerate(WAIT_BUCKETS_MS) if ms <= b), len(WAIT_BUCKETS_MS))
+        with self._lock:
+            self.wait_count += 1
+            self.wait_sum += ms
+            self.wait_max = max(self.wait_max, ms)
+            self.wait_buckets[i] += 1
+
+    def _count(self, attr: str):
+        with self._lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+
+    # ==============================
+    # Pool wiring
+    # ==============================
+    def instrument(self, base: type) -> type:
+        """Subclass of the dialect's pool class that times checkouts and feeds these metrics."""
+        metrics = self
+
+        class InstrumentedPool(base):
+            def connect(self):
+                t0 = time.perf_counter()
+                try:
+                    return super().connect()
+                except exc.TimeoutError:
+                    metrics._count("timeouts")
+                    raise
+                finally:
+                    metrics.observe_wait(time.perf_counter() - t0)
+
+        InstrumentedPool.__name__ = f"Instrumented{base.__name__}"
+        return InstrumentedPool
+
+    def attach(self, pool):
+        """Listen on an engine's pool. The listeners carry over when engine.dispose() recreates it."""
+        event.listen(pool, "connect", self._on_connect)
+        event.listen(pool, "checkout", self._on_checkout)
+        event.listen(pool, "checkin", self._on_checkin)
+        event.listen(pool, "invalidate", self._on_invalidate)
+        event.listen(pool, "close", self._on_close)
+        event.listen(pool, "detach", self._on_detach)
+        if DB_POOL_PRE_PING == "idle":
+            event.listen(pool, "checkout", self._ping_if_idle)
+
+    def _on_connect(self, dbapi_conn, record):
+        record.info["opened_at"] = time.time()
+        record.info["checked_in_at"] = time.monotonic()
+        with self._lock:
+            self._records[id(record)] = record
+
+    def _on_checkout(self, dbapi_conn, record, proxy):
+        record.info["checked_out_at"] = time.monotonic()
+        self._count("checkouts")
+
+    def _on_checkin(self, dbapi_conn, record):
+        record.info.pop("checked_out_at", None)
+        record.info["checked_in_at"] = time.monotonic()
+
+    def _on_invalidate(self, dbapi_conn, record, exception):
+        self._count("invalidations")
+
+    def _on_close(self, dbapi_conn, record):
+        with self._lock:
+            self._records.pop(id(record), None)
+
+    def _on_detach(self, dbapi_conn, record):
+        # Detached connections leave the pool for good
+        self._on_close(dbapi_conn, record)
+
+    def _ping_if_idle(self, dbapi_conn, record, proxy):
+        """Pre-ping only connections that sat idle long enough to have been dropped server side."""
+        idle = time.monotonic() - record.info.get("checked_in_at", 0)
+        if idle < DB_POOL_PRE_PING_IDLE_S:
+            return
+        cursor = dbapi_conn.cursor()
+        try:
+            cursor.execute("SELECT 1")
+        except Exception:
+            self._count("ping_failures")
+            # The pool discards this connection and retries the checkout with a fresh one
+            raise exc.DisconnectionError()
+        finally:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+
+    # ==============================
+    # Reporting
+    # ==============================
+    def snapshot(self, pool) -> dict:
+        now, wall = time.monotonic(), time.time()
+        with self._lock:
+            records = list(self._records.values())
+            buckets = list(self.wait_buckets)
+            counters = {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "invalidations": self.invalidations,
+                "ping_failures": self.ping_failures,
+            }
+            wait = {
+                "count": self.wait_count,
+                "avg_ms": round(self.wait_sum / self.wait_count, 3) if self.wait_count else 0.0,
+                "max_ms": round(self.wait_max, 3),
+            }
+
+        labels = [str(b) for b in WAIT_BUCKETS_MS] + ["+Inf"]
+        wait["histogram_ms"] = dict(zip(labels, buckets))
+
+        connections = []
+        for r in records:
+            info = r.info
+            out_at = info.get("checked_out_at")
+            connections.append({
+                "age_s": round(wall - info.get("opened_at", wall), 1),
+                "checked_out": out_at is not None,
+                "busy_s": round(now - out_at, 3) if out_at is not None else None,
+                "idle_s": round(now - info.get("checked_in_at", now), 1) if out_at is None else None,
+            })
+        ages = [c["age_s"] for c in connections]
+
+        return {
+            "pool_class": type(pool).__name__,
+            "size": _call(pool, "size"),
+            "checked_out": _call(pool, "checkedout"),
+            "checked_in": _call(pool, "checkedin"),
+            "overflow": _call(pool, "overflow"),
+            "max_overflow": DB_MAX_OVERFLOW if isinstance(pool, QueuePool) else None,
+            "timeout_s": DB_POOL_TIMEOUT if isinstance(pool, QueuePool) else None,
+            **counters,
+            "checkout_wait": wait,
+            "connection_age_s": {
+                "count": len(ages),
+                "min": min(ages) if ages else None,
+                "max": max(ages) if ages else None,
+                "avg": round(sum(ages) / len(ages), 1) if ages else None,
+            },
+            "connections": connections,
+        }
+
+
+def _call(pool, name: str):
+    fn = getattr(pool, name, None)
+    return fn() if fn else None
+
+
+def pool_options(url, metrics: PoolMetrics) -> dict:
+    """
+    create_engine / create_async_engine keyword arguments for the configured pool.
+    Sizing only applies to queue pools (SQLite memory databases use a static pool).
+    """
+    u = make_url(url)
+    base = u.get_dialect().get_pool_class(u)
+
+    opts = {
+        "poolclass": metrics.instrument(base),
+        "pool_pre_ping": DB_POOL_PRE_PING == "always",
+        "pool_recycle": DB_POOL_RECYCLE,
+    }
+    if issubclass(base, QueuePool):
+        opts.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
+    return opts
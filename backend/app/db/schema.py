@@ -0,0 +1,47 @@
+import logging
+import threading
+
+from sqlalchemy import inspect
+
+logger = logging.getLogger(__name__)
+
+
+class SchemaRegistry:
+    """
+    Tables and columns of the live database, introspected once.
+
+    Code that must cope with a not yet migrated database asks this registry
+    instead of probing with a query per request. Refreshed by init_db after
+    it adds missing columns, and on demand after an external migration.
+    """
+
+    def __init__(self):
+        self._columns: dict[str, frozenset] = {}
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def refresh(self, bind=None):
+        from app.db.session import engine
+
+        insp = inspect(bind or engine)
+        columns = {
+            table: frozenset(c["name"] for c in insp.get_columns(table))
+            for table in insp.get_table_names()
+        }
+        with self._lock:
+            self._columns = columns
+            self.loaded = True
+        logger.info(f"Schema registry loaded: {len(columns)} tables")
+
+    def has_table(self, table: str) -> bool:
+        return table in self._columns
+
+    def has_column(self, table: str, column: str) -> bool:
+        return column in self._columns.get(table, ())
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {t: sorted(cols) for t, cols in sorted(self._columns.items())}
+
+
+schema_registry = SchemaRegistry()
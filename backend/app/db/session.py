@@ -1,6 +1,64 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from app.core.config import DATABASE_URL
+from app.db.pool import PoolMetrics, pool_options
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+# Sync engine: init_db DDL, standalone scripts and threadpool/process work
+sync_pool_metrics = PoolMetrics("sync")
+engine = create_engine(DATABASE_URL, **pool_options(DATABASE_URL, sync_pool_metrics))
+sync_pool_metrics.attach(engine.pool)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def _async_url_and_args(url: str):
+    """
+    Map the configured (sync) URL onto its async driver:
+    postgresql -> asyncpg, sqlite -> aiosqlite.
+    """
+    u = make_url(url)
+    connect_args = {}
+
+    if u.get_backend_name() == "postgresql":
+        # asyncpg does not understand libpq's sslmode query parameter
+        sslmode = u.query.get("sslmode")
+        if sslmode:
+            u = u.difference_update_query(["sslmode"])
+            if sslmode not in ("disable", "allow", "prefer"):
+                connect_args["ssl"] = "require" if sslmode == "require" else True
+        u = u.set(drivername="postgresql+asyncpg")
+    elif u.get_backend_name() == "sqlite":
+        u = u.set(drivername="sqlite+aiosqlite")
+
+    return u, connect_args
+
+
+_async_url, _async_connect_args = _async_url_and_args(DATABASE_URL)
+
+# Async engine: every request handler
+async_pool_metrics = PoolMetrics("async")
+async_engine = create_async_engine(
+    _async_url,
+    connect_args=_async_connect_args,
+    **pool_options(_async_url, async_pool_metrics),
+)
+async_pool_metrics.attach(async_engine.sync_engine.pool)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    # Objects stay readable after commit without an implicit (sync) refresh
+    expire_on_commit=False,
+)
+
+
+async def connect_asyncpg():
+    """
+    Dedicated asyncpg connection outside the pool, for long lived session state
+    (LISTEN, session advisory locks). Postgres only; the caller closes it.
+    """
+    import asyncpg
+
+    dsn = _async_url.set(drivername="postgresql").render_as_string(hide_password=False)
+    return await asyncpg.connect(dsn, **_async_connect_args)
@@ -1,12 +1,20 @@
 import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 
 from app.api.v1.router import api_router
 from app.db.init_db import init_db, ensure_bootstrap_admin
-from app.db.session import SessionLocal
-from app.core.config import DEBUG
+from app.db.session import SessionLocal, AsyncSessionLocal
+from app.services.appointment_dedup import backfill_normalized_phones
+from app.services.appointment_stats import ensure_appointment_stats
+from app.core.config import DEBUG, APPOINTMENT_BATCH_MODE
+from app.services.appointment_ingest import appointment_batcher
+from app.services.feed_cache import start_feed_listener, stop_feed_listener
+from app.services.appointment_export import shutdown_export_pool
+from app.services.export_jobs import export_jobs
+from app.services.image_variants import shutdown_image_pool
+from app.services.storage import LocalStorage, get_storage
+from app.core.media_files import MediaFiles
 
 app = FastAPI(title="Kanglei Career Solution API")
 
@@ -33,29 +41,56 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Let the site read rate-limit state off responses
+    expose_headers=["RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset", "RateLimit-Policy", "Retry-After"],
 )
 
 # Create tables + bootstrap admin user
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
     init_db()
     db = SessionLocal()
     try:
         ensure_bootstrap_admin(db)
     finally:
         db.close()
+
+    async with AsyncSessionLocal() as adb:
+        await ensure_appointment_stats(adb)
+        await backfill_normalized_phones(adb)
     
     # Start background scheduler
     from app.core.scheduler import start_scheduler
     start_scheduler()
 
-# Serve uploads from /uploads
-# backend/app/static_uploads/gallery -> /uploads/gallery/...
-uploads_dir = os.path.join(os.path.dirname(__file__), "static_uploads")
-os.makedirs(os.path.join(uploads_dir, "gallery"), exist_ok=True)
-os.makedirs(os.path.join(uploads_dir, "events"), exist_ok=True)
+    # Optional write-behind batching for public appointment submissions
+    if APPOINTMENT_BATCH_MODE:
+        appointment_batcher.start()
+
+    # Drop cached public feeds when another worker writes them
+    start_feed_listener()
+
+    # Background appointment exports (POST /admin/exports)
+    export_jobs.start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    # Flush queued submissions before the worker exits
+    await appointment_batcher.stop()
+    from app.core.scheduler import stop_scheduler
+    await stop_scheduler()
+    await stop_feed_listener()
+    await export_jobs.stop()
+    shutdown_image_pool()
+    shutdown_export_pool()
 
-app.mount("/uploads", StaticFiles(directory=uploads_dir), name="uploads")
+# Serve uploads from /uploads when media is stored on this node's disk
+# MEDIA_ROOT/media/<sha256>.png -> /uploads/media/...
+storage = get_storage()
+if isinstance(storage, LocalStorage):
+    os.makedirs(storage.root, exist_ok=True)
+    app.mount("/uploads", MediaFiles(storage), name="uploads")
 
 app.include_router(api_router)
 
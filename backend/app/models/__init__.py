@@ -3,3 +3,9 @@ from .appointment import Appointment
 from .event_poster import EventPoster
 from .gallery_post import GalleryPost
 from .placement_post import PlacementPost
+from .appointment_stat import AppointmentDailyStat
+from .content_version import ContentVersion
+from .job_leader import JobLeader
+from .media import Media
+from .export_job import ExportJob
+from .rate_limit import RateLimitState
@@ -1,13 +1,20 @@
-from sqlalchemy import Column, Integer, String, Text, Date, TIMESTAMP, JSON, func
+from sqlalchemy import Column, Integer, String, Text, Date, TIMESTAMP, JSON, Index, func
 from app.db.base import Base
 
 
 class Appointment(Base):
     __tablename__ = "appointments"
+    __table_args__ = (
+        # Keyset pagination walks (created_at, id) newest first
+        Index("ix_appointments_created_at_id", "created_at", "id"),
+        # Duplicate submission guard: same phone + type in a recent window
+        Index("ix_appointments_dedup", "normalized_phone", "counseling_type", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(200), nullable=False)
     phone = Column(String(30), nullable=False)
+    normalized_phone = Column(String(20), nullable=True)
     address = Column(String(300))
     message = Column(Text)
     status = Column(String(30), nullable=False)
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, Date
+from app.db.base import Base
+
+
+class AppointmentDailyStat(Base):
+    """
+    Rollup of live (not trashed) appointments per created day and dimension.
+    Maintained incrementally by the appointment write paths.
+    """
+    __tablename__ = "appointment_daily_stats"
+
+    day = Column(Date, primary_key=True)
+    status = Column(String(30), primary_key=True)
+    location = Column(String(50), primary_key=True)
+    counseling_type = Column(String(100), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
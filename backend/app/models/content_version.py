@@ -0,0 +1,16 @@
+from sqlalchemy import Column, String, BigInteger, DateTime
+from app.db.base import Base
+
+
+class ContentVersion(Base):
+    """
+    One row per public feed (events, gallery, placements), plus "appointments"
+    keying cached export files. Bumped in the same transaction as every write
+    that can change the data; for feeds the version is the ETag, updated_at
+    the Last-Modified.
+    """
+    __tablename__ = "content_versions"
+
+    name = Column(String(50), primary_key=True)
+    version = Column(BigInteger, nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
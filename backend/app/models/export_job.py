@@ -0,0 +1,37 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, Index, func, text
+from app.db.base import Base
+
+# Jobs in these states still own their cache key
+_ACTIVE = text("status IN ('queued', 'running')")
+
+
+class ExportJob(Base):
+    """
+    A background appointment export. Rows live in the DB so any worker can
+    report progress and dedup identical requests; each job writes its own
+    file under EXPORT_DIR, named by its id.
+    """
+    __tablename__ = "export_jobs"
+    __table_args__ = (
+        # At most one queued / running job per cache key, across all workers
+        Index(
+            "uq_export_jobs_active_key", "cache_key", unique=True,
+            postgresql_where=_ACTIVE, sqlite_where=_ACTIVE,
+        ),
+    )
+
+    id = Column(String(32), primary_key=True)
+    format = Column(String(10), nullable=False)
+    params = Column(JSON, nullable=False)
+    cache_key = Column(String(64), nullable=False, index=True)
+    # queued -> running -> done | failed
+    status = Column(String(20), nullable=False, default="queued")
+    rows_total = Column(Integer, nullable=True)
+    rows_done = Column(Integer, nullable=False, default=0)
+    path = Column(String(500), nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    # Refreshed by the owning worker while the job is queued or running
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, String, DateTime
+from app.db.base import Base
+
+
+class JobLeader(Base):
+    """
+    Current holder of each background job role, written by the leader itself
+    on election and on every heartbeat so any worker can report it.
+    """
+    __tablename__ = "job_leaders"
+
+    role = Column(String(50), primary_key=True)
+    worker = Column(String(200), nullable=False)
+    elected_at = Column(DateTime(timezone=True), nullable=False)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=False)
+    last_tick_at = Column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, JSON, func
+from app.db.base import Base
+
+
+class Media(Base):
+    """
+    One stored upload, keyed by content hash: identical bytes uploaded to the
+    gallery, events and placements share a single file. `ref_count` counts the
+    posts pointing at it; the file goes when the last of them is purged.
+    """
+    __tablename__ = "media"
+
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(String(64), unique=True, nullable=False)
+    path = Column(String(500), nullable=False)
+    size = Column(BigInteger, nullable=False)
+    variants = Column(JSON(none_as_null=True), nullable=True)
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    dominant_color = Column(String(7), nullable=True)
+    placeholder = Column(Text, nullable=True)
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
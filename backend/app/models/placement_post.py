@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, func
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, JSON, Text, ForeignKey, func
 from app.db.base import Base
 
 
@@ -7,6 +7,15 @@ class PlacementPost(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     image_path = Column(String(500), nullable=False)
+    # Resized WebP/AVIF copies next to the original: [{"w", "h", "fmt", "file"}]
+    variants = Column(JSON, nullable=True)
+    # Shared content-addressed file (null for uploads stored before the media table)
+    media_id = Column(Integer, ForeignKey("media.id"), nullable=True, index=True)
+    # Displayed size and a colour / tiny inline image to show while it loads
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    dominant_color = Column(String(7), nullable=True)
+    placeholder = Column(Text, nullable=True)
     is_active = Column(Boolean, default=True, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     deleted_at = Column(DateTime(timezone=True), nullable=True)
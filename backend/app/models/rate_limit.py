@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Float, String
+from app.db.base import Base
+
+
+class RateLimitState(Base):
+    """
+    GCRA state of one rate-limited client (policy + IP) when the limiter
+    runs on the database backend: a single theoretical arrival time, shared
+    by every worker. Rows whose `tat` has passed are idle and swept.
+    """
+    __tablename__ = "rate_limits"
+
+    key = Column(String(255), primary_key=True)
+    # Unix time at which the client's quota is fully restored
+    tat = Column(Float, nullable=False, index=True)
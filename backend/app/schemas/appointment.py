@@ -1,6 +1,6 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator, model_validator
 from datetime import datetime, date
-from typing import Optional, List, Literal
+from typing import Optional, List, Literal, Dict
 
 VALID_STATUSES = {"NEW", "CONTACTED", "SCHEDULED", "COMPLETED", "CANCELLED"}
 
@@ -46,5 +46,70 @@ class AppointmentOut(BaseModel):
         from_attributes = True
 
 
+class AppointmentPage(BaseModel):
+    items: List[AppointmentOut]
+    next_cursor: Optional[str] = None
+
+
+class AppointmentStatsBucket(BaseModel):
+    period: date
+    total: int
+    by_status: Dict[str, int]
+    by_location: Dict[str, int]
+    by_counseling_type: Dict[str, int]
+
+
+class AppointmentStats(BaseModel):
+    daily: List[AppointmentStatsBucket]
+    weekly: List[AppointmentStatsBucket]
+    monthly: List[AppointmentStatsBucket]
+    all_time: AppointmentStatsBucket
+
+
 class StatusUpdate(BaseModel):
-    status: str = Field(min_length=2, max_length=30)
\ No newline at end of file
+    status: str = Field(min_length=2, max_length=30)
+
+
+class AppointmentFilter(BaseModel):
+    q: Optional[str] = None
+    status: Optional[str] = None
+    counseling_type: Optional[str] = None
+    location: Optional[str] = None
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
+
+    @field_validator("*", mode="before")
+    @classmethod
+    def _blank_is_none(cls, v):
+        # "   " would pass as set here but add no condition to the query
+        if isinstance(v, str):
+            v = v.strip()
+            return v or None
+        return v
+
+
+class BulkSelection(BaseModel):
+    ids: Optional[List[int]] = Field(default=None, min_length=1, max_length=5000)
+    filter: Optional[AppointmentFilter] = None
+
+    @model_validator(mode="after")
+    def _one_selector(self):
+        if (self.ids is None) == (self.filter is None):
+            raise ValueError("Provide exactly one of 'ids' or 'filter'")
+        if self.filter is not None and all(v is None for v in self.filter.model_dump().values()):
+            raise ValueError("Filter must set at least one non-empty field")
+        return self
+
+
+class BulkStatusUpdate(BulkSelection):
+    status: str = Field(min_length=2, max_length=30)
+
+
+class BulkItemResult(BaseModel):
+    id: int
+    outcome: Literal["updated", "unchanged", "deleted", "not_found"]
+
+
+class BulkResult(BaseModel):
+    affected: int
+    results: List[BulkItemResult]
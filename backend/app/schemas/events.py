@@ -2,6 +2,8 @@ from typing import Optional
 from datetime import datetime
 from pydantic import BaseModel
 
+from app.schemas.media import ImageVariantsOut
+
 
 class EventBase(BaseModel):
     title: Optional[str] = None
@@ -18,7 +20,7 @@ class EventUpdate(EventBase):
     pass
 
 
-class EventResponse(EventBase):
+class EventResponse(EventBase, ImageVariantsOut):
     id: int
     image_url: str
     created_at: datetime
@@ -0,0 +1,50 @@
+from datetime import datetime
+from typing import Literal, Optional
+
+from pydantic import BaseModel, computed_field
+
+
+class ExportRequest(BaseModel):
+    format: Literal["csv", "xlsx", "pdf"] = "xlsx"
+    # Same filters as GET /admin/appointments/export
+    q: Optional[str] = None
+    status: Optional[str] = None
+    counseling_type: Optional[str] = None
+    location: Optional[str] = None
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
+    # One entry of the appointment_type list, e.g. "admission"
+    appointment_type: Optional[str] = None
+    deleted: Literal["exclude", "include", "only"] = "exclude"
+    # xlsx: one sheet per location
+    by_location: bool = False
+
+
+class ExportJobOut(BaseModel):
+    id: str
+    format: str
+    status: str
+    rows_total: Optional[int] = None
+    rows_done: int = 0
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    @computed_field
+    @property
+    def progress(self) -> float:
+        """0..1; an empty export is complete once done."""
+        if self.status == "done":
+            return 1.0
+        if not self.rows_total:
+            return 0.0
+        return min(1.0, self.rows_done / self.rows_total)
+
+    @computed_field
+    @property
+    def download_url(self) -> Optional[str]:
+        return f"/api/v1/admin/exports/{self.id}/download" if self.status == "done" else None
+
+    class Config:
+        from_attributes = True
@@ -1,8 +1,9 @@
-from pydantic import BaseModel
 from typing import Optional
 
+from app.schemas.media import ImageVariantsOut
 
-class GalleryOut(BaseModel):
+
+class GalleryOut(ImageVariantsOut):
     id: int
     image_url: str
     caption: Optional[str]
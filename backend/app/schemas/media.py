@@ -0,0 +1,55 @@
+import posixpath
+from typing import List, Optional
+
+from pydantic import BaseModel, Field, computed_field
+
+MIME_TYPES = {"avif": "image/avif", "webp": "image/webp"}
+
+# <source> order: best compression first, the browser takes the first type it supports
+FORMAT_PREFERENCE = ("avif", "webp")
+
+
+class ImageSource(BaseModel):
+    type: str
+    srcset: str
+
+
+class ImageVariantsOut(BaseModel):
+    """
+    Adds srcset-ready URLs built from the row's stored image variants, which
+    live in the same public folder as the original image, plus the image's
+    size and placeholder so the page can reserve space before it loads.
+    """
+    variants: Optional[list] = Field(default=None, exclude=True)
+    width: Optional[int] = None
+    height: Optional[int] = None
+    dominant_color: Optional[str] = None
+    # data: URI of a tiny blurred rendering
+    placeholder: Optional[str] = None
+
+    def _image_url(self) -> str:
+        return self.image_url
+
+    def _srcset(self, fmt: str) -> Optional[str]:
+        items = sorted((v for v in self.variants or [] if v.get("fmt") == fmt), key=lambda v: v["w"])
+        if not items:
+            return None
+        folder = posixpath.dirname(self._image_url())
+        return ", ".join(f'{folder}/{v["file"]} {v["w"]}w' for v in items)
+
+    @computed_field
+    @property
+    def sources(self) -> List[ImageSource]:
+        """One <source> per format, for a <picture> element."""
+        out = []
+        for fmt in FORMAT_PREFERENCE:
+            srcset = self._srcset(fmt)
+            if srcset:
+                out.append(ImageSource(type=MIME_TYPES[fmt], srcset=srcset))
+        return out
+
+    @computed_field
+    @property
+    def srcset(self) -> Optional[str]:
+        """WebP srcset for a plain <img> (every current browser decodes WebP)."""
+        return self._srcset("webp")
@@ -1,12 +1,26 @@
-from pydantic import BaseModel
 from datetime import datetime
+from typing import Optional
 
+from pydantic import computed_field
 
-class PlacementOut(BaseModel):
+from app.schemas.media import ImageVariantsOut
+from app.services.media_store import media_url
+
+
+class PlacementOut(ImageVariantsOut):
     id: int
     image_path: str
     is_active: bool
     created_at: datetime
 
+    @computed_field
+    @property
+    def image_url(self) -> str:
+        return media_url(self.image_path, "placements")
+
     class Config:
         from_attributes = True
+
+
+class PlacementTrashOut(PlacementOut):
+    deleted_at: Optional[datetime] = None
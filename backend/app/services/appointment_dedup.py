@@ -0,0 +1,114 @@
+import hashlib
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache
+from app.models.appointment import Appointment
+from app.utils.validators import normalize_phone
+
+# Same phone + counseling type inside this window is a duplicate
+DEDUP_WINDOW = timedelta(minutes=10)
+
+# Fingerprints this worker accepted recently; repeats are refused before any DB work
+_recent = TTLCache(maxsize=20000, ttl=DEDUP_WINDOW.total_seconds())
+
+DUPLICATE_DETAIL = "Duplicate request detected. Please wait a few minutes before submitting again."
+
+
+def submission_fingerprint(normalized_phone: str, counseling_type: str) -> str:
+    return f"{normalized_phone}|{counseling_type}"
+
+
+def _advisory_key(fingerprint: str) -> int:
+    # Signed 64-bit key for pg_advisory_xact_lock
+    return int.from_bytes(hashlib.sha1(fingerprint.encode("utf-8")).digest()[:8], "big", signed=True)
+
+
+def claim_fingerprint(fingerprint: str):
+    """In-process check only: refuse a fingerprint this worker accepted recently."""
+    if not _recent.add(fingerprint):
+        raise HTTPException(status_code=409, detail=DUPLICATE_DETAIL)
+
+
+async def lock_fingerprints(db: AsyncSession, fingerprints):
+    """
+    Postgres transaction advisory locks on the fingerprints (sorted, so two
+    batches never deadlock). A racing identical submission in another worker
+    waits until this transaction commits and then sees the committed row.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    for key in sorted({_advisory_key(fp) for fp in fingerprints}):
+        await db.execute(select(func.pg_advisory_xact_lock(key)))
+
+
+async def recent_duplicates(db: AsyncSession, pairs, now: datetime) -> set:
+    """Index-backed lookup: which (normalized_phone, counseling_type) pairs exist inside the window."""
+    pairs = set(pairs)
+    if not pairs:
+        return set()
+
+    rows = (await db.execute(
+        select(Appointment.normalized_phone, Appointment.counseling_type)
+        .where(
+            Appointment.normalized_phone.in_({p for p, _ in pairs}),
+            Appointment.created_at >= now - DEDUP_WINDOW,
+        )
+        .distinct()
+    )).all()
+    return {(p, c) for p, c in rows} & pairs
+
+
+async def claim_submission(db: AsyncSession, normalized_phone: str, counseling_type: str, now: datetime) -> str:
+    """
+    Reserve a submission fingerprint or raise 409.
+
+    1. In-process TTL cache: refuses obvious repeats without touching the DB.
+    2. Advisory lock on the fingerprint (Postgres) until this transaction ends.
+    3. Index-backed lookup on (normalized_phone, counseling_type, created_at).
+
+    Returns the fingerprint; call release_submission() if the insert does not commit.
+    """
+    fp = submission_fingerprint(normalized_phone, counseling_type)
+    claim_fingerprint(fp)
+
+    try:
+        await lock_fingerprints(db, [fp])
+        dup = await recent_duplicates(db, [(normalized_phone, counseling_type)], now)
+    except Exception:
+        release_submission(fp)
+        raise
+
+    if dup:
+        # Keep the fingerprint cached: further repeats stay DB free
+        raise HTTPException(status_code=409, detail=DUPLICATE_DETAIL)
+
+    return fp
+
+
+def release_submission(fingerprint: str):
+    _recent.pop(fingerprint)
+
+
+async def backfill_normalized_phones(db: AsyncSession, batch_size: int = 1000) -> int:
+    """Fill normalized_phone for rows written before the column existed."""
+    total = 0
+    while True:
+        rows = (await db.execute(
+            select(Appointment.id, Appointment.phone)
+            .where(Appointment.normalized_phone.is_(None))
+            .limit(batch_size)
+        )).all()
+        if not rows:
+            return total
+
+        # Bulk UPDATE by primary key; "" marks unparseable input so the row is not picked up again
+        await db.execute(update(Appointment), [
+            {"id": r.id, "normalized_phone": normalize_phone(r.phone)}
+            for r in rows
+        ])
+        await db.commit()
+        total += len(rows)
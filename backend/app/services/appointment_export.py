@@ -0,0 +1,317 @@
+import asyncio
+import csv
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from io import StringIO
+from typing import AsyncIterator, Awaitable, Callable
+
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from openpyxl.utils import get_column_letter
+from sqlalchemy import select
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import EXPORT_BATCH_SIZE, EXPORT_WORKERS, PDF_CHUNK_ROWS
+from app.db.session import AsyncSessionLocal
+from app.models.appointment import Appointment
+from app.services.appointment_service import apply_appointment_filters
+from app.utils.pdf_report import merge_chunks, render_table_chunk
+
+# (header, column) in export order
+EXPORT_COLUMNS = [
+    ("ID", Appointment.id),
+    ("Name", Appointment.name),
+    ("Phone", Appointment.phone),
+    ("Date of Birth", Appointment.date_of_birth),
+    ("Guardian Name", Appointment.guardian_name),
+    ("Guardian Contact", Appointment.guardian_contact),
+    ("Address", Appointment.address),
+    ("Location", Appointment.location),
+    ("Counseling Type", Appointment.counseling_type),
+    ("Appointment Type", Appointment.appointment_type),
+    ("Message", Appointment.message),
+    ("Status", Appointment.status),
+    ("Created At", Appointment.created_at),
+]
+DELETED_COLUMN = ("Deleted At", Appointment.deleted_at)
+
+# Progress hook: awaited with the size of every batch read
+OnBatch = Callable[[int], Awaitable[None]] | None
+
+
+# ==============================
+# Query
+# ==============================
+def export_columns(deleted: str) -> list[tuple]:
+    """Trashed rows in the export add their deletion time."""
+    return EXPORT_COLUMNS + ([DELETED_COLUMN] if deleted != "exclude" else [])
+
+
+def export_query(
+    deleted: str = "exclude",
+    q: str | None = None,
+    status: str | None = None,
+    counseling_type: str | None = None,
+    location: str | None = None,
+    date_from: str | None = None,
+    date_to: str | None = None,
+    appointment_type: str | None = None,
+):
+    """
+    Same filters as the admin list; `deleted` is "exclude" (default),
+    "include" or "only" (the trash). Selects just the exported columns.
+    """
+    qry = select(*(col for _, col in export_columns(deleted)))
+    if deleted == "exclude":
+        qry = qry.where(Appointment.deleted_at.is_(None))
+    elif deleted == "only":
+        qry = qry.where(Appointment.deleted_at.is_not(None))
+    qry = apply_appointment_filters(
+        qry,
+        q=q,
+        status=status,
+        counseling_type=counseling_type,
+        location=location,
+        date_from=date_from,
+        date_to=date_to,
+        appointment_type=appointment_type,
+    )
+    return qry.order_by(Appointment.id.desc())
+
+
+async def stream_export_rows(
+    qry, batch_size: int = EXPORT_BATCH_SIZE, on_batch: OnBatch = None
+) -> AsyncIterator[list]:
+    """
+    Row batches through a server-side cursor: memory stays at one batch
+    whatever the table size. Uses its own session, so it can outlive the
+    request handler (StreamingResponse bodies run after it returns).
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(qry.execution_options(yield_per=batch_size))
+        async for rows in result.partitions():
+            yield rows
+            if on_batch:
+                await on_batch(len(rows))
+
+
+def export_cell(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ", timespec="seconds")
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (list, tuple)):
+        return ", ".join(export_cell(v) for v in value)
+    return str(value)
+
+
+# ==============================
+# CSV
+# ==============================
+async def csv_chunks(qry, columns: list[tuple], on_batch: OnBatch = None) -> AsyncIterator[bytes]:
+    """UTF-8 CSV, one chunk per DB batch; the header goes out before the first row is read."""
+    buf = StringIO()
+    writer = csv.writer(buf)
+
+    def take() -> bytes:
+        data = buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+        return data
+
+    writer.writerow([header for header, _ in columns])
+    yield take()
+
+    async for rows in stream_export_rows(qry, on_batch=on_batch):
+        writer.writerows([export_cell(v) for v in row] for row in rows)
+        yield take()
+
+
+async def write_csv(qry, columns: list[tuple], path: str, on_batch: OnBatch = None):
+    with open(path, "wb") as f:
+        async for chunk in csv_chunks(qry, columns, on_batch):
+            await run_in_threadpool(f.write, chunk)
+
+
+# ==============================
+# XLSX
+# ==============================
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Characters Excel rejects in a sheet name
+_SHEET_NAME_RE = re.compile(r"[\[\]:*?/\\]")
+
+
+class _XlsxWriter:
+    """
+    openpyxl write-only workbook: each sheet streams its rows to a temp file
+    as they are appended, so memory does not grow with the row count.
+    """
+
+    def __init__(self, columns: list[tuple], by_location: bool):
+        self.headers = [header for header, _ in columns]
+        self.location_index = self.headers.index("Location") if by_location else None
+        self.wb = Workbook(write_only=True)
+        self.sheets = {}
+        self.titles = set()
+
+    def _sheet(self, name: str):
+        ws = self.sheets.get(name)
+        if ws is None:
+            title = _SHEET_NAME_RE.sub("-", name).strip()[:31] or "Unknown"
+            base, n = title, 2
+            while title.lower() in self.titles:
+                suffix = f" ({n})"
+                title, n = base[:31 - len(suffix)] + suffix, n + 1
+            self.titles.add(title.lower())
+
+            ws = self.wb.create_sheet(title)
+            # Column widths must be set before the first row is written
+            for col in range(1, len(self.headers) + 1):
+                ws.column_dimensions[get_column_letter(col)].width = 18
+            ws.append(self.headers)
+            self.sheets[name] = ws
+        return ws
+
+    def append(self, rows):
+        for row in rows:
+            values = [v if isinstance(v, int) else ILLEGAL_CHARACTERS_RE.sub("", export_cell(v)) for v in row]
+            name = "Appointments" if self.location_index is None else values[self.location_index]
+            self._sheet(name).append(values)
+
+    def save(self, path: str):
+        if not self.sheets:
+            self._sheet("Appointments")
+        self.wb.save(path)
+
+
+async def write_xlsx(
+    qry, columns: list[tuple], path: str, by_location: bool = False, on_batch: OnBatch = None
+):
+    """
+    Write the export to `path` batch by batch (one sheet, or one per
+    location). The blocking openpyxl work runs in the threadpool.
+    """
+    writer = _XlsxWriter(columns, by_location)
+    async for rows in stream_export_rows(qry, on_batch=on_batch):
+        await run_in_threadpool(writer.append, rows)
+    await run_in_threadpool(writer.save, path)
+
+
+# ==============================
+# PDF
+# ==============================
+PDF_TITLE = "Kanglei Career Solution - Appointments Export"
+
+# Relative column widths; anything unlisted gets 1
+PDF_COLUMN_WEIGHTS = {
+    "ID": 0.5,
+    "Name": 1.3,
+    "Date of Birth": 0.9,
+    "Address": 1.5,
+    "Location": 0.9,
+    "Appointment Type": 1.2,
+    "Message": 2.0,
+    "Status": 0.8,
+    "Created At": 1.2,
+    "Deleted At": 1.2,
+}
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def _executor() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: never fork a process that already runs threads and an event loop
+        _pool = ProcessPoolExecutor(
+            max_workers=EXPORT_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def shutdown_export_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def write_pdf(qry, columns: list[tuple], path: str, on_batch: OnBatch = None):
+    """
+    Render the export to `path`: rows are cut into PDF_CHUNK_ROWS chunks, each
+    laid out in a worker process (no row cap, header repeated on every page),
+    then the chunks are merged and page-numbered, also off the event loop's
+    process. At most two chunks per worker are in flight, so rendering memory
+    stays bounded; the merge step holds the finished report's pages.
+    """
+    loop = asyncio.get_running_loop()
+    headers = [header for header, _ in columns]
+    weights = [PDF_COLUMN_WEIGHTS.get(h, 1) for h in headers]
+    subtitle = f"Generated: {datetime.now().isoformat(sep=' ', timespec='seconds')}"
+
+    work_dir = tempfile.mkdtemp(prefix="appointments-pdf-")
+    slots = asyncio.Semaphore(EXPORT_WORKERS * 2)
+    parts, tasks = [], []
+
+    async def render(part_path: str, rows: list):
+        try:
+            await loop.run_in_executor(
+                _executor(), render_table_chunk, part_path, PDF_TITLE, subtitle, headers, weights, rows
+            )
+        finally:
+            slots.release()
+
+    async def submit(rows: list):
+        await slots.acquire()
+        parts.append(os.path.join(work_dir, f"{len(parts):06d}.pdf"))
+        tasks.append(asyncio.ensure_future(render(parts[-1], rows)))
+
+    try:
+        chunk = []
+        async for rows in stream_export_rows(qry, on_batch=on_batch):
+            chunk.extend([export_cell(v) for v in row] for row in rows)
+            while len(chunk) >= PDF_CHUNK_ROWS:
+                await submit(chunk[:PDF_CHUNK_ROWS])
+                chunk = chunk[PDF_CHUNK_ROWS:]
+        if chunk or not parts:
+            await submit(chunk)
+
+        await asyncio.gather(*tasks)
+        await loop.run_in_executor(_executor(), merge_chunks, parts, path)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+# ==============================
+# Any Format
+# ==============================
+# format -> (file suffix, media type)
+EXPORT_FORMATS = {
+    "csv": (".csv", "text/csv; charset=utf-8"),
+    "xlsx": (".xlsx", XLSX_MEDIA_TYPE),
+    "pdf": (".pdf", "application/pdf"),
+}
+
+
+async def write_export(
+    format: str, qry, columns: list[tuple], path: str, by_location: bool = False, on_batch: OnBatch = None
+):
+    """Write the export in `format` to `path`."""
+    if format == "csv":
+        await write_csv(qry, columns, path, on_batch=on_batch)
+    elif format == "xlsx":
+        await write_xlsx(qry, columns, path, by_location=by_location, on_batch=on_batch)
+    else:
+        await write_pdf(qry, columns, path, on_batch=on_batch)
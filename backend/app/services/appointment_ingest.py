@@ -0,0 +1,186 @@
+import asyncio
+import logging
+from types import SimpleNamespace
+
+from fastapi import HTTPException
+from sqlalchemy import insert
+
+from app.core.config import (
+    APPOINTMENT_BATCH_MODE,
+    APPOINTMENT_BATCH_SIZE,
+    APPOINTMENT_BATCH_MAX_WAIT_MS,
+    APPOINTMENT_QUEUE_MAXSIZE,
+    APPOINTMENT_QUEUE_TIMEOUT_MS,
+)
+from app.db.session import AsyncSessionLocal
+from app.models.appointment import Appointment
+from app.services.appointment_dedup import (
+    DUPLICATE_DETAIL,
+    lock_fingerprints,
+    recent_duplicates,
+    release_submission,
+    submission_fingerprint,
+)
+from app.services.appointment_stats import bump_appointment_stats
+
+logger = logging.getLogger(__name__)
+
+
+class IngestQueueFull(Exception):
+    """Raised when a submission cannot be queued within the backpressure timeout."""
+
+
+class AppointmentBatcher:
+    """
+    Write-behind pipeline for public submissions.
+
+    Callers enqueue validated row values and await their assigned id. One
+    background task drains the bounded queue and writes a batch as one
+    multi-row INSERT + commit when `batch_size` rows are waiting or
+    `max_wait` seconds passed since the first row of the batch arrived.
+    """
+
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        batch_size: int = APPOINTMENT_BATCH_SIZE,
+        max_wait: float = APPOINTMENT_BATCH_MAX_WAIT_MS / 1000,
+        maxsize: int = APPOINTMENT_QUEUE_MAXSIZE,
+        put_timeout: float = APPOINTMENT_QUEUE_TIMEOUT_MS / 1000,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.maxsize = maxsize
+        self.put_timeout = put_timeout
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush what is queued, then stop the writer."""
+        if not self.running:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def submit(self, values: dict) -> int:
+        """
+        Queue one row and wait until its batch commits. Returns the new id.
+        Backpressure: waits up to `put_timeout` for queue space, then raises IngestQueueFull.
+        """
+        fut = asyncio.get_running_loop().create_future()
+        try:
+            await asyncio.wait_for(self._queue.put((values, fut)), timeout=self.put_timeout)
+        except asyncio.TimeoutError:
+            raise IngestQueueFull()
+        return await fut
+
+    async def _next_batch(self) -> list:
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                rows = [values for values, _ in batch]
+                outcomes = await self._write_batch(rows)
+            except Exception as e:
+                logger.error(f"Appointment batch write failed: {e}")
+                outcomes = [e] * len(batch)
+
+            for (_, fut), outcome in zip(batch, outcomes):
+                if fut.done():
+                    continue
+                if isinstance(outcome, Exception):
+                    fut.set_exception(outcome)
+                else:
+                    fut.set_result(outcome)
+
+            for _ in batch:
+                self._queue.task_done()
+
+    async def _write_batch(self, rows: list[dict]) -> list:
+        """
+        Returns, per input row, the new id or an exception.
+        A failing batch is retried row by row so one bad row cannot sink the rest.
+        """
+        try:
+            return await self._insert(rows)
+        except Exception as e:
+            if len(rows) == 1:
+                return [e]
+            logger.warning(f"Batch of {len(rows)} failed ({e}); retrying rows individually")
+            return [(await self._write_batch([r]))[0] for r in rows]
+
+    async def _insert(self, rows: list[dict]) -> list:
+        fingerprints = [submission_fingerprint(r["normalized_phone"], r["counseling_type"]) for r in rows]
+        outcomes: list = [None] * len(rows)
+
+        async with self.session_factory() as db:
+            try:
+                # Same race guard as the direct path, held until this batch commits
+                await lock_fingerprints(db, fingerprints)
+                dups = await recent_duplicates(
+                    db,
+                    [(r["normalized_phone"], r["counseling_type"]) for r in rows],
+                    min(r["created_at"] for r in rows),
+                )
+
+                fresh = []
+                for i, r in enumerate(rows):
+                    if (r["normalized_phone"], r["counseling_type"]) in dups:
+                        outcomes[i] = HTTPException(status_code=409, detail=DUPLICATE_DETAIL)
+                    else:
+                        fresh.append(i)
+
+                if fresh:
+                    result = await db.execute(
+                        insert(Appointment).returning(Appointment.id, sort_by_parameter_order=True),
+                        [rows[i] for i in fresh],
+                    )
+                    for i, new_id in zip(fresh, result.scalars().all()):
+                        outcomes[i] = new_id
+                    await bump_appointment_stats(db, [SimpleNamespace(**rows[i]) for i in fresh], +1)
+
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                for fp in fingerprints:
+                    release_submission(fp)
+                raise
+
+        return outcomes
+
+
+appointment_batcher = AppointmentBatcher()
+
+
+def batch_mode_enabled() -> bool:
+    return APPOINTMENT_BATCH_MODE and appointment_batcher.running
@@ -0,0 +1,239 @@
+import logging
+import re
+
+from sqlalchemy import text, func, or_, case, literal_column, select, table, column
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import engine
+from app.models.appointment import Appointment
+
+logger = logging.getLogger(__name__)
+
+# SQLite shadow table: rowid == appointments.id
+FTS_TABLE = "appointments_fts"
+_fts = table(FTS_TABLE, column("rowid"), column("name"), column("phone_digits"))
+
+# Trigram indexes cannot serve anything shorter than one trigram
+MIN_INDEXED_LEN = 3
+
+# SQLite has no regexp_replace; strip the separators people actually type
+_SQLITE_DIGITS = "replace(replace(replace(replace(replace(replace({col}, ' ', ''), '-', ''), '+', ''), '(', ''), ')', ''), '.', '')"
+
+# Inlined (not bound) so the planner matches it against the expression index
+_PG_DIGITS_SQL = "regexp_replace({col}, '\\D', '', 'g')"
+
+_PG_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_appointments_name_trgm ON appointments USING gin (name gin_trgm_ops)",
+    f"CREATE INDEX IF NOT EXISTS ix_appointments_phone_digits_trgm ON appointments USING gin (({_PG_DIGITS_SQL.format(col='phone')}) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_appointments_name_tsv ON appointments USING gin (to_tsvector('simple', name))",
+]
+
+_SQLITE_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS appointments_fts_ai AFTER INSERT ON appointments BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, phone_digits)
+        VALUES (new.id, new.name, {_SQLITE_DIGITS.format(col="new.phone")});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS appointments_fts_ad AFTER DELETE ON appointments BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS appointments_fts_au AFTER UPDATE OF name, phone ON appointments BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+        INSERT INTO {FTS_TABLE}(rowid, name, phone_digits)
+        VALUES (new.id, new.name, {_SQLITE_DIGITS.format(col="new.phone")});
+    END
+    """,
+]
+
+_fts_ready = False
+
+
+def _dialect() -> str:
+    return engine.dialect.name
+
+
+def _digits(q: str) -> str:
+    return re.sub(r"\D", "", q)
+
+
+def _is_phone_query(q: str) -> bool:
+    return bool(re.fullmatch(r"[\d\s()+.-]+", q)) and bool(_digits(q))
+
+
+def _phone_digits_expr():
+    if _dialect() == "postgresql":
+        return literal_column(_PG_DIGITS_SQL.format(col="appointments.phone"))
+    return literal_column(_SQLITE_DIGITS.format(col="appointments.phone"))
+
+
+def _fts_phrase(q: str) -> str:
+    return '"' + q.replace('"', '""') + '"'
+
+
+# ==============================
+# Index Maintenance (init_db)
+# ==============================
+def ensure_search_indexes():
+    """
+    Postgres: pg_trgm GIN indexes on name / phone digits plus a tsvector index on name.
+    SQLite: FTS5 trigram shadow table kept in sync by triggers.
+    Idempotent, safe to run on every start.
+    """
+    global _fts_ready
+
+    if _dialect() == "postgresql":
+        with engine.begin() as conn:
+            for ddl in _PG_DDL:
+                conn.execute(text(ddl))
+        return
+
+    if _dialect() != "sqlite":
+        return
+
+    with engine.begin() as conn:
+        existed = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :n"),
+            {"n": FTS_TABLE},
+        ).first() is not None
+
+        try:
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                "USING fts5(name, phone_digits, tokenize='trigram')"
+            ))
+        except Exception as e:
+            # trigram tokenizer needs SQLite >= 3.34; keep the ILIKE path
+            logger.warning(f"FTS5 trigram search unavailable, falling back to LIKE: {e}")
+            return
+
+        for ddl in _SQLITE_TRIGGERS:
+            conn.execute(text(ddl))
+
+        if not existed:
+            conn.execute(text(
+                f"INSERT INTO {FTS_TABLE}(rowid, name, phone_digits) "
+                f"SELECT id, name, {_SQLITE_DIGITS.format(col='phone')} FROM appointments"
+            ))
+
+    _fts_ready = True
+
+
+# ==============================
+# Filtering (list / page / export)
+# ==============================
+def search_condition(q: str):
+    """WHERE clause for the admin `q` filter, answered from the search indexes."""
+    q = q.strip()
+    digits = _digits(q)
+
+    if _dialect() == "sqlite" and _fts_ready and len(q) >= MIN_INDEXED_LEN:
+        if _is_phone_query(q):
+            match = f"phone_digits : {_fts_phrase(digits)}" if len(digits) >= MIN_INDEXED_LEN else None
+        else:
+            match = _fts_phrase(q)
+        if match:
+            ids = select(_fts.c.rowid).where(literal_column(FTS_TABLE).match(match))
+            return Appointment.id.in_(ids)
+
+    # Postgres: every branch is served by a gin_trgm_ops index (name, phone digits);
+    # one unindexed branch would turn the whole OR back into a sequential scan
+    conds = [Appointment.name.ilike(f"%{q}%")]
+    if _is_phone_query(q):
+        conds.append(_phone_digits_expr().like(f"%{digits}%"))
+    return or_(*conds)
+
+
+# ==============================
+# Ranked Search
+# ==============================
+async def search_appointments(db: AsyncSession, q: str, limit: int = 20, phone_suffix: bool = False):
+    """
+    Live (not trashed) appointments ranked by relevance.
+    Phone queries rank numbers ending with the typed digits first;
+    `phone_suffix=True` only returns those ("last 4 digits" lookup).
+    """
+    q = q.strip()
+    digits = _digits(q)
+    phone_query = _is_phone_query(q)
+
+    if phone_suffix and not digits:
+        return []
+
+    if _dialect() == "postgresql":
+        stmt = _pg_ranked(q, digits, phone_query, phone_suffix)
+    elif _dialect() == "sqlite" and _fts_ready and len(digits if phone_query else q) >= MIN_INDEXED_LEN:
+        stmt = _sqlite_ranked(q, digits, phone_query, phone_suffix)
+    else:
+        stmt = _like_ranked(q, digits, phone_query, phone_suffix)
+
+    return (await db.scalars(stmt.where(Appointment.deleted_at.is_(None)).limit(limit))).all()
+
+
+def _suffix_rank(digits: str):
+    return case((_phone_digits_expr().like(f"%{digits}"), 1), else_=0)
+
+
+def _pg_ranked(q: str, digits: str, phone_query: bool, phone_suffix: bool):
+    phone_digits = _phone_digits_expr()
+
+    if phone_query:
+        pattern = f"%{digits}" if phone_suffix else f"%{digits}%"
+        return (
+            select(Appointment)
+            .where(phone_digits.like(pattern))
+            .order_by(_suffix_rank(digits).desc(), Appointment.created_at.desc())
+        )
+
+    tsv = func.to_tsvector("simple", Appointment.name)
+    tsq = func.plainto_tsquery("simple", q)
+    score = func.similarity(Appointment.name, q) + func.ts_rank(tsv, tsq)
+    return (
+        select(Appointment)
+        .where(or_(
+            Appointment.name.ilike(f"%{q}%"),
+            Appointment.name.op("%")(q),
+            tsv.op("@@")(tsq),
+        ))
+        .order_by(score.desc(), Appointment.created_at.desc())
+    )
+
+
+def _sqlite_ranked(q: str, digits: str, phone_query: bool, phone_suffix: bool):
+    fts_col = literal_column(FTS_TABLE)
+    stmt = select(Appointment).join(_fts, _fts.c.rowid == Appointment.id)
+
+    if phone_query:
+        stmt = stmt.where(fts_col.match(f"phone_digits : {_fts_phrase(digits)}"))
+        if phone_suffix:
+            # LIKE on a trigram FTS5 column is index assisted
+            stmt = stmt.where(_fts.c.phone_digits.like(f"%{digits}"))
+        suffix = case((_fts.c.phone_digits.like(f"%{digits}"), 1), else_=0)
+        return stmt.order_by(suffix.desc(), func.bm25(fts_col), Appointment.created_at.desc())
+
+    return (
+        stmt.where(fts_col.match(_fts_phrase(q)))
+        .order_by(func.bm25(fts_col), Appointment.created_at.desc())
+    )
+
+
+def _like_ranked(q: str, digits: str, phone_query: bool, phone_suffix: bool):
+    # Too short for the trigram index (or no index on this backend)
+    if phone_query:
+        pattern = f"%{digits}" if phone_suffix else f"%{digits}%"
+        return (
+            select(Appointment)
+            .where(_phone_digits_expr().like(pattern))
+            .order_by(_suffix_rank(digits).desc(), Appointment.created_at.desc())
+        )
+
+    prefix = case((Appointment.name.ilike(f"{q}%"), 1), else_=0)
+    return (
+        select(Appointment)
+        .where(Appointment.name.ilike(f"%{q}%"))
+        .order_by(prefix.desc(), Appointment.created_at.desc())
+    )
@@ -0,0 +1,213 @@
+from datetime import datetime
+from fastapi import HTTPException
+from sqlalchemy import String, cast, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.appointment import Appointment
+from app.schemas.appointment import AppointmentCreate, BulkSelection
+from app.services.appointment_search import search_condition
+from app.services.appointment_stats import ROLLUP_COLUMNS, bump_appointment_stats
+from app.services.content_version import APPOINTMENTS, bump_data_version
+from app.utils.pagination import decode_cursor
+from app.utils.validators import normalize_phone
+
+
+# ==============================
+# Public Submission -> Row Values
+# ==============================
+def build_appointment_values(payload: AppointmentCreate, now: datetime) -> dict:
+    phone = payload.phone.strip()
+    return dict(
+        counseling_type=payload.counseling_type.strip(),
+        name=payload.name.strip(),
+        phone=phone,
+        normalized_phone=normalize_phone(phone),
+        address=(payload.address.strip() if payload.address else None),
+        message=(payload.message.strip() if payload.message else None),
+        status="NEW",
+        # Stamped here (not by the DB default) so the stored value round-trips
+        # exactly through the (created_at, id) page cursor
+        created_at=now,
+
+        # LOCATION (Required)
+        location=payload.location.strip(),
+
+        # Extra Fields
+        date_of_birth=payload.date_of_birth,
+        guardian_name=(payload.guardian_name.strip() if payload.guardian_name else None),
+        guardian_contact=(payload.guardian_contact.strip() if payload.guardian_contact else None),
+        appointment_type=payload.appointment_type,
+    )
+
+
+# ==============================
+# Shared Filters
+# (list, cursor pages, exports)
+# Works on any Select (uses .filter, an alias of .where)
+# ==============================
+def apply_appointment_filters(
+    qry,
+    q: str | None = None,
+    status: str | None = None,
+    counseling_type: str | None = None,
+    location: str | None = None,
+    date_from: str | None = None,
+    date_to: str | None = None,
+    appointment_type: str | None = None,
+):
+    # Search (trigram / FTS5 indexed)
+    if q and q.strip():
+        qry = qry.filter(search_condition(q))
+
+    # Status filter
+    if status:
+        qry = qry.filter(Appointment.status == status.strip().upper())
+
+    # Counseling filter
+    if counseling_type:
+        qry = qry.filter(Appointment.counseling_type == counseling_type.strip())
+
+    # Location filter
+    if location:
+        qry = qry.filter(Appointment.location == location.strip())
+
+    # Appointment type filter (one entry of the JSON list; the values are fixed slugs)
+    if appointment_type:
+        qry = qry.filter(
+            cast(Appointment.appointment_type, String).contains(f'"{appointment_type.strip()}"', autoescape=True)
+        )
+
+    # Date filtering
+    if date_from:
+        try:
+            dtf = datetime.fromisoformat(date_from.strip()).date()
+            qry = qry.filter(
+                Appointment.created_at >= datetime.combine(
+                    dtf, datetime.min.time()
+                ).astimezone()
+            )
+        except Exception:
+            raise HTTPException(status_code=400, detail="Invalid date_from. Use YYYY-MM-DD.")
+
+    if date_to:
+        try:
+            dtt = datetime.fromisoformat(date_to.strip()).date()
+            end_dt = datetime.combine(
+                dtt, datetime.max.time()
+            ).astimezone()
+            qry = qry.filter(Appointment.created_at <= end_dt)
+        except Exception:
+            raise HTTPException(status_code=400, detail="Invalid date_to. Use YYYY-MM-DD.")
+
+    return qry
+
+
+# ==============================
+# Keyset Pagination
+# ==============================
+def apply_appointment_cursor(qry, cursor: str | None):
+    """
+    Newest first on (created_at, id). Seeking past the cursor keeps every page
+    an index range scan instead of an OFFSET walk over the skipped rows.
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        qry = qry.filter(tuple_(Appointment.created_at, Appointment.id) < (created_at, row_id))
+
+    return qry.order_by(Appointment.created_at.desc(), Appointment.id.desc())
+
+
+# ==============================
+# Bulk (set based) Writes
+# ==============================
+def _bulk_where(stmt, selection: BulkSelection):
+    """
+    Restrict a statement to the live rows a bulk request targets. A filter
+    that adds no condition is refused: it would touch every live row.
+    """
+    stmt = stmt.where(Appointment.deleted_at.is_(None))
+    if selection.ids is not None:
+        return stmt.where(Appointment.id.in_(selection.ids))
+    filtered = apply_appointment_filters(stmt, **selection.filter.model_dump())
+    if filtered is stmt:
+        raise HTTPException(status_code=422, detail="Filter must set at least one non-empty field")
+    return filtered
+
+
+async def _bulk_update(db: AsyncSession, selection: BulkSelection, *conds, **values) -> list:
+    """
+    One set-based UPDATE ... RETURNING over the selection: no ids are sent
+    back to the database (a filter can match any number of rows) and each
+    row is locked only by the UPDATE itself.
+    """
+    stmt = (
+        _bulk_where(update(Appointment), selection)
+        .where(*conds)
+        .values(**values)
+        .returning(*ROLLUP_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )
+    return (await db.execute(stmt)).all()
+
+
+def _outcomes(requested: list[int], hit_ids: set, live_ids: set, hit: str) -> list[dict]:
+    out = []
+    for i in dict.fromkeys(requested):
+        if i in hit_ids:
+            outcome = hit
+        elif i in live_ids:
+            outcome = "unchanged"
+        else:
+            outcome = "not_found"
+        out.append({"id": i, "outcome": outcome})
+    return out
+
+
+async def bulk_update_status(db: AsyncSession, selection: BulkSelection, new_status: str) -> dict:
+    """
+    One UPDATE per status the selected rows currently hold (read from the
+    rows themselves, not the rollup, which may be stale), so every returned
+    row carries its old status for the rollup delta. Filter selections list
+    the rows they changed.
+    """
+    old_statuses = (await db.scalars(
+        _bulk_where(select(Appointment.status), selection)
+        .where(Appointment.status != new_status)
+        .distinct()
+    )).all()
+
+    changed = []
+    for old in old_statuses:
+        rows = await _bulk_update(db, selection, Appointment.status == old, status=new_status)
+        if rows:
+            await bump_appointment_stats(db, rows, -1, status=old)
+            await bump_appointment_stats(db, rows, +1)
+            changed += rows
+
+    if changed:
+        await bump_data_version(db, APPOINTMENTS)
+
+    hit_ids = {r.id for r in changed}
+    if selection.ids is not None:
+        live_ids = set((await db.scalars(_bulk_where(select(Appointment.id), selection))).all())
+        results = _outcomes(selection.ids, hit_ids, live_ids, "updated")
+    else:
+        results = [{"id": r.id, "outcome": "updated"} for r in changed]
+    await db.commit()
+
+    return {"affected": len(changed), "results": results}
+
+
+async def bulk_soft_delete(db: AsyncSession, selection: BulkSelection) -> dict:
+    rows = await _bulk_update(db, selection, deleted_at=datetime.now().astimezone())
+    if rows:
+        await bump_appointment_stats(db, rows, -1)
+        await bump_data_version(db, APPOINTMENTS)
+    await db.commit()
+
+    hit_ids = {r.id for r in rows}
+    if selection.ids is not None:
+        results = _outcomes(selection.ids, hit_ids, set(), "deleted")
+    else:
+        results = [{"id": r.id, "outcome": "deleted"} for r in rows]
+    return {"affected": len(rows), "results": results}
@@ -0,0 +1,201 @@
+import hashlib
+from collections import Counter
+from datetime import date, datetime, timedelta
+from sqlalchemy import select, delete, func, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.appointment import Appointment
+from app.models.appointment_stat import AppointmentDailyStat
+
+DIMENSIONS = ("status", "location", "counseling_type")
+
+# Columns bump_appointment_stats reads: RETURNING these from a write gives its rows
+ROLLUP_COLUMNS = (
+    Appointment.id,
+    Appointment.created_at,
+    Appointment.status,
+    Appointment.location,
+    Appointment.counseling_type,
+)
+
+# Signed 64-bit key for pg_advisory_xact_lock: one worker seeds the rollup at a time
+_SEED_LOCK_KEY = int.from_bytes(hashlib.sha1(b"appointment_daily_stats").digest()[:8], "big", signed=True)
+
+
+def _stat_day(created_at: datetime) -> date:
+    # Aware timestamps (Postgres) are bucketed in server local time,
+    # naive ones (SQLite) are already local
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone()
+    return created_at.date()
+
+
+def _upsert_for(db: AsyncSession):
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+# ==============================
+# Incremental Maintenance
+# ==============================
+async def bump_appointment_stats(db: AsyncSession, appts, delta: int, status: str | None = None):
+    """
+    Add `delta` to the rollup bucket of every appointment in `appts`.
+    `status` overrides the row's own status (used for the old side of a status change).
+    Runs inside the caller's transaction; the caller commits.
+    """
+    deltas = Counter()
+    for a in appts:
+        key = (_stat_day(a.created_at), status or a.status, a.location, a.counseling_type)
+        deltas[key] += delta
+
+    values = [
+        {"day": k[0], "status": k[1], "location": k[2], "counseling_type": k[3], "count": d}
+        for k, d in deltas.items()
+        if d
+    ]
+    if not values:
+        return
+
+    table = AppointmentDailyStat.__table__
+    stmt = _upsert_for(db)(table).values(values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.day, table.c.status, table.c.location, table.c.counseling_type],
+        set_={"count": table.c.count + stmt.excluded.count},
+    )
+    await db.execute(stmt)
+
+
+async def rebuild_appointment_stats(db: AsyncSession) -> int:
+    """Recompute the rollup from scratch. Returns the number of appointments counted."""
+    counts = Counter()
+    rows = await db.stream(
+        select(
+            Appointment.created_at,
+            Appointment.status,
+            Appointment.location,
+            Appointment.counseling_type,
+        )
+        .where(Appointment.deleted_at.is_(None))
+        .execution_options(yield_per=1000)
+    )
+    async for created_at, status, location, ctype in rows:
+        counts[(_stat_day(created_at), status, location, ctype)] += 1
+
+    await db.execute(delete(AppointmentDailyStat))
+    if counts:
+        await db.execute(insert(AppointmentDailyStat), [
+            {"day": k[0], "status": k[1], "location": k[2], "counseling_type": k[3], "count": n}
+            for k, n in counts.items()
+        ])
+    await db.commit()
+    return sum(counts.values())
+
+
+async def ensure_appointment_stats(db: AsyncSession):
+    """
+    Seed the rollup on first start after the table was introduced. Every
+    worker runs this at startup: on Postgres the others wait on an advisory
+    lock and then find the rollup seeded; elsewhere a losing rebuild rolls back.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        # Held until the transaction ends (the rebuild's commit, or the one below)
+        await db.execute(select(func.pg_advisory_xact_lock(_SEED_LOCK_KEY)))
+
+    seeded = await db.scalar(select(AppointmentDailyStat.day).limit(1)) is not None
+    live = select(Appointment.id).where(Appointment.deleted_at.is_(None)).limit(1)
+    if seeded or await db.scalar(live) is None:
+        await db.commit()
+        return
+    try:
+        await rebuild_appointment_stats(db)
+    except IntegrityError:
+        # Another worker seeded it first
+        await db.rollback()
+
+
+# ==============================
+# Reporting
+# ==============================
+def _empty_bucket(period: date) -> dict:
+    out = {"period": period, "total": 0}
+    for dim in DIMENSIONS:
+        out[f"by_{dim}"] = {}
+    return out
+
+
+def _month_start(d: date, back: int = 0) -> date:
+    months = d.year * 12 + (d.month - 1) - back
+    return date(months // 12, months % 12 + 1, 1)
+
+
+async def appointment_stats(db: AsyncSession, days: int = 14, weeks: int = 8, months: int = 6) -> dict:
+    """
+    Daily / weekly (Monday based) / monthly counts by status, location and counseling type.
+    Reads only the rollup rows inside the requested window, plus one grouped
+    sum over the whole rollup for the all-time bucket.
+    """
+    today = datetime.now().date()
+
+    daily_periods = [today - timedelta(days=i) for i in range(days - 1, -1, -1)]
+    this_week = today - timedelta(days=today.weekday())
+    weekly_periods = [this_week - timedelta(weeks=i) for i in range(weeks - 1, -1, -1)]
+    monthly_periods = [_month_start(today, back=i) for i in range(months - 1, -1, -1)]
+
+    since = min(daily_periods[0], weekly_periods[0], monthly_periods[0])
+    rows = (await db.scalars(
+        select(AppointmentDailyStat)
+        .where(AppointmentDailyStat.day >= since, AppointmentDailyStat.count != 0)
+    )).all()
+
+    daily = {p: _empty_bucket(p) for p in daily_periods}
+    weekly = {p: _empty_bucket(p) for p in weekly_periods}
+    monthly = {p: _empty_bucket(p) for p in monthly_periods}
+
+    for r in rows:
+        targets = (
+            (daily, r.day),
+            (weekly, r.day - timedelta(days=r.day.weekday())),
+            (monthly, r.day.replace(day=1)),
+        )
+        for buckets, period in targets:
+            bucket = buckets.get(period)
+            if bucket is None:
+                continue
+            bucket["total"] += r.count
+            for dim in DIMENSIONS:
+                by = bucket[f"by_{dim}"]
+                key = getattr(r, dim)
+                by[key] = by.get(key, 0) + r.count
+
+    totals = (await db.execute(
+        select(
+            AppointmentDailyStat.status,
+            AppointmentDailyStat.location,
+            AppointmentDailyStat.counseling_type,
+            func.sum(AppointmentDailyStat.count).label("count"),
+            func.min(AppointmentDailyStat.day).label("day"),
+        )
+        .where(AppointmentDailyStat.count != 0)
+        .group_by(AppointmentDailyStat.status, AppointmentDailyStat.location, AppointmentDailyStat.counseling_type)
+    )).all()
+
+    # Period of the all-time bucket: the first day with data
+    all_time = _empty_bucket(min((t.day for t in totals), default=today))
+    for t in totals:
+        all_time["total"] += t.count
+        for dim in DIMENSIONS:
+            by = all_time[f"by_{dim}"]
+            key = getattr(t, dim)
+            by[key] = by.get(key, 0) + t.count
+
+    return {
+        "daily": list(daily.values()),
+        "weekly": list(weekly.values()),
+        "monthly": list(monthly.values()),
+        "all_time": all_time,
+    }
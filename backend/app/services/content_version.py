@@ -0,0 +1,138 @@
+import time
+from datetime import datetime, timezone
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from sqlalchemy import case, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.content_version import ContentVersion
+from app.services.feed_cache import (
+    feed_generation,
+    get_cached_feed,
+    invalidate_on_commit,
+    store_feed,
+)
+from app.utils.http_cache import validator_headers, is_not_modified
+
+EVENTS = "events"
+GALLERY = "gallery"
+PLACEMENTS = "placements"
+FEEDS = (EVENTS, GALLERY, PLACEMENTS)
+
+# Not a public feed: versions admin changes to appointments (status, trash,
+# deletes) behind cached export files. Public submissions do not touch it:
+# a hot row there would serialize every insert; exports see them via max(id)
+APPOINTMENTS = "appointments"
+VERSIONED = FEEDS + (APPOINTMENTS,)
+
+# Bump when the serialized shape of the public feeds changes, so clients
+# holding an ETag from an older deploy do not get a 304 for the new format
+FEED_FORMAT = 1
+
+
+def _stamp() -> int:
+    # Microsecond clock: a re-created row never reuses a version an old ETag carried
+    return time.time_ns() // 1000
+
+
+def ensure_content_versions(db: Session):
+    """Create the version row of every feed / versioned dataset (sync, runs from init_db)."""
+    existing = set(db.scalars(select(ContentVersion.name)).all())
+    now = datetime.now(timezone.utc)
+    for name in VERSIONED:
+        if name not in existing:
+            db.add(ContentVersion(name=name, version=_stamp(), updated_at=now))
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another worker seeded them first
+        db.rollback()
+
+
+async def bump_data_version(db: AsyncSession, *names: str):
+    """Advance the versions inside the caller's transaction; the caller commits."""
+    stamp = _stamp()
+    await db.execute(
+        update(ContentVersion)
+        .where(ContentVersion.name.in_(names))
+        .values(
+            version=case(
+                (ContentVersion.version >= stamp, ContentVersion.version + 1),
+                else_=stamp,
+            ),
+            updated_at=datetime.now(timezone.utc),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def bump_content_version(db: AsyncSession, *names: str):
+    """
+    Advance the feeds' versions inside the caller's transaction; the caller commits.
+    The cached feed bodies are dropped in every worker once that commit lands.
+    """
+    await bump_data_version(db, *names)
+    await invalidate_on_commit(db, *names)
+
+
+async def data_version(db: AsyncSession, name: str) -> int | None:
+    return await db.scalar(select(ContentVersion.version).where(ContentVersion.name == name))
+
+
+async def feed_validators(db: AsyncSession, name: str) -> tuple[str, datetime] | None:
+    """(strong ETag, Last-Modified) of a feed; one primary key lookup, no feed rows read."""
+    row = (await db.execute(
+        select(ContentVersion.version, ContentVersion.updated_at).where(ContentVersion.name == name)
+    )).first()
+    if row is None:
+        return None
+
+    # SQLite hands back naive values; they were written as UTC
+    ts = row.updated_at if row.updated_at.tzinfo else row.updated_at.replace(tzinfo=timezone.utc)
+    return f'"{name}-{FEED_FORMAT}-{row.version}"', ts
+
+
+# ==============================
+# Serving
+# ==============================
+_adapters: dict = {}
+
+
+def _list_adapter(schema) -> TypeAdapter:
+    if schema not in _adapters:
+        _adapters[schema] = TypeAdapter(list[schema])
+    return _adapters[schema]
+
+
+async def serve_feed(request: Request, db: AsyncSession, name: str, schema, build) -> Response:
+    """
+    Public feed response from the in-process cache, built (and cached) on a miss.
+
+    Steady state runs no query at all: the cached entry carries the body and
+    its validators, so both 304s and full responses come straight from memory.
+    `build(db)` returns the feed items (schema instances or ORM rows).
+    """
+    entry = get_cached_feed(name)
+    if entry is None:
+        generation = feed_generation(name)
+        validators = await feed_validators(db, name)
+        adapter = _list_adapter(schema)
+        items = adapter.validate_python(await build(db), from_attributes=True)
+        body = adapter.dump_json(items)
+
+        etag, last_modified = validators or (None, None)
+        entry = (etag, last_modified, body)
+        if validators:
+            store_feed(name, generation, entry)
+
+    etag, last_modified, body = entry
+    if etag is None:
+        return Response(content=body, media_type="application/json")
+
+    headers = validator_headers(etag, last_modified)
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,288 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import (
+    EXPORT_DIR,
+    EXPORT_JOB_QUEUE,
+    EXPORT_JOB_STALE_S,
+    EXPORT_JOB_WORKERS,
+    EXPORT_TTL_S,
+)
+from app.db.session import AsyncSessionLocal
+from app.models.appointment import Appointment
+from app.models.export_job import ExportJob
+from app.schemas.export import ExportRequest
+from app.services.appointment_export import (
+    EXPORT_FORMATS,
+    export_columns,
+    export_query,
+    write_export,
+)
+from app.services.content_version import APPOINTMENTS, data_version
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+ACTIVE = (QUEUED, RUNNING)
+
+# Progress is written to the job row at most this often
+PROGRESS_INTERVAL_S = 1.0
+# Each worker refreshes heartbeat_at on its queued / running jobs this often
+HEARTBEAT_INTERVAL_S = max(1.0, EXPORT_JOB_STALE_S / 4)
+
+
+def _filters(params: dict) -> dict:
+    return {k: v for k, v in params.items() if k not in ("format", "by_location")}
+
+
+def export_cache_key(params: dict, version: str) -> str:
+    """Identical format + filters over unchanged data map to the same file."""
+    blob = json.dumps({"params": params, "version": version}, sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+async def appointment_data_version(db: AsyncSession) -> str:
+    """
+    Admin writes bump the APPOINTMENTS version; new submissions only raise
+    max(id) (an index lookup), so the public insert path writes no shared row.
+    """
+    version = await data_version(db, APPOINTMENTS)
+    max_id = await db.scalar(select(func.max(Appointment.id)))
+    return f"{version}:{max_id}"
+
+
+def fail_stale_jobs():
+    """
+    Mark queued / running jobs failed once no worker has heartbeated them for
+    EXPORT_JOB_STALE_S (their process died), which also frees their cache key.
+    A plain UPDATE, so init_db can run it on a sync connection.
+    """
+    cutoff = _now() - timedelta(seconds=EXPORT_JOB_STALE_S)
+    return (
+        update(ExportJob)
+        .where(
+            ExportJob.status.in_(ACTIVE),
+            func.coalesce(ExportJob.heartbeat_at, ExportJob.created_at) < cutoff,
+        )
+        .values(status=FAILED, error="Interrupted (worker stopped)", finished_at=_now())
+    )
+
+
+class ExportJobRunner:
+    """
+    Runs appointment exports off the request path.
+
+    POST enqueues a job row and its id; `workers` tasks drain the bounded
+    queue, so at most that many exports run at once in this process. A
+    request whose format, filters and data version match a finished (or
+    in-flight, in any worker) job gets that job back instead of a new one;
+    the unique partial index on cache_key settles concurrent submits.
+    A heartbeat task keeps this process's jobs fresh and fails jobs left
+    behind by dead workers.
+    """
+
+    def __init__(self, workers: int = EXPORT_JOB_WORKERS, maxsize: int = EXPORT_JOB_QUEUE):
+        self.workers = workers
+        self.maxsize = maxsize
+        self._queue: asyncio.Queue | None = None
+        self._tasks: list[asyncio.Task] = []
+        # Jobs queued or running in this process
+        self._active: set[str] = set()
+        # Queue slots held by submits between their capacity check and put
+        self._reserved = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self):
+        if self.running:
+            return
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._heartbeat()))
+
+    async def stop(self):
+        """Cancel running exports and mark them (and queued ones) failed."""
+        if not self.running:
+            return
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._active:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    update(ExportJob)
+                    .where(ExportJob.id.in_(self._active))
+                    .values(status=FAILED, error="Interrupted by server shutdown", finished_at=_now())
+                )
+                await db.commit()
+            self._active.clear()
+
+    # ==============================
+    # Enqueue
+    # ==============================
+    async def submit(self, db: AsyncSession, request: ExportRequest) -> ExportJob:
+        params = request.model_dump()
+        # Bad filters (dates) fail here with a 400, not later inside the job
+        export_query(**_filters(params))
+
+        await self._expire(db)
+
+        key = export_cache_key(params, await appointment_data_version(db))
+        candidates = (await db.scalars(
+            select(ExportJob)
+            .where(ExportJob.cache_key == key, ExportJob.status.in_((*ACTIVE, DONE)))
+            .order_by(ExportJob.created_at.desc())
+        )).all()
+        for job in candidates:
+            if job.status in ACTIVE:
+                return job
+            if job.path and os.path.exists(job.path):
+                return job
+
+        # Reserve the slot before awaiting the commit, so concurrent submits
+        # cannot all pass the check and then overflow the queue
+        if self.maxsize > 0 and self._queue.qsize() + self._reserved >= self.maxsize:
+            raise HTTPException(status_code=503, detail="Too many exports in progress. Please retry shortly.")
+        self._reserved += 1
+        try:
+            job = ExportJob(
+                id=uuid.uuid4().hex, format=request.format, params=params,
+                cache_key=key, status=QUEUED, heartbeat_at=_now(),
+            )
+            db.add(job)
+            try:
+                await db.commit()
+            except IntegrityError:
+                # Another worker queued the same export first: hand back its job
+                await db.rollback()
+                return await db.scalar(
+                    select(ExportJob).where(ExportJob.cache_key == key).order_by(ExportJob.created_at.desc())
+                )
+        finally:
+            self._reserved -= 1
+
+        # No await since the slot was released, so it is still free
+        self._active.add(job.id)
+        self._queue.put_nowait(job.id)
+        return job
+
+    async def _expire(self, db: AsyncSession):
+        """Drop jobs finished more than EXPORT_TTL_S ago, and their (per-job) files."""
+        cutoff = _now() - timedelta(seconds=EXPORT_TTL_S)
+        old = (await db.execute(
+            select(ExportJob.id, ExportJob.path).where(ExportJob.finished_at < cutoff)
+        )).all()
+        if not old:
+            return
+        await db.execute(delete(ExportJob).where(ExportJob.id.in_([j.id for j in old])))
+        await db.commit()
+        for j in old:
+            if j.path:
+                _discard(j.path)
+
+    async def _heartbeat(self):
+        while True:
+            try:
+                async with AsyncSessionLocal() as db:
+                    if self._active:
+                        await db.execute(
+                            update(ExportJob)
+                            .where(ExportJob.id.in_(self._active), ExportJob.status.in_(ACTIVE))
+                            .values(heartbeat_at=_now())
+                        )
+                    await db.execute(fail_stale_jobs())
+                    await db.commit()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Export job heartbeat failed: {e}")
+            await asyncio.sleep(HEARTBEAT_INTERVAL_S)
+
+    # ==============================
+    # Run
+    # ==============================
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Export job {job_id} failed: {e}")
+                await self._set(job_id, status=FAILED, error=str(e)[:500], finished_at=_now())
+            finally:
+                self._active.discard(job_id)
+                self._queue.task_done()
+
+    async def _run(self, job_id: str):
+        async with AsyncSessionLocal() as db:
+            job = await db.get(ExportJob, job_id)
+            # Gone, or failed as stale while it waited in the queue
+            if job is None or job.status != QUEUED:
+                return
+            params = dict(job.params)
+            qry = export_query(**_filters(params))
+            total = await db.scalar(select(func.count()).select_from(qry.order_by(None).subquery()))
+            job.status, job.started_at, job.rows_total = RUNNING, _now(), total
+            job.heartbeat_at = job.started_at
+            await db.commit()
+
+        done = 0
+        last_write = time.monotonic()
+
+        async def on_batch(n: int):
+            nonlocal done, last_write
+            done += n
+            if time.monotonic() - last_write >= PROGRESS_INTERVAL_S:
+                last_write = time.monotonic()
+                await self._set(job_id, rows_done=done)
+
+        fmt = params["format"]
+        path = os.path.join(EXPORT_DIR, f"{job_id}{EXPORT_FORMATS[fmt][0]}")
+        tmp = f"{path}.part"
+        try:
+            await write_export(
+                fmt, qry, export_columns(params["deleted"]), tmp,
+                by_location=params.get("by_location", False), on_batch=on_batch,
+            )
+            os.replace(tmp, path)
+        except BaseException:
+            _discard(tmp)
+            raise
+
+        await self._set(job_id, status=DONE, rows_done=done, path=path, finished_at=_now())
+
+    async def _set(self, job_id: str, **values):
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(ExportJob).where(ExportJob.id == job_id).values(**values))
+            await db.commit()
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _discard(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+export_jobs = ExportJobRunner()
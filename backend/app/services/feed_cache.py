@@ -0,0 +1,158 @@
+import asyncio
+import logging
+from collections import defaultdict
+
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import FEED_CACHE_MAXSIZE, FEED_CACHE_TTL_S
+
+logger = logging.getLogger(__name__)
+
+# Postgres NOTIFY channel carrying comma separated feed names
+CHANNEL = "kanglei_feed_invalidate"
+
+# feed name -> (etag, last_modified, serialized body)
+_feeds = TTLCache(maxsize=FEED_CACHE_MAXSIZE, ttl=FEED_CACHE_TTL_S)
+
+# Bumped on every invalidation; a build that started under an older
+# generation must not store its (possibly stale) result
+_generation = defaultdict(int)
+
+_PENDING = "feed_cache_pending"
+
+
+# ==============================
+# Local Store
+# ==============================
+def get_cached_feed(name: str):
+    return _feeds.get(name)
+
+
+def feed_generation(name: str) -> int:
+    return _generation[name]
+
+
+def store_feed(name: str, generation: int, entry: tuple):
+    if _generation[name] == generation:
+        _feeds.set(name, entry)
+
+
+# feed name -> callbacks run after the feed was invalidated (any worker's write)
+_subscribers = defaultdict(list)
+
+
+def subscribe_invalidation(name: str, callback):
+    _subscribers[name].append(callback)
+
+
+def _notify_subscribers(names):
+    for name in names:
+        for callback in _subscribers.get(name, ()):
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Feed invalidation subscriber failed: {e}")
+
+
+def invalidate_feeds(*names: str):
+    for name in names:
+        _generation[name] += 1
+        _feeds.pop(name)
+    _notify_subscribers(names)
+
+
+def clear_feeds():
+    for name in list(_generation):
+        _generation[name] += 1
+    _feeds.clear()
+    _notify_subscribers(list(_subscribers))
+
+
+# ==============================
+# Write-through Invalidation
+# ==============================
+async def invalidate_on_commit(db: AsyncSession, *names: str):
+    """
+    Drop the feeds once the caller's transaction commits: locally via the
+    session hook below, in other workers via a transactional NOTIFY (Postgres
+    delivers it at commit, never for a rolled back transaction).
+    """
+    db.info.setdefault(_PENDING, set()).update(names)
+    if db.get_bind().dialect.name == "postgresql":
+        await db.execute(select(func.pg_notify(CHANNEL, ",".join(sorted(names)))))
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session):
+    names = session.info.pop(_PENDING, None)
+    if names:
+        invalidate_feeds(*names)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back(session):
+    session.info.pop(_PENDING, None)
+
+
+# ==============================
+# Cross-worker Listener (Postgres)
+# ==============================
+_listener_task: asyncio.Task | None = None
+
+
+def _on_notify(conn, pid, channel, payload):
+    invalidate_feeds(*[n for n in payload.split(",") if n])
+
+
+async def _listen_forever():
+    from app.db.session import connect_asyncpg
+
+    backoff = 1
+    while True:
+        try:
+            conn = await connect_asyncpg()
+            lost = asyncio.Event()
+            conn.add_termination_listener(lambda _conn: lost.set())
+            try:
+                await conn.add_listener(CHANNEL, _on_notify)
+                # Writes committed while nobody listened may have been missed
+                clear_feeds()
+                backoff = 1
+                await lost.wait()
+                logger.warning("Feed invalidation listener lost its connection")
+            finally:
+                await conn.close()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Feed invalidation listener failed: {e}")
+
+        # Without a listener this worker relies on the TTL; start clean after reconnecting
+        clear_feeds()
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, 60)
+
+
+def start_feed_listener():
+    """LISTEN for other workers' invalidations (Postgres only; SQLite runs single process)."""
+    global _listener_task
+    from app.db.session import async_engine
+
+    if async_engine.dialect.name != "postgresql" or _listener_task is not None:
+        return
+    _listener_task = asyncio.create_task(_listen_forever())
+
+
+async def stop_feed_listener():
+    global _listener_task
+    if _listener_task is None:
+        return
+    _listener_task.cancel()
+    try:
+        await _listener_task
+    except asyncio.CancelledError:
+        pass
+    _listener_task = None
@@ -0,0 +1,48 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from app.core.config import IMAGE_VARIANT_WIDTHS, IMAGE_VARIANT_FORMATS, IMAGE_WORKERS
+from app.utils.imaging import process_image, supported_formats
+
+logger = logging.getLogger(__name__)
+
+FORMATS = supported_formats(IMAGE_VARIANT_FORMATS)
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def _executor() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: never fork a process that already runs threads and an event loop
+        _pool = ProcessPoolExecutor(
+            max_workers=IMAGE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def shutdown_image_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def analyze_image(image_path: str, with_variants: bool = True) -> dict | None:
+    """
+    Size, dominant colour, blur placeholder and (optionally) resized WebP/AVIF
+    copies of an uploaded image, computed in the process pool.
+    Returns None when the image cannot be processed; the original is still served.
+    """
+    formats = FORMATS if with_variants else []
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(
+            _executor(), process_image, image_path, IMAGE_VARIANT_WIDTHS, formats
+        )
+    except Exception as e:
+        logger.warning(f"Image processing failed for {image_path}: {e}")
+        return None
@@ -0,0 +1,269 @@
+import asyncio
+import logging
+import os
+import posixpath
+import tempfile
+
+from fastapi import UploadFile
+from sqlalchemy import delete, event, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.db.session import AsyncSessionLocal
+from app.models.media import Media
+from app.services.image_variants import analyze_image
+from app.services.storage import MediaStorage, get_storage, image_key
+from app.services.upload_ingest import ingest_upload, upload_extension
+
+logger = logging.getLogger(__name__)
+
+# Keys are content hashes: an object never changes once written
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+# Derived from the image at upload; copied from the media row onto each post
+# so listings render without a join
+IMAGE_META = ("width", "height", "dominant_color", "placeholder")
+IMAGE_FIELDS = ("variants",) + IMAGE_META
+
+# Session.info key: storage objects to delete once the transaction commits
+_PENDING_DELETES = "media_store_pending_deletes"
+
+# Deletions running after commit (referenced so they are not collected mid-flight)
+_delete_tasks: set = set()
+
+
+def _upsert_for(db: AsyncSession):
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+def media_url(image_path: str, folder: str) -> str:
+    """Public URL of a post's image: shared media, or `folder` for older per post type uploads."""
+    return get_storage().url(image_key(image_path, folder))
+
+
+def variant_keys(key: str, variants: list[dict] | None) -> list[str]:
+    folder = posixpath.dirname(key)
+    return [posixpath.join(folder, v["file"]) for v in (variants or [])]
+
+
+def image_fields(row) -> dict:
+    """Variants and metadata of a media row or post, as keyword arguments for another row / schema."""
+    return {name: getattr(row, name, None) for name in IMAGE_FIELDS}
+
+
+async def _render_and_store(
+    storage: MediaStorage, staged_path: str, key_stem: str, with_variants: bool = True
+) -> dict | None:
+    """
+    Analyze a staged image and store its variants as <key_stem>_<width>.<fmt>
+    ("media/<sha256>" for shared media). Returns analyze_image()'s dict.
+    """
+    info = await analyze_image(staged_path, with_variants)
+    if not info or not info["variants"]:
+        return info
+
+    staging = os.path.dirname(staged_path)
+    folder, stem = posixpath.split(key_stem)
+    try:
+        for v in info["variants"]:
+            src = os.path.join(staging, v["file"])
+            v["file"] = f"{stem}_{v['w']}.{v['fmt']}"
+            await storage.put_file(f"{folder}/{v['file']}", src, cache_control=IMMUTABLE)
+    finally:
+        # put_file consumed what it stored; drop the rest after a failure
+        staged_stem = os.path.splitext(os.path.basename(staged_path))[0]
+        for name in os.listdir(staging):
+            if name.startswith(f"{staged_stem}_"):
+                _discard(os.path.join(staging, name))
+    return info
+
+
+def _discard(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+async def _lock_content(db: AsyncSession, sha256: str):
+    """
+    Postgres transaction advisory lock on one content hash: an upload of the
+    bytes and the deletion of their released objects never interleave.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        # Signed 64-bit key for pg_advisory_xact_lock
+        key = int.from_bytes(bytes.fromhex(sha256[:16]), "big", signed=True)
+        await db.execute(select(func.pg_advisory_xact_lock(key)))
+
+
+# ==============================
+# Acquire
+# ==============================
+async def store_upload(db: AsyncSession, file: UploadFile) -> Media:
+    """
+    Store an upload once per distinct content and take a reference on it.
+    Re-uploading bytes already stored only bumps the media row's ref_count.
+    Runs inside the caller's transaction; the caller commits.
+    """
+    storage = get_storage()
+    stored = await ingest_upload(file, storage.staging_dir, upload_extension(file))
+    ext = os.path.splitext(stored.filename)[1]
+
+    try:
+        await _lock_content(db, stored.sha256)
+        known = (await db.execute(
+            select(Media.path, Media.variants, Media.width).where(Media.sha256 == stored.sha256)
+        )).first()
+
+        # Render before taking the row lock; known content reuses what it has
+        info = None
+        if known is None or not known.variants or known.width is None:
+            info = await _render_and_store(
+                storage, stored.path, f"media/{stored.sha256}",
+                with_variants=known is None or not known.variants,
+            )
+        info = info or {}
+
+        table = Media.__table__
+        stmt = _upsert_for(db)(table).values(
+            sha256=stored.sha256,
+            path=f"media/{stored.sha256}{ext}",
+            size=stored.size,
+            ref_count=1,
+            **{name: info.get(name) for name in IMAGE_FIELDS},
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.sha256],
+            set_={
+                "ref_count": table.c.ref_count + 1,
+                **{name: func.coalesce(table.c[name], stmt.excluded[name]) for name in IMAGE_FIELDS},
+            },
+        ).returning(table.c.id, table.c.path, table.c.variants)
+        row = (await db.execute(stmt)).one()
+
+        # Same bytes under the row's key: (re)places the objects even if a purge
+        # racing this upload removed them while we waited for the row lock
+        if not info.get("variants") and row.variants:
+            present = [await storage.exists(k) for k in variant_keys(row.path, row.variants)]
+            if not all(present):
+                await _render_and_store(storage, stored.path, f"media/{stored.sha256}")
+        await storage.put_file(row.path, stored.path, cache_control=IMMUTABLE)
+    except BaseException:
+        _discard(stored.path)
+        raise
+
+    return await db.get(Media, row.id, populate_existing=True)
+
+
+# ==============================
+# Release
+# ==============================
+def delete_on_commit(db: AsyncSession, keys, sha256: str | None = None):
+    """
+    Delete storage objects once the caller's transaction commits; a rollback
+    keeps them, so rows that survive never point at missing files. `sha256`
+    marks shared media: its objects are kept if the content was stored again
+    in the meantime.
+    """
+    db.info.setdefault(_PENDING_DELETES, []).append((sha256, list(keys)))
+
+
+async def _delete_released(pending: list):
+    storage = get_storage()
+    for sha256, keys in pending:
+        try:
+            async with AsyncSessionLocal() as db:
+                if sha256 is not None:
+                    await _lock_content(db, sha256)
+                    if await db.scalar(select(Media.id).where(Media.sha256 == sha256)) is not None:
+                        continue
+                await storage.delete(*keys)
+        except Exception as e:
+            logger.warning(f"Failed to delete released media {keys}: {e}")
+
+
+@event.listens_for(Session, "after_commit")
+def _delete_committed(session):
+    pending = session.info.pop(_PENDING_DELETES, None)
+    if pending:
+        task = asyncio.get_running_loop().create_task(_delete_released(pending))
+        _delete_tasks.add(task)
+        task.add_done_callback(_delete_tasks.discard)
+
+
+@event.listens_for(Session, "after_rollback")
+def _keep_rolled_back(session):
+    session.info.pop(_PENDING_DELETES, None)
+
+
+async def release_media(db: AsyncSession, media_id: int):
+    """
+    Drop one reference. The last one deletes the row, and its files once the
+    caller commits; an upload of the same bytes meanwhile keeps them.
+    """
+    row = (await db.execute(
+        update(Media)
+        .where(Media.id == media_id)
+        .values(ref_count=Media.ref_count - 1)
+        .returning(Media.ref_count, Media.sha256, Media.path, Media.variants)
+        .execution_options(synchronize_session=False)
+    )).first()
+    if row is None or row.ref_count > 0:
+        return
+
+    await db.execute(delete(Media).where(Media.id == media_id, Media.ref_count <= 0))
+    delete_on_commit(db, [row.path, *variant_keys(row.path, row.variants)], sha256=row.sha256)
+
+
+async def delete_post_with_image(db: AsyncSession, post, folder: str):
+    """
+    Delete a gallery / event / placement row and release its image: shared
+    media by reference, older per-post files (no media_id, stored under
+    `folder`) directly. Files go once the caller commits.
+    """
+    media_id = post.media_id
+    key = image_key(post.image_path, folder)
+    variants = post.variants
+
+    await db.delete(post)
+    # The post row must be gone before its media row can be
+    await db.flush()
+
+    if media_id is not None:
+        await release_media(db, media_id)
+    else:
+        delete_on_commit(db, [key, *variant_keys(key, variants)])
+
+
+# ==============================
+# Backfill
+# ==============================
+async def analyze_stored_image(key: str, with_variants: bool = True) -> dict | None:
+    """
+    analyze_image() for an object already in storage (rows uploaded before a
+    field existed). Missing variants are stored next to it as <stem>_<width>.<fmt>.
+    Returns None when the object is missing or not a readable image.
+    """
+    storage = get_storage()
+    os.makedirs(storage.staging_dir, exist_ok=True)
+    fd, staged = tempfile.mkstemp(dir=storage.staging_dir, prefix=".backfill-", suffix=posixpath.splitext(key)[1])
+    try:
+        with os.fdopen(fd, "wb") as out:
+            async for chunk in storage.stream(key):
+                out.write(chunk)
+    except Exception as e:
+        _discard(staged)
+        logger.warning(f"Cannot read {key} from storage: {e}")
+        return None
+    except BaseException:
+        _discard(staged)
+        raise
+
+    try:
+        return await _render_and_store(storage, staged, posixpath.splitext(key)[0], with_variants)
+    finally:
+        _discard(staged)
@@ -1,46 +1,29 @@
-import os
-import uuid
-from datetime import datetime
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, func
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import UploadFile
 from app.models.placement_post import PlacementPost
-
-# Upload directory (relative to backend/app/)
-UPLOAD_FOLDER = "app/static_uploads/placements"
-
-
-# ==============================
-# Save Image
-# ==============================
-def save_placement_image(file: UploadFile) -> str:
-    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-
-    ext = file.filename.split(".")[-1]
-    filename = f"{uuid.uuid4().hex}.{ext}"
-    file_path = os.path.join(UPLOAD_FOLDER, filename)
-
-    with open(file_path, "wb") as f:
-        f.write(file.file.read())
-
-    # Path returned must match static serving path
-    return f"static_uploads/placements/{filename}"
+from app.services.content_version import PLACEMENTS, bump_content_version
+from app.services.media_store import delete_post_with_image, image_fields, store_upload
 
 
 # ==============================
 # Create Placement
 # ==============================
-def create_placement(db: Session, file: UploadFile):
-    image_path = save_placement_image(file)
+async def create_placement(db: AsyncSession, file: UploadFile):
+    # Stored once per distinct content (streamed, size limited, deduplicated by hash)
+    media = await store_upload(db, file)
 
     placement = PlacementPost(
-        image_path=image_path,
+        image_path=media.path,
+        **image_fields(media),
+        media_id=media.id,
         is_active=True,
     )
 
     db.add(placement)
-    db.commit()
-    db.refresh(placement)
+    await bump_content_version(db, PLACEMENTS)
+    await db.commit()
+    await db.refresh(placement)
 
     return placement
 
@@ -49,46 +32,45 @@ def create_placement(db: Session, file: UploadFile):
 # Get Active Placements
 # (For User Home Page)
 # ==============================
-def get_active_placements(db: Session):
-    return (
-        db.query(PlacementPost)
-        .filter(
+async def get_active_placements(db: AsyncSession):
+    return (await db.scalars(
+        select(PlacementPost)
+        .where(
             PlacementPost.deleted_at.is_(None),
             PlacementPost.is_active == True
         )
         .order_by(PlacementPost.created_at.desc())
-        .all()
-    )
+    )).all()
 
 
 # ==============================
 # Get All Placements (Admin)
 # ==============================
-def get_all_admin_placements(db: Session):
-    return (
-        db.query(PlacementPost)
-        .filter(PlacementPost.deleted_at.is_(None))
+async def get_all_admin_placements(db: AsyncSession):
+    return (await db.scalars(
+        select(PlacementPost)
+        .where(PlacementPost.deleted_at.is_(None))
         .order_by(PlacementPost.created_at.desc())
-        .all()
-    )
+    )).all()
 
 
 # ==============================
 # Deactivate / Activate Toggle
 # ==============================
-def deactivate_placement(db: Session, placement_id: int):
-    placement = db.query(PlacementPost).filter(
+async def deactivate_placement(db: AsyncSession, placement_id: int):
+    placement = await db.scalar(select(PlacementPost).where(
         PlacementPost.id == placement_id,
         PlacementPost.deleted_at.is_(None)
-    ).first()
+    ))
 
     if not placement:
         return None
 
     # TOGGLE instead of forcing false
     placement.is_active = not placement.is_active
-    db.commit()
-    db.refresh(placement)
+    await bump_content_version(db, PLACEMENTS)
+    await db.commit()
+    await db.refresh(placement)
 
     return placement
 
@@ -96,18 +78,19 @@ def deactivate_placement(db: Session, placement_id: int):
 # ==============================
 # Soft Delete (Send to Trash)
 # ==============================
-def delete_placement(db: Session, placement_id: int):
-    placement = db.query(PlacementPost).filter(
+async def delete_placement(db: AsyncSession, placement_id: int):
+    placement = await db.scalar(select(PlacementPost).where(
         PlacementPost.id == placement_id,
         PlacementPost.deleted_at.is_(None)
-    ).first()
+    ))
 
     if not placement:
         return None
 
     placement.deleted_at = func.now()
-    db.commit()
-    db.refresh(placement)
+    await bump_content_version(db, PLACEMENTS)
+    await db.commit()
+    await db.refresh(placement)
 
     return placement
 
@@ -115,31 +98,35 @@ def delete_placement(db: Session, placement_id: int):
 # ==============================
 # Trash Fetch Function
 # ==============================
-def get_deleted_placements(db: Session):
+def deleted_placements_query():
     return (
-        db.query(PlacementPost)
-        .filter(PlacementPost.deleted_at.isnot(None))
+        select(PlacementPost)
+        .where(PlacementPost.deleted_at.isnot(None))
         .order_by(PlacementPost.created_at.desc())
-        .all()
     )
 
 
+async def get_deleted_placements(db: AsyncSession):
+    return (await db.scalars(deleted_placements_query())).all()
+
+
 # ==============================
 # Restore Function
 # ==============================
-def restore_placement(db: Session, placement_id: int):
-    placement = db.query(PlacementPost).filter(
+async def restore_placement(db: AsyncSession, placement_id: int):
+    placement = await db.scalar(select(PlacementPost).where(
         PlacementPost.id == placement_id,
         PlacementPost.deleted_at.isnot(None) # Use isnot since is_not doesn't exist uniformly in sqlalchemy vs isnot() method. Or isnot(None) or is_(not None).
-    ).first()
+    ))
 
     if not placement:
         return None
 
     placement.deleted_at = None
     placement.is_active = True
-    db.commit()
-    db.refresh(placement)
+    await bump_content_version(db, PLACEMENTS)
+    await db.commit()
+    await db.refresh(placement)
 
     return placement
 
@@ -147,16 +134,18 @@ def restore_placement(db: Session, placement_id: int):
 # ==============================
 # Hard Delete (Permanently remove)
 # ==============================
-def hard_delete_placement(db: Session, placement_id: int):
-    placement = db.query(PlacementPost).filter(
+async def hard_delete_placement(db: AsyncSession, placement_id: int):
+    placement = await db.scalar(select(PlacementPost).where(
         PlacementPost.id == placement_id,
         PlacementPost.deleted_at.isnot(None)
-    ).first()
+    ))
 
     if not placement:
         return None
 
-    db.delete(placement)
-    db.commit()
+    # The file + variants go with the last post using them
+    await delete_post_with_image(db, placement, "placements")
+    await bump_content_version(db, PLACEMENTS)
+    await db.commit()
 
     return {"status": "permanently_deleted"}
@@ -0,0 +1,233 @@
+import errno
+import mimetypes
+import os
+import posixpath
+import shutil
+import tempfile
+from functools import lru_cache
+from typing import AsyncIterator
+
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+
+from app.core.config import (
+    STORAGE_BACKEND,
+    MEDIA_ROOT,
+    S3_BUCKET,
+    S3_ENDPOINT_URL,
+    S3_REGION,
+    S3_ACCESS_KEY_ID,
+    S3_SECRET_ACCESS_KEY,
+    S3_PUBLIC_URL,
+)
+
+CHUNK_SIZE = 256 * 1024
+
+
+class MediaStorage:
+    """
+    Where uploaded files live, addressed by key ("media/<sha256>.png",
+    "gallery/<name>" for older uploads). Keys are "/" separated on every backend.
+    """
+
+    # Local directory uploads are staged in before put_file()
+    staging_dir: str
+
+    async def put_file(self, key: str, src_path: str, cache_control: str | None = None):
+        """Store a local file under `key`, consuming it. Replaces an existing object atomically."""
+        raise NotImplementedError
+
+    async def get(self, key: str) -> bytes:
+        raise NotImplementedError
+
+    def stream(self, key: str, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """Read an object in chunks without loading it whole."""
+        raise NotImplementedError
+
+    async def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    async def delete(self, *keys: str):
+        """Delete objects; missing ones are ignored."""
+        raise NotImplementedError
+
+    def url(self, key: str) -> str:
+        """Public URL the frontend loads the object from."""
+        raise NotImplementedError
+
+    def local_path(self, key: str) -> str | None:
+        """Filesystem path of the object when stored on this node's disk."""
+        return None
+
+
+# ==============================
+# Local Filesystem
+# ==============================
+class LocalStorage(MediaStorage):
+    """Files under `root`, served by the app itself at /uploads/<key>."""
+
+    def __init__(self, root: str, url_prefix: str = "/uploads"):
+        self.root = os.path.abspath(root)
+        self.url_prefix = url_prefix.rstrip("/")
+        # Same filesystem as the root: put_file() is a rename
+        self.staging_dir = os.path.join(self.root, ".staging")
+
+    def local_path(self, key: str) -> str:
+        path = os.path.normpath(os.path.join(self.root, *key.split("/")))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+
+    def _put_file(self, key: str, src_path: str):
+        dest = self.local_path(key)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        try:
+            os.replace(src_path, dest)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            # Staged on another filesystem: copy next to the target, then rename
+            tmp = f"{dest}.part"
+            shutil.copyfile(src_path, tmp)
+            os.replace(tmp, dest)
+            os.remove(src_path)
+
+    async def put_file(self, key: str, src_path: str, cache_control: str | None = None):
+        await run_in_threadpool(self._put_file, key, src_path)
+
+    async def get(self, key: str) -> bytes:
+        def _read():
+            with open(self.local_path(key), "rb") as f:
+                return f.read()
+        return await run_in_threadpool(_read)
+
+    async def stream(self, key: str, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+        f = await run_in_threadpool(open, self.local_path(key), "rb")
+        try:
+            while chunk := await run_in_threadpool(f.read, chunk_size):
+                yield chunk
+        finally:
+            f.close()
+
+    async def exists(self, key: str) -> bool:
+        return os.path.exists(self.local_path(key))
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            try:
+                os.remove(self.local_path(key))
+            except (OSError, ValueError):
+                pass
+
+    def url(self, key: str) -> str:
+        return f"{self.url_prefix}/{key}"
+
+
+# ==============================
+# S3 API (AWS, MinIO, R2, LocalStack ...)
+# ==============================
+class S3Storage(MediaStorage):
+    """
+    Objects in one bucket; every app node sees the same files. Point
+    S3_ENDPOINT_URL at MinIO / LocalStack for a local stand-in. boto3 is
+    blocking, so calls run in the threadpool.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        endpoint_url: str | None = None,
+        region: str | None = None,
+        access_key_id: str | None = None,
+        secret_access_key: str | None = None,
+        public_url: str | None = None,
+    ):
+        # Only needed with STORAGE_BACKEND=s3
+        import boto3
+        from botocore.config import Config
+
+        self.bucket = bucket
+        self._client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=access_key_id,
+            aws_secret_access_key=secret_access_key,
+            # Custom endpoints rarely have per-bucket DNS names
+            config=Config(s3={"addressing_style": "path" if endpoint_url else "auto"}),
+        )
+        if public_url:
+            self.public_url = public_url.rstrip("/")
+        elif endpoint_url:
+            self.public_url = f"{endpoint_url.rstrip('/')}/{bucket}"
+        else:
+            self.public_url = f"https://{bucket}.s3.{region or 'us-east-1'}.amazonaws.com"
+        self.staging_dir = os.path.join(tempfile.gettempdir(), "kanglei-uploads")
+
+    async def put_file(self, key: str, src_path: str, cache_control: str | None = None):
+        extra = {"ContentType": mimetypes.guess_type(key)[0] or "application/octet-stream"}
+        if cache_control:
+            extra["CacheControl"] = cache_control
+        await run_in_threadpool(self._client.upload_file, src_path, self.bucket, key, ExtraArgs=extra)
+        os.remove(src_path)
+
+    async def get(self, key: str) -> bytes:
+        def _read():
+            return self._client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+        return await run_in_threadpool(_read)
+
+    async def stream(self, key: str, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+        body = (await run_in_threadpool(self._client.get_object, Bucket=self.bucket, Key=key))["Body"]
+        try:
+            async for chunk in iterate_in_threadpool(body.iter_chunks(chunk_size)):
+                yield chunk
+        finally:
+            body.close()
+
+    async def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            await run_in_threadpool(self._client.head_object, Bucket=self.bucket, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    async def delete(self, *keys: str):
+        # DeleteObjects takes up to 1000 keys per call
+        for i in range(0, len(keys), 1000):
+            batch = [{"Key": k} for k in keys[i:i + 1000]]
+            await run_in_threadpool(
+                self._client.delete_objects,
+                Bucket=self.bucket,
+                Delete={"Objects": batch, "Quiet": True},
+            )
+
+    def url(self, key: str) -> str:
+        return f"{self.public_url}/{key}"
+
+
+@lru_cache(maxsize=1)
+def get_storage() -> MediaStorage:
+    if STORAGE_BACKEND == "s3":
+        return S3Storage(
+            S3_BUCKET,
+            endpoint_url=S3_ENDPOINT_URL,
+            region=S3_REGION,
+            access_key_id=S3_ACCESS_KEY_ID,
+            secret_access_key=S3_SECRET_ACCESS_KEY,
+            public_url=S3_PUBLIC_URL,
+        )
+    return LocalStorage(MEDIA_ROOT)
+
+
+def image_key(image_path: str, folder: str) -> str:
+    """
+    Storage key of a post's image. New uploads store the key itself
+    (media/...); older rows hold a disk path whose file name lives under
+    the post type's `folder`.
+    """
+    name = posixpath.basename(image_path.replace("\\", "/"))
+    parent = posixpath.basename(posixpath.dirname(image_path.replace("\\", "/")))
+    return f"{'media' if parent == 'media' else folder}/{name}"
@@ -0,0 +1,94 @@
+import hashlib
+import os
+import tempfile
+import uuid
+from dataclasses import dataclass
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import MAX_UPLOAD_MB
+
+# Copy granularity: the most of an upload held in memory at any time
+CHUNK_SIZE = 256 * 1024
+
+MAX_UPLOAD_BYTES = MAX_UPLOAD_MB * 1024 * 1024
+
+
+@dataclass
+class StoredUpload:
+    path: str        # final absolute / working-dir relative path
+    filename: str    # basename of `path`
+    size: int        # bytes
+    sha256: str      # hex digest of the content
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(status_code=400, detail=f"File too large (> {MAX_UPLOAD_MB} MB)")
+
+
+def _copy_to_temp(src, out_dir: str, max_bytes: int) -> tuple[str, int, str]:
+    """Chunked copy into a temp file in `out_dir`, hashing as it goes. Returns (tmp path, size, sha256)."""
+    fd, tmp_path = tempfile.mkstemp(dir=out_dir, prefix=".upload-", suffix=".part")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = src.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge()
+                digest.update(chunk)
+                out.write(chunk)
+            out.flush()
+            os.fsync(out.fileno())
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    return tmp_path, size, digest.hexdigest()
+
+
+async def ingest_upload(
+    file: UploadFile,
+    out_dir: str,
+    ext: str,
+    max_bytes: int = MAX_UPLOAD_BYTES,
+) -> StoredUpload:
+    """
+    Stream an upload into `out_dir` under a fresh name with extension `ext`.
+
+    Memory stays at one chunk per upload: the data is copied in CHUNK_SIZE
+    pieces to a temp file in the target directory, hashed on the way, and
+    renamed into place only once complete (readers never see a partial file).
+    Raises a 400 as soon as `max_bytes` is exceeded.
+    """
+    # Multipart parts carry their size once parsed: reject without copying
+    if file.size is not None and file.size > max_bytes:
+        raise _too_large()
+
+    os.makedirs(out_dir, exist_ok=True)
+    await file.seek(0)
+    try:
+        tmp_path, size, sha256 = await run_in_threadpool(_copy_to_temp, file.file, out_dir, max_bytes)
+    except UploadTooLarge:
+        raise _too_large()
+
+    filename = f"{uuid.uuid4().hex}{ext}"
+    path = os.path.join(out_dir, filename)
+    os.replace(tmp_path, path)
+    return StoredUpload(path=path, filename=filename, size=size, sha256=sha256)
+
+
+def upload_extension(file: UploadFile, default: str = ".jpg") -> str:
+    """Lower-case extension of the client's file name (with dot), or `default`."""
+    return os.path.splitext(file.filename or "")[1].lower() or default
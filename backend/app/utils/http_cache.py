@@ -0,0 +1,42 @@
+from datetime import datetime
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request
+
+
+def validator_headers(etag: str, last_modified: datetime | None = None) -> dict:
+    """ETag / Last-Modified plus no-cache: clients may store the body but must revalidate."""
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    return headers
+
+
+def _etag_listed(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison: W/"x" matches "x"
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime | None = None) -> bool:
+    """
+    Conditional GET check (RFC 9110 13.2.2): If-None-Match wins;
+    If-Modified-Since is only consulted when no entity tag was sent.
+    """
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        return _etag_listed(inm, etag)
+
+    ims = request.headers.get("if-modified-since")
+    if ims and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(ims)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            return False
+        # HTTP dates carry whole seconds
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
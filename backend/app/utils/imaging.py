@@ -0,0 +1,90 @@
+"""
+Pillow work for uploaded images. Kept free of app imports: these functions
+run inside worker processes of the image pool.
+"""
+import base64
+import io
+import os
+
+from PIL import Image, ImageOps, features
+
+SAVE_OPTIONS = {
+    "avif": {"quality": 55, "speed": 6},
+    "webp": {"quality": 78, "method": 4},
+}
+
+# Longest side of the inline blur placeholder; a few hundred bytes as WebP
+PLACEHOLDER_SIZE = 16
+
+
+def supported_formats(formats) -> list[str]:
+    """Keep only the formats this Pillow build can encode."""
+    return [f for f in formats if f in SAVE_OPTIONS and features.check(f)]
+
+
+def variant_widths(original_width: int, widths) -> list[int]:
+    """Configured widths below the original, plus the original itself when it is within range."""
+    targets = {w for w in widths if w < original_width}
+    if original_width <= max(widths):
+        targets.add(original_width)
+    return sorted(targets)
+
+
+def dominant_color(im: Image.Image) -> str:
+    """Most common colour of a small palette-reduced copy, as #rrggbb."""
+    small = im.convert("RGB")
+    small.thumbnail((64, 64))
+    quantized = small.quantize(colors=8)
+    _, index = max(quantized.getcolors())
+    r, g, b = quantized.getpalette()[index * 3:index * 3 + 3]
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def placeholder_data_uri(im: Image.Image) -> str:
+    """Tiny low-quality copy as a data URI, blurred up by the browser while the real image loads."""
+    thumb = im.copy()
+    thumb.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), Image.LANCZOS)
+    buf = io.BytesIO()
+    if features.check("webp"):
+        thumb.save(buf, "WEBP", quality=40)
+        mime = "image/webp"
+    else:
+        thumb.convert("RGB").save(buf, "JPEG", quality=40)
+        mime = "image/jpeg"
+    return f"data:{mime};base64,{base64.b64encode(buf.getvalue()).decode()}"
+
+
+def process_image(src_path: str, widths, formats) -> dict:
+    """
+    Decode an upload once and derive everything the listings need from it:
+    displayed width / height (after EXIF rotation), dominant colour, an inline
+    placeholder, and `<stem>_<width>.<fmt>` variants written next to `src_path`
+    for every width / format (none when `formats` is empty).
+    "variants" is [{"w", "h", "fmt", "file"}] with file names relative to the source directory.
+    """
+    stem = os.path.splitext(src_path)[0]
+    variants = []
+
+    with Image.open(src_path) as im:
+        im = ImageOps.exif_transpose(im)
+        im = im.convert("RGBA" if im.has_transparency_data else "RGB")
+        w0, h0 = im.size
+        info = {
+            "width": w0,
+            "height": h0,
+            "dominant_color": dominant_color(im),
+            "placeholder": placeholder_data_uri(im),
+        }
+
+        for w in variant_widths(w0, widths) if widths and formats else []:
+            h = max(1, round(h0 * w / w0))
+            resized = im if w == w0 else im.resize((w, h), Image.LANCZOS)
+            for fmt in formats:
+                path = f"{stem}_{w}.{fmt}"
+                tmp = f"{path}.tmp"
+                resized.save(tmp, fmt.upper(), **SAVE_OPTIONS[fmt])
+                os.replace(tmp, path)
+                variants.append({"w": w, "h": h, "fmt": fmt, "file": os.path.basename(path)})
+
+    info["variants"] = variants or None
+    return info
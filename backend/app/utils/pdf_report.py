@@ -0,0 +1,119 @@
+"""
+reportlab table reports, rendered in chunks and merged. Kept free of app
+imports: these functions run inside worker processes of the export pool.
+"""
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Table, TableStyle
+
+PAGE_SIZE = landscape(A4)
+MARGIN = 24
+HEADER_SPACE = 48
+CELL_PADDING = 3
+
+CELL_STYLE = ParagraphStyle("cell", fontName="Helvetica", fontSize=7, leading=8.5)
+HEAD_STYLE = ParagraphStyle("head", parent=CELL_STYLE, fontName="Helvetica-Bold", textColor=colors.white)
+
+TABLE_STYLE = TableStyle([
+    ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#2563eb")),
+    ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.HexColor("#f1f5f9")]),
+    ("GRID", (0, 0), (-1, -1), 0.25, colors.HexColor("#cbd5e1")),
+    ("FONT", (0, 1), (-1, -1), CELL_STYLE.fontName, CELL_STYLE.fontSize, CELL_STYLE.leading),
+    ("VALIGN", (0, 0), (-1, -1), "TOP"),
+    ("LEFTPADDING", (0, 0), (-1, -1), CELL_PADDING),
+    ("RIGHTPADDING", (0, 0), (-1, -1), CELL_PADDING),
+    ("TOPPADDING", (0, 0), (-1, -1), 2),
+    ("BOTTOMPADDING", (0, 0), (-1, -1), 2),
+])
+
+
+def render_table_chunk(path: str, title: str, subtitle: str, headers, weights, rows) -> int:
+    """
+    Render `rows` (lists of strings) as a table PDF at `path`. The report title
+    is drawn on every page and the header row repeats after each page break;
+    long cells wrap. Column widths split the page by `weights`. Returns the page count.
+    """
+    width = PAGE_SIZE[0] - 2 * MARGIN
+    total = sum(weights)
+    col_widths = [width * w / total for w in weights]
+
+    def on_page(c, doc):
+        c.saveState()
+        c.setFont("Helvetica-Bold", 12)
+        c.drawString(MARGIN, PAGE_SIZE[1] - MARGIN - 8, title)
+        c.setFont("Helvetica", 8)
+        c.drawString(MARGIN, PAGE_SIZE[1] - MARGIN - 22, subtitle)
+        c.restoreState()
+
+    # Plain strings draw far faster than Paragraphs: wrap only what does not fit
+    fits = [w - 2 * CELL_PADDING for w in col_widths]
+
+    def cell(value: str, i: int):
+        if "\n" not in value and stringWidth(value, CELL_STYLE.fontName, CELL_STYLE.fontSize) <= fits[i]:
+            return value
+        return Paragraph(escape(value).replace("\n", "<br/>"), CELL_STYLE)
+
+    data = [[Paragraph(escape(h), HEAD_STYLE) for h in headers]]
+    data += [[cell(v, i) for i, v in enumerate(row)] for row in rows]
+    table = Table(data, colWidths=col_widths, repeatRows=1)
+    table.setStyle(TABLE_STYLE)
+
+    doc = SimpleDocTemplate(
+        path,
+        pagesize=PAGE_SIZE,
+        leftMargin=MARGIN,
+        rightMargin=MARGIN,
+        topMargin=MARGIN + HEADER_SPACE,
+        bottomMargin=MARGIN + 12,
+        title=title,
+    )
+    doc.build([table], onFirstPage=on_page, onLaterPages=on_page)
+    return doc.page
+
+
+def _page_numbers(total: int) -> BytesIO:
+    """One overlay page per page of the report, carrying "Page n of total"."""
+    out = BytesIO()
+    c = canvas.Canvas(out, pagesize=PAGE_SIZE)
+    c.setFont("Helvetica", 7)
+    for n in range(1, total + 1):
+        c.drawRightString(PAGE_SIZE[0] - MARGIN, MARGIN, f"Page {n} of {total}")
+        c.showPage()
+    c.save()
+    out.seek(0)
+    return out
+
+
+def merge_chunks(paths, out_path: str) -> int:
+    """
+    Concatenate chunk PDFs in order into `out_path`, numbering pages across
+    the whole report. One chunk file is open at a time; its pages are copied
+    into the writer and the reader released. The writer still holds every
+    page object until it writes, so memory grows with the report's size.
+    """
+    from pypdf import PdfReader, PdfWriter
+
+    total = 0
+    for p in paths:
+        with open(p, "rb") as f:
+            total += len(PdfReader(f).pages)
+    numbers = PdfReader(_page_numbers(total)).pages
+
+    writer = PdfWriter()
+    n = 0
+    for p in paths:
+        with open(p, "rb") as f:
+            for page in PdfReader(f).pages:
+                page.merge_page(numbers[n])
+                # add_page copies the page's objects: nothing refers back to this file
+                writer.add_page(page)
+                n += 1
+    with open(out_path, "wb") as f:
+        writer.write(f)
+    return total
@@ -0,0 +1,26 @@
+import re
+
+# Numbers typed without a country code are assumed to be Indian mobiles
+DEFAULT_COUNTRY_CODE = "91"
+
+
+def normalize_phone(raw: str | None) -> str:
+    """
+    Canonical E.164-style form used for duplicate detection.
+    "+91 98765-43210", "098765 43210", "0091 9876543210" and "9876543210"
+    all become "+919876543210".
+    """
+    raw = (raw or "").strip()
+    digits = re.sub(r"\D", "", raw)
+
+    # "00" international dialing prefix
+    if raw.startswith("00"):
+        digits = digits[2:]
+    # Trunk prefix: 0 + 10 digit national number
+    elif len(digits) == 11 and digits.startswith("0"):
+        digits = digits[1:]
+
+    if len(digits) == 10:
+        digits = DEFAULT_COUNTRY_CODE + digits
+
+    return f"+{digits}" if digits else ""
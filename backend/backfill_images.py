@@ -0,0 +1,128 @@
+"""
+Fill in size, dominant colour and blur placeholder (plus any missing WebP/AVIF
+variants) for gallery, event and placement images stored before these were
+computed at upload. Images are decoded in parallel worker processes.
+Safe to re-run: rows already filled are skipped.
+
+Usage (from backend/):
+    python backfill_images.py [--workers 4] [--dry-run]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.getcwd())
+
+# Post type -> (model name, legacy upload folder, feed whose ETag changes)
+POST_TYPES = (
+    ("GalleryPost", "gallery", "gallery"),
+    ("EventPoster", "events", "events"),
+    ("PlacementPost", "placements", "placements"),
+)
+
+
+def _needs_work(model, formats):
+    from sqlalchemy import or_
+
+    # Without an encoder for any variant format, variants stay empty: don't retry them
+    if formats:
+        return or_(model.width.is_(None), model.variants.is_(None))
+    return model.width.is_(None)
+
+
+async def backfill(workers: int, dry_run: bool):
+    from sqlalchemy import select, update
+
+    from app import models
+    from app.db.session import AsyncSessionLocal
+    from app.models.media import Media
+    from app.services.content_version import bump_content_version
+    from app.services.image_variants import FORMATS
+    from app.services.media_store import IMAGE_FIELDS, IMAGE_META, analyze_stored_image
+    from app.services.storage import image_key
+
+    async with AsyncSessionLocal() as db:
+        media_rows = (await db.execute(
+            select(Media.id, Media.path, Media.variants).where(_needs_work(Media, FORMATS))
+        )).all()
+        legacy = []
+        for model_name, folder, _ in POST_TYPES:
+            model = getattr(models, model_name)
+            rows = (await db.execute(
+                select(model.id, model.image_path, model.variants)
+                .where(model.media_id.is_(None), _needs_work(model, FORMATS))
+            )).all()
+            legacy += [(model, image_key(r.image_path, folder), r) for r in rows]
+
+    print(f"media rows: {len(media_rows)}  older post rows: {len(legacy)}  workers: {workers}")
+    if dry_run:
+        return
+
+    # Keep every worker process busy while downloads / uploads of the others are in flight
+    sem = asyncio.Semaphore(workers * 2)
+    done, failed = 0, 0
+
+    async def one(model, key, row):
+        nonlocal done, failed
+        async with sem:
+            info = await analyze_stored_image(key, with_variants=not row.variants)
+        if not info:
+            failed += 1
+            print(f"  skipped {key}")
+            return
+        values = {name: info[name] for name in IMAGE_META}
+        if info["variants"]:
+            values["variants"] = info["variants"]
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(model).where(model.id == row.id).values(**values))
+            await db.commit()
+        done += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(
+        *(one(Media, r.path, r) for r in media_rows),
+        *(one(model, key, r) for model, key, r in legacy),
+    )
+
+    # Posts of shared media copy the media row's fields
+    async with AsyncSessionLocal() as db:
+        for model_name, _, _ in POST_TYPES:
+            model = getattr(models, model_name)
+            await db.execute(
+                update(model)
+                .where(model.media_id.is_not(None), _needs_work(model, FORMATS))
+                .values(**{
+                    name: select(getattr(Media, name)).where(Media.id == model.media_id).scalar_subquery()
+                    for name in IMAGE_FIELDS
+                })
+            )
+        await bump_content_version(db, *(feed for _, _, feed in POST_TYPES))
+        await db.commit()
+
+    print(f"filled {done}, skipped {failed} in {time.perf_counter() - t0:.1f}s")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    ap.add_argument("--dry-run", action="store_true")
+    args = ap.parse_args()
+
+    # Sizes the image process pool; read when the app config is first imported
+    os.environ["IMAGE_WORKERS"] = str(args.workers)
+
+    from app.db.init_db import init_db
+    from app.services.image_variants import shutdown_image_pool
+
+    # Adds the new columns to existing tables
+    init_db()
+    try:
+        asyncio.run(backfill(args.workers, args.dry_run))
+    finally:
+        shutdown_image_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Throughput of public appointment ingestion:
+per-request commit (current default path) vs write-behind batching.
+
+Usage (from backend/):
+    python bench_appointment_ingest.py [--rows 2000] [--concurrency 200]
+
+Uses BENCH_DATABASE_URL if set, otherwise a throwaway SQLite file.
+Point it at a scratch Postgres database to get production-like numbers.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.append(os.getcwd())
+
+_tmp = tempfile.mkdtemp(prefix="kanglei_bench_")
+os.environ["DATABASE_URL"] = os.getenv("BENCH_DATABASE_URL", f"sqlite:///{_tmp}/bench.db")
+os.environ.setdefault("SECRET_KEY", "bench")
+
+from app.db.init_db import init_db  # noqa: E402
+from app.db.session import AsyncSessionLocal  # noqa: E402
+from app.schemas.appointment import AppointmentCreate  # noqa: E402
+from app.services.appointment_service import build_appointment_values  # noqa: E402
+from app.services.appointment_ingest import AppointmentBatcher  # noqa: E402
+from app.api.v1.endpoints.appointments import _insert_appointment  # noqa: E402
+
+
+def _payloads(run: str, n: int):
+    for i in range(n):
+        yield AppointmentCreate(
+            name=f"Bench {run} {i}",
+            # Unique numbers so the duplicate guard never fires
+            phone=f"{7 if run == 'direct' else 8}{i:09d}",
+            location="Imphal",
+        )
+
+
+async def _drive(payloads, concurrency: int, one):
+    sem = asyncio.Semaphore(concurrency)
+
+    async def worker(payload):
+        async with sem:
+            await one(build_appointment_values(payload, datetime.now().astimezone()))
+
+    return [worker(p) for p in payloads]
+
+
+async def bench_direct(rows: int, concurrency: int) -> float:
+    async def one(values):
+        async with AsyncSessionLocal() as db:
+            await _insert_appointment(db, values)
+
+    tasks = await _drive(_payloads("direct", rows), concurrency, one)
+    t0 = time.perf_counter()
+    await asyncio.gather(*tasks)
+    return time.perf_counter() - t0
+
+
+async def bench_batched(rows: int, concurrency: int, batch_size: int, max_wait_ms: int) -> float:
+    batcher = AppointmentBatcher(batch_size=batch_size, max_wait=max_wait_ms / 1000, maxsize=rows)
+    batcher.start()
+
+    tasks = await _drive(_payloads("batched", rows), concurrency, batcher.submit)
+    t0 = time.perf_counter()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - t0
+
+    await batcher.stop()
+    return elapsed
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=2000)
+    ap.add_argument("--concurrency", type=int, default=200)
+    ap.add_argument("--batch-size", type=int, default=100)
+    ap.add_argument("--max-wait-ms", type=int, default=20)
+    args = ap.parse_args()
+
+    init_db()
+    print(f"DB: {os.environ['DATABASE_URL']}")
+    print(f"rows={args.rows} concurrency={args.concurrency} batch_size={args.batch_size}")
+
+    direct = asyncio.run(bench_direct(args.rows, args.concurrency))
+    batched = asyncio.run(bench_batched(args.rows, args.concurrency, args.batch_size, args.max_wait_ms))
+
+    print(f"per-request commit : {args.rows / direct:8.0f} rows/s ({direct:.2f}s)")
+    print(f"write-behind batch : {args.rows / batched:8.0f} rows/s ({batched:.2f}s)")
+    print(f"speedup            : {direct / batched:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
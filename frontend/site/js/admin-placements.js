@@ -82,12 +82,7 @@ async function loadPlacements() {
 // ─── Render Row ────────────────────────────────────────────────────────────
 
 function renderPlacementRow(item) {
-    const cleanedPath = item.image_path
-        ? item.image_path.replace(/^static_uploads\//, '')
-        : '';
-    const imgUrl = cleanedPath
-        ? toAssetUrl(`uploads/${cleanedPath}`)
-        : toAssetUrl(null);
+    const imgUrl = toAssetUrl(item.image_url);
 
     const isActive = item.is_active;
 
@@ -1,4 +1,4 @@
-import { apiPost, apiGet, apiPatch, apiPostForm, apiDelete, toAssetUrl, API_BASE } from './api.js';
+import { apiPost, apiGet, apiPatch, apiPostForm, apiDelete, toAssetUrl, authHeader, API_BASE } from './api.js';
 import { showToast } from './toast.js';
 import { showConfirm } from './confirm.js';
 
@@ -142,12 +142,15 @@ async function initDashboard() {
     const selectedCount = document.getElementById('selected-count');
     const deleteBtn = document.getElementById('delete-selected-btn');
 
-    let allAppointments = []; // Store source of truth
+    let pageItems = []; // Rows of the page on screen
     let currentFilter = '';
     let currentSearch = '';
-    let currentlyFiltered = [];
     let currentLocation = 'Imphal'; // Default location
     let currentPage = 1;
+    // Keyset paging: pageCursors[n - 1] opens page n (page 1 has none)
+    let pageCursors = [null];
+    let nextCursor = null;
+    let fetchSeq = 0;
     const rowsPerPage = 10;
 
     // Location Filter Tabs
@@ -159,6 +162,7 @@ async function initDashboard() {
                 tab.classList.add('active');
                 currentLocation = tab.dataset.loc;
                 fetchAppointments();
+                loadStats();
             });
         });
     }
@@ -172,41 +176,9 @@ async function initDashboard() {
         interview_class: "Interview Class"
     };
 
-    // Render Function (Client-side filtering)
+    // Render Function (the server filters and pages)
     const renderTable = () => {
-        // 1. Filter
-        currentlyFiltered = allAppointments.filter(appt => {
-            // Filter by Appointment Type (array check)
-            let matchesType = true;
-            if (currentFilter) {
-                // If appointment_type is array, check if it includes currentFilter
-                if (Array.isArray(appt.appointment_type)) {
-                    matchesType = appt.appointment_type.includes(currentFilter);
-                } else {
-                    // Fallback for logic if strict array is expected
-                    matchesType = false;
-                }
-            }
-
-            const matchesSearch = currentSearch
-                ? (appt.name.toLowerCase().includes(currentSearch) || appt.phone.includes(currentSearch))
-                : true;
-            return matchesType && matchesSearch;
-        });
-
-        // Track pagination data BEFORE slicing for rendering
-        const totalItems = currentlyFiltered.length;
-        const totalPages = Math.ceil(totalItems / rowsPerPage) || 1;
-
-        if (currentPage > totalPages) currentPage = totalPages;
-        if (currentPage < 1) currentPage = 1;
-
-        // Render Analytics based on ALL filtered data, before pagination chops it up
-        calculateAnalytics(currentlyFiltered);
-
         const startIndex = (currentPage - 1) * rowsPerPage;
-        const endIndex = startIndex + rowsPerPage;
-        const pageData = currentlyFiltered.slice(startIndex, endIndex);
 
         // Update Pagination UI
         const pageInfo = document.getElementById('page-info');
@@ -214,7 +186,7 @@ async function initDashboard() {
         const nextBtn = document.getElementById('next-page');
 
         if (pageInfo) {
-            pageInfo.textContent = `Showing ${totalItems === 0 ? 0 : startIndex + 1}–${Math.min(endIndex, totalItems)} of ${totalItems}`;
+            pageInfo.textContent = `Showing ${pageItems.length === 0 ? 0 : startIndex + 1}–${startIndex + pageItems.length}`;
         }
         if (prevBtn) {
             prevBtn.disabled = currentPage === 1;
@@ -222,7 +194,7 @@ async function initDashboard() {
             prevBtn.classList.toggle('cursor-not-allowed', currentPage === 1);
         }
         if (nextBtn) {
-            const isLast = currentPage === totalPages || totalItems === 0;
+            const isLast = !nextCursor;
             nextBtn.disabled = isLast;
             nextBtn.classList.toggle('opacity-50', isLast);
             nextBtn.classList.toggle('cursor-not-allowed', isLast);
@@ -231,13 +203,13 @@ async function initDashboard() {
         // 2. Render Check
         tbody.innerHTML = '';
 
-        if (currentlyFiltered.length === 0) {
+        if (pageItems.length === 0) {
             if (empty) empty.style.display = 'flex';
             return;
         }
         if (empty) empty.style.display = 'none';
 
-        pageData.forEach((appt, index) => {
+        pageItems.forEach((appt, index) => {
             const row = document.createElement('tr');
             row.className = 'hover:bg-slate-50 dark:hover:bg-slate-800/50 transition-colors group';
             row.dataset.location = appt.location || 'Not Specified';
@@ -286,52 +258,46 @@ async function initDashboard() {
     // ─── Analytics Engine ──────────────────────────────────────────────────
     let analyticsChartInstance = null;
 
-    function calculateAnalytics(data) {
-        if (!data) return;
-
+    // Counters and chart come from the server-side daily rollup, so they cover
+    // every appointment in the location, not just the rows loaded in the table
+    async function loadStats() {
         const now = new Date();
-        const startOfToday = new Date(now.getFullYear(), now.getMonth(), now.getDate());
-        const startOfYesterday = new Date(startOfToday.getTime() - 86400000);
-        const startOfMonth = new Date(now.getFullYear(), now.getMonth(), 1);
-        const startOfLastMonth = new Date(now.getFullYear(), now.getMonth() - 1, 1);
-        const startOfYear = new Date(now.getFullYear(), 0, 1);
-
-        let countToday = 0;
-        let countYesterday = 0;
-        let countThisMonth = 0;
-        let countLastMonth = 0;
-        let countThisYear = 0;
-
-        // Array to count last 14 days
-        const last14DaysCounts = new Array(14).fill(0);
-        const last14DaysLabels = [];
-        for (let i = 13; i >= 0; i--) {
-            const d = new Date(now.getFullYear(), now.getMonth(), now.getDate() - i);
-            last14DaysLabels.push(d.toLocaleDateString('en-US', { month: 'short', day: 'numeric' }));
+        // Enough monthly buckets for "this year" and "last month"
+        const months = Math.max(2, now.getMonth() + 1);
+        try {
+            const stats = await apiGet(`/admin/appointments/stats?days=14&months=${months}`, true);
+            calculateAnalytics(stats);
+        } catch (err) {
+            console.error('Stats error:', err);
         }
+    }
 
-        data.forEach(appt => {
-            const created = new Date(appt.created_at);
-            if (isNaN(created.getTime())) return;
-
-            if (created >= startOfToday) countToday++;
-            else if (created >= startOfYesterday && created < startOfToday) countYesterday++;
-
-            if (created >= startOfMonth) countThisMonth++;
-            else if (created >= startOfLastMonth && created < startOfMonth) countLastMonth++;
-
-            if (created >= startOfYear) countThisYear++;
+    function calculateAnalytics(stats) {
+        if (!stats) return;
 
-            // Chart distribution
-            const diffTime = Math.abs(startOfToday - new Date(created.getFullYear(), created.getMonth(), created.getDate()));
-            const diffDays = Math.floor(diffTime / (1000 * 60 * 60 * 24));
-            // if within 13 days in the past (14 total bounds)
-            if (created >= startOfToday) {
-                last14DaysCounts[13]++;
-            } else if (diffDays > 0 && diffDays <= 13) {
-                last14DaysCounts[13 - diffDays]++; // 13 is today, 12 is yesterday...
-            }
-        });
+        const now = new Date();
+        const count = bucket => currentLocation
+            ? (bucket.by_location[currentLocation] || 0)
+            : bucket.total;
+        const parseDay = period => {
+            const [y, m, d] = period.split('-').map(Number);
+            return new Date(y, m - 1, d);
+        };
+
+        const daily = stats.daily;
+        const monthly = stats.monthly;
+
+        const countToday = count(daily[daily.length - 1]);
+        const countYesterday = daily.length > 1 ? count(daily[daily.length - 2]) : 0;
+        const countThisMonth = count(monthly[monthly.length - 1]);
+        const countLastMonth = monthly.length > 1 ? count(monthly[monthly.length - 2]) : 0;
+        const countThisYear = monthly
+            .filter(b => parseDay(b.period).getFullYear() === now.getFullYear())
+            .reduce((sum, b) => sum + count(b), 0);
+
+        const last14DaysLabels = daily.map(b =>
+            parseDay(b.period).toLocaleDateString('en-US', { month: 'short', day: 'numeric' }));
+        const last14DaysCounts = daily.map(count);
 
         // Update UI Text
         const safeSet = (id, val) => { const el = document.getElementById(id); if (el) el.textContent = val; };
@@ -340,7 +306,7 @@ async function initDashboard() {
         safeSet('stat-yesterday', countYesterday);
         safeSet('stat-month', countThisMonth);
         safeSet('stat-year', countThisYear);
-        safeSet('stat-total', data.length);
+        safeSet('stat-total', count(stats.all_time));
 
         // Trend calculations
         const trendToday = document.getElementById('trend-today');
@@ -458,23 +424,26 @@ async function initDashboard() {
         });
     }
 
+    // Filters shared by the list pages and the export
+    const listParams = () => {
+        const params = new URLSearchParams();
+        if (currentLocation) params.set('location', currentLocation);
+        if (currentSearch) params.set('q', currentSearch);
+        if (currentFilter) params.set('appointment_type', currentFilter);
+        return params;
+    };
+
     const exportExcelBtn = document.getElementById('exportExcelBtn');
     if (exportExcelBtn) {
-        exportExcelBtn.addEventListener('click', (e) => {
+        exportExcelBtn.addEventListener('click', async (e) => {
             e.preventDefault();
 
-            if (currentlyFiltered.length === 0) {
+            if (pageItems.length === 0) {
                 if (typeof showToast === 'function') showToast("No records to export.", "error");
                 else alert("No records to export.");
                 return;
             }
 
-            if (typeof XLSX === 'undefined') {
-                if (typeof showToast === 'function') showToast("Excel export library not loaded.", "error");
-                else alert("Excel export library not loaded.");
-                return;
-            }
-
             const originalText = exportExcelBtn.innerHTML;
             exportExcelBtn.innerHTML = `
                 <svg class="w-4 h-4 animate-spin inline-block mr-1" fill="none" viewBox="0 0 24 24">
@@ -485,46 +454,21 @@ async function initDashboard() {
             exportExcelBtn.disabled = true;
 
             try {
-                const headers = ['SL No.', 'Name', 'Phone', 'Address', 'Type', 'Appointment Date', 'Message'];
-                const excelData = [headers];
-
-                currentlyFiltered.forEach((appt, index) => {
-                    const typeStr = Array.isArray(appt.appointment_type) ? appt.appointment_type.map(t => TYPE_LABELS[t] || t).join('; ') : (appt.appointment_type || '-');
-                    const dateStr = new Date(appt.created_at).toLocaleDateString('en-US', { month: 'short', day: 'numeric', year: 'numeric' });
-
-                    const row = [
-                        index + 1,
-                        appt.name || '',
-                        appt.phone || '',
-                        appt.address || '',
-                        typeStr,
-                        dateStr,
-                        appt.message || ''
-                    ];
-                    excelData.push(row);
-                });
-
-                // Create Workbook
-                const wb = XLSX.utils.book_new();
-                const ws = XLSX.utils.aoa_to_sheet(excelData);
-
-                // Auto-size columns slightly
-                const colWidths = [
-                    { wch: 8 },  // SL No
-                    { wch: 20 }, // Name
-                    { wch: 15 }, // Phone
-                    { wch: 30 }, // Address
-                    { wch: 15 }, // Type
-                    { wch: 18 }, // Appt Date
-                    { wch: 40 }  // Message
-                ];
-                ws['!cols'] = colWidths;
-
-                XLSX.utils.book_append_sheet(wb, ws, "Appointments");
+                // Every matching row, not just the page on screen: the server writes the workbook
+                const params = listParams();
+                params.set('format', 'xlsx');
+                const res = await fetch(`${API_BASE}/admin/appointments/export?${params}`, { headers: authHeader() });
+                if (!res.ok) throw new Error(`HTTP ${res.status}`);
+                const blob = await res.blob();
 
                 // Download
-                const filename = `Appointments_Export_${new Date().toISOString().slice(0, 10)}.xlsx`;
-                XLSX.writeFile(wb, filename);
+                const link = document.createElement('a');
+                link.href = URL.createObjectURL(blob);
+                link.download = `Appointments_Export_${new Date().toISOString().slice(0, 10)}.xlsx`;
+                document.body.appendChild(link);
+                link.click();
+                link.remove();
+                URL.revokeObjectURL(link.href);
 
                 if (typeof showToast === 'function') showToast("Excel exported successfully!", "success");
 
@@ -538,47 +482,62 @@ async function initDashboard() {
         });
     }
 
-    const fetchAppointments = async () => {
+    // Loads page `currentPage`; `reset` goes back to page 1 (new location / search / type)
+    const fetchAppointments = async (reset = true) => {
+        if (reset) {
+            currentPage = 1;
+            pageCursors = [null];
+        }
+        const seq = ++fetchSeq;
         tbody.style.opacity = '0.5';
         if (loading) loading.classList.remove('hidden');
 
         try {
-            // Fetch all (limit 1000) for client-side filtering applies location from DB directly
-            let endpoint = `/admin/appointments?limit=1000`;
-            if (currentLocation) {
-                endpoint += `&location=${currentLocation}`;
-            }
-
-            allAppointments = await apiGet(endpoint, true);
+            const params = listParams();
+            params.set('limit', rowsPerPage);
+            const cursor = pageCursors[currentPage - 1];
+            if (cursor) params.set('cursor', cursor);
+
+            const page = await apiGet(`/admin/appointments/page?${params}`, true);
+            // A newer request (typing, tab switch) superseded this one
+            if (seq !== fetchSeq) return;
+
+            pageItems = page.items;
+            nextCursor = page.next_cursor;
+            if (nextCursor) pageCursors[currentPage] = nextCursor;
             tbody.style.opacity = '1';
 
             renderTable();
 
         } catch (err) {
+            if (seq !== fetchSeq) return;
             console.error('Fetch error:', err);
             showToast('Failed to load appointments', 'error');
             tbody.innerHTML = `<tr><td colspan="10" class="text-center py-8 text-red-500">Error loading data. ${err.message}</td></tr>`;
         } finally {
-            if (loading) loading.classList.add('hidden');
+            if (loading && seq === fetchSeq) loading.classList.add('hidden');
         }
     };
 
     // Initial Fetch
     fetchAppointments();
+    loadStats();
 
     // Attach Listeners
     if (searchInput) {
+        let searchTimer = null;
         searchInput.addEventListener('input', (e) => {
-            currentSearch = e.target.value.trim().toLowerCase();
-            currentPage = 1;
-            renderTable();
+            clearTimeout(searchTimer);
+            searchTimer = setTimeout(() => {
+                currentSearch = e.target.value.trim();
+                fetchAppointments();
+            }, 300);
         });
     }
     if (filterSelect) {
         filterSelect.addEventListener('change', (e) => {
             currentFilter = e.target.value;
-            currentPage = 1;
-            renderTable();
+            fetchAppointments();
         });
     }
 
@@ -590,18 +549,18 @@ async function initDashboard() {
         prevBtn.addEventListener('click', () => {
             if (currentPage > 1) {
                 currentPage--;
-                renderTable();
+                fetchAppointments(false);
             }
         });
     }
 
     if (nextBtn) {
         nextBtn.addEventListener('click', () => {
-            const totalPages = Math.ceil(currentlyFiltered.length / rowsPerPage);
-            if (currentPage < totalPages) {
+            if (nextCursor) {
                 currentPage++;
-                renderTable();
-            } // Prevent double clicking explicitly
+                nextCursor = null; // Prevent double clicking explicitly
+                fetchAppointments(false);
+            }
         });
     }
 
@@ -648,14 +607,16 @@ async function initDashboard() {
             deleteBtn.disabled = true;
 
             try {
-                // Execute deletes in parallel (Soft Delete per backend logic)
-                const deletePromises = ids.map(id => apiDelete(`/admin/appointments/${id}`, true));
-                await Promise.all(deletePromises);
+                // One set-based soft delete for the whole selection
+                const res = await apiPost('/admin/appointments/bulk/delete', { ids: ids.map(Number) }, true);
+                const missed = res.results.filter(r => r.outcome !== 'deleted').length;
 
-                showToast('Appointments deleted successfully', 'success');
+                if (missed > 0) showToast(`${res.affected} deleted, ${missed} already removed`, 'info');
+                else showToast('Appointments deleted successfully', 'success');
 
-                // Refresh data
-                await fetchAppointments();
+                // Refresh data (same page: its cursor still applies)
+                await fetchAppointments(false);
+                loadStats();
 
                 // Reset Selection
                 if (selectAll) selectAll.checked = false;
@@ -664,7 +625,7 @@ async function initDashboard() {
             } catch (err) {
                 console.error('Delete error:', err);
                 showToast('Partially failed to delete some items', 'error');
-                fetchAppointments(); // Refresh anyway to show what remains
+                fetchAppointments(false); // Refresh anyway to show what remains
             } finally {
                 deleteBtn.innerHTML = origText;
                 // Disabled state will be handled by updateSelectionState after refresh
@@ -44,6 +44,53 @@ export function toAssetUrl(path) {
   return `${API_ORIGIN}/${cleanPath}`;
 }
 
+// "url 320w, url 640w" from the API -> same list with absolute asset URLs
+export function toAssetSrcset(srcset) {
+  if (!srcset)
+    return "";
+
+  return srcset
+    .split(",")
+    .map((part) => {
+      const [url, width] = part.trim().split(/\s+/);
+      return `${toAssetUrl(url)} ${width}`;
+    })
+    .join(", ");
+}
+
+// <source> tags for an item's resized variants (AVIF, WebP); "" for items without any
+export function pictureSources(item, sizes) {
+  if (!item || !item.sources || item.sources.length === 0)
+    return "";
+
+  return item.sources
+    .map((s) => `<source type="${s.type}" srcset="${toAssetSrcset(s.srcset)}" sizes="${sizes}">`)
+    .join("");
+}
+
+// width / height attributes so the browser reserves the image's box before it loads
+export function imageSizeAttrs(item) {
+  if (!item || !item.width || !item.height)
+    return "";
+
+  return `width="${item.width}" height="${item.height}"`;
+}
+
+// Dominant colour + blurred inline thumbnail, painted until the real image arrives
+export function placeholderStyle(item) {
+  if (!item || !item.dominant_color)
+    return "";
+
+  const thumb = item.placeholder ? ` url('${item.placeholder}')` : "";
+  return `background: ${item.dominant_color}${thumb} center / cover no-repeat`;
+}
+
+// Attributes for an <img>: reserved size, placeholder background dropped once loaded
+export function placeholderAttrs(item) {
+  const style = placeholderStyle(item);
+  return `${imageSizeAttrs(item)}${style ? ` style="${style}" onload="this.style.background = ''"` : ""}`;
+}
+
 export function authHeader() {
   const token = localStorage.getItem("kanglei_admin_token");
   return token
@@ -1,4 +1,4 @@
-import { apiGet, toAssetUrl } from './api.js';
+import { apiGet, toAssetUrl, pictureSources, placeholderAttrs } from './api.js';
 
 const SESSION_KEY = 'event_popup_closed';
 let events = [];
@@ -170,7 +170,10 @@ function renderEventContent() {
             <div class="relative overflow-y-auto max-h-[80vh] custom-scrollbar">
                 <!-- Event Image -->
                 <div class="w-full bg-gradient-to-br from-slate-100 to-slate-200 dark:from-slate-800 dark:to-slate-900 relative">
-                    <img src="${toAssetUrl(event.image_url)}" alt="${event.title || 'Event Poster'}" class="w-full h-auto max-h-[55vh] object-contain mx-auto">
+                    <picture style="display: contents">
+                        ${pictureSources(event, '(min-width: 672px) 672px, 100vw')}
+                        <img src="${toAssetUrl(event.image_url)}" alt="${event.title || 'Event Poster'}" ${placeholderAttrs(event)} class="w-full h-auto max-h-[55vh] object-contain mx-auto">
+                    </picture>
                     
                     <!-- Navigation Arrows for Overlay -->
                     ${events.length > 1 ? `
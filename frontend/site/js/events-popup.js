@@ -1,4 +1,4 @@
-import { apiGet, toAssetUrl } from './api.js';
+import { apiGet, toAssetUrl, toAssetSrcset, placeholderStyle } from './api.js';
 
 /**
  * Initialize event popups for user-facing pages
@@ -111,6 +111,19 @@ function showEventModal(events) {
         currentIndex = index;
         const event = events[index];
 
+        // Reserve the poster's box and paint its placeholder until it loads
+        if (event.width && event.height) {
+            imageEl.width = event.width;
+            imageEl.height = event.height;
+        } else {
+            imageEl.removeAttribute('width');
+            imageEl.removeAttribute('height');
+        }
+        imageEl.setAttribute('style', placeholderStyle(event));
+        imageEl.onload = () => { imageEl.removeAttribute('style'); };
+
+        imageEl.sizes = '(min-width: 672px) 672px, 100vw';
+        imageEl.srcset = toAssetSrcset(event.srcset);
         imageEl.src = toAssetUrl(event.image_url);
         titleEl.textContent = event.title || 'Event Announcement';
 
@@ -1,4 +1,4 @@
-import { apiGet, toAssetUrl } from './api.js';
+import { apiGet, toAssetUrl, pictureSources, placeholderAttrs } from './api.js';
 
 /**
  * Premium Event Notification System
@@ -241,7 +241,7 @@ function renderEventContent(event, container, total, index) {
             <div class="${imageUrl ? 'block' : 'hidden lg:block'} relative group w-full flex flex-col items-center">
                 <div class="relative w-full rounded-2xl overflow-hidden shadow-2xl bg-black/5 dark:bg-slate-800 flex items-center justify-center">
                     ${imageUrl
-            ? `<img src="${imageUrl}" alt="${event.title}" class="w-full h-auto max-h-[70vh] object-contain rounded-xl">`
+            ? `<picture style="display: contents">${pictureSources(event, '(min-width: 1024px) 50vw, 100vw')}<img src="${imageUrl}" alt="${event.title}" ${placeholderAttrs(event)} class="w-full h-auto max-h-[70vh] object-contain rounded-xl"></picture>`
             : `<div class="aspect-[4/5] w-full bg-slate-100 dark:bg-slate-800 flex flex-col items-center justify-center text-gray-400 p-8">
                              <svg class="w-20 h-20 mb-4" fill="none" stroke="currentColor" viewBox="0 0 24 24"><path stroke-linecap="round" stroke-linejoin="round" stroke-width="1.5" d="M4 16l4.586-4.586a2 2 0 012.828 0L16 16m-2-2l1.586-1.586a2 2 0 012.828 0L20 14m-6-6h.01M6 20h12a2 2 0 002-2V6a2 2 0 00-2-2H6a2 2 0 00-2 2v12a2 2 0 002 2z"></path></svg>
                              <span class="text-sm font-medium">Event Poster</span>
@@ -1,4 +1,4 @@
-import { apiGet, API_ORIGIN } from './api.js';
+import { apiGet, toAssetUrl, pictureSources, placeholderAttrs } from './api.js';
 
 export async function initPlacements() {
     const section = document.getElementById('placements-section');
@@ -21,12 +21,14 @@ export async function initPlacements() {
 
         // ── Render cards ──────────────────────────────────────────
         container.innerHTML = data.map((item) => {
-            const cleanedPath = item.image_path.replace(/^static_uploads\//, '');
-            const imageUrl = `${API_ORIGIN}/uploads/${cleanedPath}`;
+            const imageUrl = toAssetUrl(item.image_url);
             return `
             <div class="placement-card">
                 <div class="placement-image-wrapper">
-                    <img src="${imageUrl}" alt="Student Placement" loading="lazy" />
+                    <picture style="display: contents">
+                        ${pictureSources(item, '(max-width: 540px) 100vw, (max-width: 768px) 50vw, 33vw')}
+                        <img src="${imageUrl}" alt="Student Placement" loading="lazy" ${placeholderAttrs(item)} />
+                    </picture>
                 </div>
             </div>`;
         }).join('');
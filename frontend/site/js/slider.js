@@ -1,4 +1,4 @@
-import { API_BASE, toAssetUrl, apiGet } from './api.js';
+import { API_BASE, toAssetUrl, pictureSources, placeholderStyle, apiGet } from './api.js';
 
 export async function initSlider(containerId) {
     const container = document.getElementById(containerId);
@@ -42,7 +42,9 @@ function renderSlider(container, images) {
             <!-- Track -->
             <div id="slider-track" class="flex flex-nowrap h-full will-change-transform" style="transition: transform 500ms ease;">
                 ${images.map((img, i) => `
-                    <div class="w-full h-full flex-none relative bg-black flex items-center justify-center overflow-hidden" style="flex: 0 0 100%; min-width: 100%;">
+                    <div class="w-full h-full flex-none relative bg-black flex items-center justify-center overflow-hidden" style="flex: 0 0 100%; min-width: 100%; ${placeholderStyle(img)}">
+                        <picture style="display: contents">
+                        ${pictureSources(img, '100vw')}
                         <img 
                             src="${toAssetUrl(img.image_url)}" 
                             alt="${img.caption || ''}" 
@@ -50,6 +52,7 @@ function renderSlider(container, images) {
                             onload="this.classList.remove('opacity-0')"
                             draggable="false"
                         >
+                        </picture>
                         
                         <!-- Caption Overlay (Bottom) -->
                         <div class="absolute bottom-0 left-0 right-0 bg-gradient-to-t from-black/90 via-black/40 to-transparent p-6 sm:p-10 pt-20 flex flex-col justify-end items-start pointer-events-none">
@@ -521,12 +521,7 @@ async function loadPlacements() {
         emptyEl.classList.add('hidden');
 
         data.forEach(item => {
-            const cleanedPath = item.image_path
-                ? item.image_path.replace(/^static_uploads\//, '')
-                : '';
-            const url = cleanedPath
-                ? toAssetUrl(`uploads/${cleanedPath}`)
-                : toAssetUrl(null);
+            const url = toAssetUrl(item.image_url);
 
             const div = document.createElement('div');
             const isSelected = selectedIds.has(String(item.id));